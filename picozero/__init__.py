@@ -7,6 +7,17 @@ from .picozero import (
     PWMChannelAlreadyInUse,
     EventFailedScheduleQueueFull,
     pinout,
+    configure_scheduler,
+    timing_stats,
+    reset_timing_stats,
+    idle,
+    idle_stats,
+    reset_idle_stats,
+    every,
+    after,
+    ScheduledCall,
+    keyframe_cache_stats,
+    clear_keyframe_cache,
     DigitalOutputDevice,
     DigitalLED,
     Buzzer,
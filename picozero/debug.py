@@ -0,0 +1,612 @@
+"""
+Tools for finding out what picozero is doing: recording the levels written
+to output pins and the edges seen by input pins, and profiling input
+callbacks.
+
+They are kept out of the main picozero module, so a program which doesn't
+import ``picozero.debug`` doesn't use any memory for them; each one is
+connected to picozero by a single hook, which picozero only checks while
+the tool is in use::
+
+    from picozero.debug import PinRecorder
+"""
+
+from micropython import schedule
+from time import ticks_us, ticks_diff
+from array import array
+from struct import pack
+
+from . import picozero as _core
+from .picozero import _RECORD_PWM
+
+# recorded in place of the pin number for the Pico's "LED" pin
+_RECORD_LED = 0x7F
+
+
+class PinRecorder:
+    """
+    Records every level and duty cycle written to an output pin, with the
+    time it was written, so they can be viewed as a waveform (e.g. in
+    GTKWave)::
+
+        from picozero import LED
+        from picozero.debug import PinRecorder
+
+        recorder = PinRecorder()
+        recorder.start()
+        LED(25).blink(wait=True, n=2)
+        recorder.stop()
+        recorder.write_vcd("blink.vcd")
+
+    Changes are stored in a ring buffer which is allocated when the recorder
+    is created, so recording doesn't allocate memory and works from the
+    scheduler's Timer callback; once the buffer is full the oldest changes
+    are overwritten.
+
+    Every write made by an output device is recorded, including the pins of
+    an :class:`~picozero.RGBLED`, :class:`~picozero.Motor` or
+    :class:`~picozero.Stepper`. Fades run by DMA (see
+    :meth:`~picozero.PWMOutputDevice.fade_to`) only record their last value.
+
+    :param int size:
+        The number of changes to keep. Defaults to 1024.
+    """
+
+    def __init__(self, size=1024):
+        self._times = array("I", [0] * size)
+        self._pins = bytearray(size)
+        self._values = array("H", [0] * size)
+        self.clear()
+
+    def clear(self):
+        """
+        Discards every recorded change.
+        """
+        self._next = 0
+        self._count = 0
+        self.overwritten = 0
+        self._start = ticks_us()
+
+    def start(self):
+        """
+        Starts recording. Only one recorder can record at a time.
+        """
+        self._start = ticks_us()
+        _core._recorder = self
+
+    def stop(self):
+        """
+        Stops recording.
+        """
+        if _core._recorder is self:
+            _core._recorder = None
+
+    @property
+    def is_recording(self):
+        """
+        Returns :data:`True` if the recorder is recording.
+        """
+        return _core._recorder is self
+
+    def _record(self, pin, value):
+        i = self._next
+        self._times[i] = ticks_us()
+        self._pins[i] = pin if type(pin) is int else _RECORD_LED
+        self._values[i] = value
+        i += 1
+        self._next = 0 if i == len(self._pins) else i
+        if self._count == len(self._pins):
+            self.overwritten += 1
+        else:
+            self._count += 1
+
+    def changes(self):
+        """
+        Returns the recorded changes, oldest first, as a list of ``(time,
+        pin, value, pwm)`` tuples, where `time` is in microseconds from when
+        recording started (or from the oldest change, once changes have been
+        overwritten), `value` is a level or a ``duty_u16`` and `pwm` is
+        :data:`True` for a duty cycle.
+        """
+        size = len(self._pins)
+        first = (self._next - self._count) % size
+        last = self._start if not self.overwritten else self._times[first]
+        time = 0
+        changes = []
+        for j in range(self._count):
+            i = (first + j) % size
+            # the times are accumulated from ticks, so they don't wrap
+            time += ticks_diff(self._times[i], last)
+            last = self._times[i]
+            pin = self._pins[i]
+            number = pin & ~_RECORD_PWM
+            changes.append(
+                (
+                    time,
+                    "LED" if number == _RECORD_LED else number,
+                    self._values[i],
+                    bool(pin & _RECORD_PWM),
+                )
+            )
+        return changes
+
+    def write_vcd(self, file=None):
+        """
+        Writes the recorded changes as a Value Change Dump, with a 1 bit
+        signal for each digital pin and a 16 bit signal for each PWM pin's
+        duty cycle.
+
+        :param file:
+            The path of the file to write, or a file object. If :data:`None`
+            (the default), the dump is printed, e.g. to copy it from the REPL
+            over serial.
+        """
+        if file is None:
+            import sys
+
+            self._write_vcd(sys.stdout)
+        elif isinstance(file, str):
+            with open(file, "w") as f:
+                self._write_vcd(f)
+        else:
+            self._write_vcd(file)
+
+    def _write_vcd(self, f):
+        changes = self.changes()
+        signals = {}
+        for _, pin, _, pwm in changes:
+            if (pin, pwm) not in signals:
+                # VCD identifiers are printable characters from "!"
+                signals[(pin, pwm)] = chr(33 + len(signals))
+
+        f.write("$timescale 1us $end\n$scope module picozero $end\n")
+        for (pin, pwm), code in signals.items():
+            name = pin if type(pin) is str else "GP{}".format(pin)
+            if pwm:
+                f.write("$var wire 16 {} {}_duty $end\n".format(code, name))
+            else:
+                f.write("$var wire 1 {} {} $end\n".format(code, name))
+        f.write("$upscope $end\n$enddefinitions $end\n")
+
+        time = None
+        for t, pin, value, pwm in changes:
+            if t != time:
+                f.write("#{}\n".format(t))
+                time = t
+            code = signals[(pin, pwm)]
+            if pwm:
+                f.write("b{:b} {}\n".format(value, code))
+            else:
+                f.write("{}{}\n".format(1 if value else 0, code))
+
+
+class CallbackStats:
+    """
+    Internal class which records how often an input device's callback has
+    run, how long it took and how long it waited to be run after the pin
+    changed.
+    """
+
+    def __init__(self, callback, device):
+        self.name = getattr(callback, "__name__", str(callback))
+        self.device = str(device)
+        self._calls = 0
+        self._total_us = 0
+        self._max_us = 0
+        self._latency_total_us = 0
+        self._latency_max_us = 0
+        self._over_budget = 0
+
+    def _record(self, latency_us, run_us, budget_us):
+        self._calls += 1
+        self._total_us += run_us
+        self._latency_total_us += latency_us
+        if run_us > self._max_us:
+            self._max_us = run_us
+        if latency_us > self._latency_max_us:
+            self._latency_max_us = latency_us
+        if budget_us is not None and run_us > budget_us:
+            self._over_budget += 1
+
+    def as_dict(self):
+        """
+        Returns the counters as a dictionary.
+        """
+        calls = self._calls
+        return {
+            "callback": self.name,
+            "device": self.device,
+            "calls": calls,
+            "total_us": self._total_us,
+            "max_us": self._max_us,
+            "mean_us": self._total_us // calls if calls else 0,
+            "latency_max_us": self._latency_max_us,
+            "latency_mean_us": self._latency_total_us // calls if calls else 0,
+            "over_budget": self._over_budget,
+        }
+
+
+class EventStats:
+    """
+    Internal class which counts what happened to the pin changes seen by
+    input devices, in a preallocated array so counting doesn't allocate
+    memory in the interrupt handler. Each device's counts are created when
+    counting is turned on, or when the device is created while counting.
+    """
+
+    # the events counted, in the order they are stored
+    EVENTS = ("irqs", "unchanged", "bounced", "scheduled", "dropped")
+    IRQS = 0
+    UNCHANGED = 1
+    BOUNCED = 2
+    SCHEDULED = 3
+    DROPPED = 4
+
+    def __init__(self):
+        self._counts = array("I", [0] * len(self.EVENTS))
+
+    def reset(self):
+        """
+        Clears every counter.
+        """
+        counts = self._counts
+        for i in range(len(counts)):
+            counts[i] = 0
+
+    def _count(self, event):
+        self._counts[event] += 1
+
+    def as_dict(self):
+        """
+        Returns the counters as a dictionary.
+        """
+        return {event: self._counts[i] for i, event in enumerate(self.EVENTS)}
+
+
+class _InputHook:
+    """
+    Internal class which is set as picozero's input hook while an input
+    debugging tool is in use, and passes what input devices do on to them.
+    """
+
+    def __init__(self):
+        # the CallbackStats of each callback, by callback, while callbacks
+        # are being profiled
+        self.callback_stats = None
+        self.budget_us = None
+        # the InputRecorder which edges are logged to, if one is recording
+        self.recorder = None
+        # the EventStats of every device and of each device, while pin
+        # changes are being counted
+        self.events = None
+        self.device_events = {}
+        # when the last pin change happened
+        self._changed = 0
+
+    def _update(self):
+        # only hook into input devices while a tool is in use
+        in_use = (
+            self.callback_stats is not None
+            or self.recorder is not None
+            or self.events is not None
+        )
+        _core._input_hook = self if in_use else None
+
+    def _opened(self, device):
+        if self.events is not None:
+            self.device_events[device] = EventStats()
+
+    def _count(self, device, event):
+        if self.events is not None:
+            self.events._count(event)
+            # the device's counts were created before it could change
+            stats = self.device_events.get(device)
+            if stats is not None:
+                stats._count(event)
+
+    def _irq(self, device, level):
+        self._changed = ticks_us()
+        if self.recorder is not None:
+            self.recorder._record(device._pin_num, level)
+        self._count(device, EventStats.IRQS)
+
+    def _schedule(self, device, callback):
+        if self.callback_stats is not None:
+            schedule(_run_profiled_callback, (callback, device, self._changed))
+        else:
+            schedule(_core._run_callback, callback)
+        self._count(device, EventStats.SCHEDULED)
+
+    def _dropped(self, device):
+        self._count(device, EventStats.DROPPED)
+
+    def _bounced(self, device):
+        self._count(device, EventStats.BOUNCED)
+
+    def _unchanged(self, device):
+        self._count(device, EventStats.UNCHANGED)
+
+
+_input_hook = _InputHook()
+
+
+def profile_callbacks(enabled=True, budget_us=None):
+    """
+    Turns on (or off) profiling of the ``when_activated`` and
+    ``when_deactivated`` callbacks of input devices (e.g. a
+    :class:`~picozero.Button`). While profiling, every callback is timed,
+    along with the time between the pin changing and the callback being
+    run, which grows when other callbacks are slow. See :func:`callback_stats`.
+
+    :param bool enabled:
+        If :data:`True` (the default), callbacks are profiled.
+
+    :param int budget_us:
+        The longest, in microseconds, a callback should take. Calls which
+        take longer are counted as over budget. If :data:`None` (the
+        default), calls are not checked.
+    """
+    if enabled:
+        if _input_hook.callback_stats is None:
+            _input_hook.callback_stats = {}
+        _input_hook.budget_us = budget_us
+    else:
+        _input_hook.callback_stats = None
+    _input_hook._update()
+
+
+def callback_stats():
+    """
+    Returns the statistics of every callback which has run while callbacks
+    were being profiled (see :func:`profile_callbacks`), slowest first.
+
+    Each callback's statistics are a dictionary with the keys ``callback``
+    (its name), ``device``, ``calls``, ``total_us``, ``max_us``, ``mean_us``,
+    ``latency_max_us``, ``latency_mean_us`` (how long after the pin changed
+    it was run) and ``over_budget`` (the number of calls which took longer
+    than the budget).
+    """
+    if _input_hook.callback_stats is None:
+        return []
+    stats = [s.as_dict() for s in _input_hook.callback_stats.values()]
+    stats.sort(key=lambda s: s["total_us"], reverse=True)
+    return stats
+
+
+def reset_callback_stats():
+    """
+    Clears the statistics returned by :func:`callback_stats`.
+    """
+    if _input_hook.callback_stats is not None:
+        _input_hook.callback_stats.clear()
+
+
+def _run_profiled_callback(arg):
+    callback, device, changed = arg
+    start = ticks_us()
+    try:
+        callback()
+    finally:
+        run_us = ticks_diff(ticks_us(), start)
+        profile = _input_hook.callback_stats
+        if profile is not None:
+            stats = profile.get(callback)
+            if stats is None:
+                stats = profile[callback] = CallbackStats(callback, device)
+            latency_us = ticks_diff(start, changed)
+            stats._record(latency_us, run_us, _input_hook.budget_us)
+
+
+# The header of an input recording written by InputRecorder.save
+_INPUT_MAGIC = b"PZE\x01"
+# the bytes used by each edge: ticks_us (u32), pin (u8) and level (u8)
+_INPUT_EDGE_SIZE = 6
+
+
+class InputRecorder:
+    """
+    Records every edge seen by input devices (e.g. a
+    :class:`~picozero.Button`), before any debouncing, so an intermittent
+    problem can be captured and replayed::
+
+        from picozero import Button
+        from picozero.debug import InputRecorder
+
+        button = Button(18)
+        recorder = InputRecorder()
+        recorder.start()
+        ...
+        recorder.save("edges.pze")
+
+    Each edge is stored as 6 bytes (its ``ticks_us``, pin and level) in a
+    ring buffer which is allocated when the recorder is created, so
+    recording doesn't allocate memory in the pin's interrupt handler; once
+    the buffer is full the oldest edges are overwritten.
+
+    A saved recording can be played back through the same input devices
+    on a computer with ``replay_inputs`` in the tests' host backend.
+
+    :param int size:
+        The number of edges to keep. Defaults to 256.
+    """
+
+    def __init__(self, size=256):
+        self._buffer = bytearray(size * _INPUT_EDGE_SIZE)
+        self._size = size
+        self.clear()
+
+    def clear(self):
+        """
+        Discards every recorded edge.
+        """
+        self._next = 0
+        self._count = 0
+        self.overwritten = 0
+        self._start = ticks_us()
+
+    def start(self):
+        """
+        Starts recording. Only one recorder can record at a time.
+        """
+        self._start = ticks_us()
+        _input_hook.recorder = self
+        _input_hook._update()
+
+    def stop(self):
+        """
+        Stops recording.
+        """
+        if _input_hook.recorder is self:
+            _input_hook.recorder = None
+            _input_hook._update()
+
+    @property
+    def is_recording(self):
+        """
+        Returns :data:`True` if the recorder is recording.
+        """
+        return _input_hook.recorder is self
+
+    def _record(self, pin, level):
+        now = ticks_us()
+        buffer = self._buffer
+        i = self._next * _INPUT_EDGE_SIZE
+        buffer[i] = now & 0xFF
+        buffer[i + 1] = now >> 8 & 0xFF
+        buffer[i + 2] = now >> 16 & 0xFF
+        buffer[i + 3] = now >> 24 & 0xFF
+        buffer[i + 4] = pin
+        buffer[i + 5] = level
+        self._next += 1
+        if self._next == self._size:
+            self._next = 0
+        if self._count == self._size:
+            self.overwritten += 1
+        else:
+            self._count += 1
+
+    def edges(self):
+        """
+        Returns the recorded edges, oldest first, as a list of ``(time, pin,
+        level)`` tuples, where `time` is in microseconds from when recording
+        started (or from the oldest edge, once edges have been overwritten).
+        """
+        buffer = self._buffer
+        first = (self._next - self._count) % self._size
+        last = None if self.overwritten else self._start
+        time = 0
+        edges = []
+        for j in range(self._count):
+            i = (first + j) % self._size * _INPUT_EDGE_SIZE
+            ticks = (
+                buffer[i]
+                | buffer[i + 1] << 8
+                | buffer[i + 2] << 16
+                | buffer[i + 3] << 24
+            )
+            if last is not None:
+                time += ticks_diff(ticks, last)
+            last = ticks
+            edges.append((time, buffer[i + 4], buffer[i + 5]))
+        return edges
+
+    def save(self, path):
+        """
+        Saves the recorded edges to a file: the 4 bytes ``PZE\\x01``
+        followed by 6 bytes for each edge, the microseconds since the
+        previous edge (a little-endian ``u32``), its pin and its level.
+
+        :param str path:
+            The file to write.
+        """
+        with open(path, "wb") as f:
+            f.write(_INPUT_MAGIC)
+            last = 0
+            for time, pin, level in self.edges():
+                f.write(pack("<IBB", time - last, pin, level))
+                last = time
+
+    @staticmethod
+    def load(path):
+        """
+        Returns the edges saved in a file by :meth:`save`, in the same form
+        as :meth:`edges`.
+
+        :param str path:
+            The file to read.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:4] != _INPUT_MAGIC:
+            raise ValueError("{} is not a picozero input recording".format(path))
+        time = 0
+        edges = []
+        for i in range(4, len(data) - _INPUT_EDGE_SIZE + 1, _INPUT_EDGE_SIZE):
+            time += (
+                data[i] | data[i + 1] << 8 | data[i + 2] << 16 | data[i + 3] << 24
+            )
+            edges.append((time, data[i + 4], data[i + 5]))
+        return edges
+
+
+def count_events(enabled=True):
+    """
+    Turns on (or off) counting the pin changes seen by input devices, see
+    :func:`event_stats`. Turning counting off discards the counts.
+
+    :param bool enabled:
+        If :data:`True` (the default), pin changes are counted.
+    """
+    if enabled:
+        if _input_hook.events is None:
+            _input_hook.events = EventStats()
+            # allocate every device's counts now, rather than in the
+            # interrupt handler
+            for device in _core._inputs:
+                _input_hook.device_events[device] = EventStats()
+    else:
+        _input_hook.events = None
+        _input_hook.device_events.clear()
+    _input_hook._update()
+
+
+def event_stats(device=None):
+    """
+    Returns counts of the pin changes seen by input devices (e.g. a
+    :class:`~picozero.Button`), which can be used to choose bounce times
+    and check that callbacks keep up. Counting must first be turned on
+    with :func:`count_events`.
+
+    The counts are returned as a dictionary with the keys ``irqs`` (every
+    interrupt), ``unchanged`` (interrupts where the pin was already at the
+    level it was last seen at), ``bounced`` (changes ignored because they
+    came within the bounce time), ``scheduled`` (callbacks scheduled to
+    run) and ``dropped`` (callbacks which couldn't be scheduled because the
+    schedule queue was full).
+
+    :param device:
+        The input device to return the counts for. If :data:`None` (the
+        default), the counts for every device are returned.
+    """
+    if device is None:
+        stats = _input_hook.events
+    else:
+        stats = _input_hook.device_events.get(device)
+    if stats is None:
+        return EventStats().as_dict()
+    return stats.as_dict()
+
+
+def reset_event_stats(device=None):
+    """
+    Clears the counts returned by :func:`event_stats`.
+
+    :param device:
+        The input device to clear the counts of. If :data:`None` (the
+        default), the counts for every device are cleared.
+    """
+    if device is None:
+        if _input_hook.events is not None:
+            _input_hook.events.reset()
+    elif device in _input_hook.device_events:
+        _input_hook.device_events[device].reset()
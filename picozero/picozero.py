@@ -1,6 +1,38 @@
-from machine import Pin, PWM, Timer, ADC
-from micropython import schedule
-from time import ticks_ms, ticks_us, sleep
+from machine import Pin, PWM, Timer, ADC, lightsleep
+from micropython import schedule, alloc_emergency_exception_buf
+from time import ticks_ms, ticks_us, ticks_add, ticks_diff, sleep, sleep_us
+from array import array
+from math import cos, pi
+
+try:
+    from rp2 import DMA
+    from machine import mem32
+except ImportError:
+    # hardware fades (PWMOutputDevice.fade_to) will use the scheduler instead
+    DMA = None
+    mem32 = None
+
+try:
+    from machine import SLEEP
+except ImportError:
+    # input pins can't be set to wake the Pico from lightsleep, so idle()
+    # wakes up regularly instead
+    SLEEP = None
+
+try:
+    import _thread
+except ImportError:
+    # the scheduler can't be run on the second core
+    _thread = None
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import uasyncio as asyncio
+    except ImportError:
+        # the awaitable (*_async) methods won't be available
+        asyncio = None
 
 ###############################################################################
 # EXCEPTIONS
@@ -92,6 +124,1119 @@ class PinsMixin:
         return "{} (pins - {})".format(self.__class__.__name__, self._pin_nums)
 
 
+# The ways the scheduler can handle a frame which is serviced late
+_LATE_POLICIES = ("skip", "catch_up", "stretch")
+
+
+class Scheduler:
+    """
+    Internal class which runs the background value changes of every output
+    device from a single Timer.
+
+    Each running task (e.g. a :class:`ValueChange`) has an absolute
+    ``ticks_us`` deadline; the deadlines are kept in a min-heap so the Timer
+    is only ever armed for the nearest one, and every task that is due is
+    serviced in the same callback.
+
+    A task's next deadline is calculated from its previous deadline rather
+    than from the time it was serviced, so sequences don't drift from real
+    time.
+
+    The Timer is armed in microseconds where the port supports it (falling
+    back to milliseconds) and is armed early, by the average time it has
+    been taking to call back plus half of :attr:`spin_us`. The last few
+    microseconds before a deadline are then busy-waited, so frames are
+    never written before their deadline and, as long as the Timer's jitter
+    is less than ``spin_us / 2``, are written within a few tens of
+    microseconds after it.
+
+    The Timer callback only does integer work on preallocated objects, so it
+    doesn't allocate memory and can be run as a hard IRQ (see
+    :func:`configure_scheduler`). The heap has a fixed capacity which is
+    only ever grown by :meth:`add`.
+
+    Alternatively the scheduler can run in a loop on the second core (see
+    :meth:`start_thread`), where the heap is protected by a lock rather than
+    by the :attr:`_busy` flag.
+    """
+
+    def __init__(self):
+        self._heap = [None] * 8
+        self._size = 0
+        self._timer = None
+        self._armed = None
+        self._wake = None
+        self._busy = False
+        self._in_hard_irq = False
+        self._pass = 0
+        self._latency_us = 0
+        # how early (in microseconds) a task can be serviced without waiting,
+        # this becomes 1000 if the Timer only has millisecond resolution
+        self._slack_us = 0
+        self._tick_hz = 1000000
+        # bound once, so arming the Timer doesn't allocate a bound method
+        self._service_cb = self._service
+        self.late_policy = "skip"
+        self.spin_us = 250
+        self.hard_irq = False
+        self.timing = False
+        # set while the scheduler is running on the second core
+        self._lock = None
+        self._owner = None
+        self._thread_running = False
+        self._thread_done = True
+        # recorded by idle()
+        self.idle_wakeups = 0
+        self.idle_early_wakeups = 0
+        self.idle_sleep_us = 0
+        self.idle_us = 0
+
+    def add(self, task, deadline):
+        """
+        Schedules the task to be serviced at the `deadline` (in ``ticks_us``).
+        """
+        lock = self._acquire()
+        busy = self._busy
+        self._busy = True
+        if self._size == len(self._heap):
+            self._heap.extend([None] * len(self._heap))
+        task._deadline = deadline
+        task._pass = -1
+        self._push(task)
+        self._busy = busy
+        if lock is not None:
+            lock.release()
+        self._rearm()
+
+    def remove(self, task):
+        """
+        Removes the task from the scheduler if it is waiting to be serviced.
+        """
+        lock = self._acquire()
+        busy = self._busy
+        self._busy = True
+        heap = self._heap
+        for i in range(self._size):
+            if heap[i] is task:
+                self._remove_at(i)
+                break
+        self._busy = busy
+        if lock is not None:
+            lock.release()
+        # the Timer may have called back while the heap was being changed
+        self._rearm()
+
+    def next_deadline(self):
+        """
+        Returns the deadline (in ``ticks_us``) of the next task to be
+        serviced, or :data:`None` if there are no tasks.
+        """
+        if not self._size:
+            return None
+        return self._heap[0]._deadline
+
+    def _acquire(self):
+        # returns the lock if it had to be acquired; tasks on the second core
+        # can add and remove tasks (e.g. by turning a device off) while it
+        # already holds the lock
+        lock = self._lock
+        if lock is None or self._owner == _thread.get_ident():
+            return None
+        lock.acquire()
+        return lock
+
+    def start_thread(self):
+        """
+        Starts servicing tasks from a loop on the second core, instead of
+        from a Timer.
+        """
+        if self._thread_running:
+            return
+        if _thread is None:
+            raise RuntimeError("_thread is not available on this port")
+
+        self._lock = _thread.allocate_lock()
+        self._thread_running = True
+        self._thread_done = False
+        if self._timer is not None:
+            self._timer.deinit()
+        self._armed = None
+        self._wake = None
+        _thread.start_new_thread(self._run_thread, ())
+
+    def stop_thread(self, timeout_ms=1000):
+        """
+        Stops the loop on the second core, waiting for it to finish, and
+        goes back to servicing tasks from a Timer.
+        """
+        if not self._thread_running:
+            return
+        self._thread_running = False
+        start = ticks_ms()
+        while not self._thread_done:
+            if ticks_diff(ticks_ms(), start) > timeout_ms:
+                raise RuntimeError("the scheduler thread did not stop")
+            sleep_us(100)
+        self._lock = None
+        self._rearm()
+
+    def _run_thread(self):
+        lock = self._lock
+        ident = _thread.get_ident()
+        stopped = False
+        try:
+            while self._thread_running:
+                lock.acquire()
+                self._owner = ident
+                try:
+                    self._pass = stamp = (self._pass + 1) & 0xFFFF
+                    self._service_due(stamp)
+                    wait_us = (
+                        ticks_diff(self._heap[0]._deadline, ticks_us())
+                        if self._size
+                        else 1000
+                    )
+                finally:
+                    self._owner = None
+                    lock.release()
+
+                # sleep until the next deadline is within spin_us, but wake
+                # at least every millisecond to pick up new tasks
+                wait_us = min(wait_us - self.spin_us, 1000)
+                if wait_us > 0:
+                    sleep_us(wait_us)
+            stopped = True
+        finally:
+            # if a task raised an exception, the task has already been taken
+            # off the heap and the rest go back to being run from the Timer
+            self._thread_running = False
+            self._lock = None
+            self._thread_done = True
+            if not stopped:
+                self._rearm()
+
+    def _service(self, timer_obj=None):
+        now = ticks_us()
+
+        if self._wake is not None:
+            # keep track of how late the timer calls back, so it can be
+            # armed earlier next time
+            late = ticks_diff(now, self._wake)
+            self._latency_us = clamp(
+                self._latency_us + ((late - self._latency_us) >> 3), 0, 10000
+            )
+        self._armed = None
+        self._wake = None
+
+        if self._busy:
+            # the heap is being changed, whoever is changing it will re-arm
+            # the timer once they have finished
+            return
+
+        if self._lock is not None:
+            # the tasks are being serviced on the second core
+            return
+
+        self._busy = True
+        self._in_hard_irq = timer_obj is not None and self.hard_irq
+        self._pass = stamp = (self._pass + 1) & 0xFFFF
+        try:
+            self._service_due(stamp)
+        finally:
+            # a task which raised an exception has already been taken off
+            # the heap, so the others carry on
+            self._in_hard_irq = False
+            self._busy = False
+            self._rearm()
+
+    def _service_due(self, stamp):
+        # services every task that is due, busy-waiting for any that are
+        # due within spin_us
+        heap = self._heap
+        slack = self._slack_us
+        spin = self.spin_us
+        while self._size:
+            task = heap[0]
+            if task._pass == stamp:
+                # don't service a task twice in one callback
+                break
+
+            wait_us = ticks_diff(task._deadline, ticks_us())
+            if wait_us > slack:
+                if wait_us > spin:
+                    break
+                # the deadline is close enough to busy-wait for
+                while ticks_diff(task._deadline, ticks_us()) > 0:
+                    pass
+
+            self._remove_at(0)
+            deadline = task._service(ticks_us())
+            task._pass = stamp
+            if deadline is not None and task._running:
+                task._deadline = deadline
+                self._push(task)
+
+    def _rearm(self):
+        if self._busy or self._lock is not None:
+            return
+
+        if not self._size:
+            if self._timer is not None:
+                self._timer.deinit()
+            self._armed = None
+            self._wake = None
+            return
+
+        deadline = self._heap[0]._deadline
+        if self._armed is not None and self._armed == deadline:
+            return
+
+        if self._timer is None:
+            self._timer = Timer()
+        self._armed = deadline
+        now = ticks_us()
+        delay_us = max(
+            0,
+            ticks_diff(deadline, now) - self._latency_us - (self.spin_us >> 1),
+        )
+        self._wake = ticks_add(now, delay_us)
+        self._arm_timer(delay_us)
+
+    def _arm_timer(self, delay_us):
+        if self._tick_hz == 1000000:
+            try:
+                if self.hard_irq:
+                    self._timer.init(
+                        period=delay_us,
+                        tick_hz=1000000,
+                        mode=Timer.ONE_SHOT,
+                        callback=self._service_cb,
+                        hard=True,
+                    )
+                else:
+                    self._timer.init(
+                        period=delay_us,
+                        tick_hz=1000000,
+                        mode=Timer.ONE_SHOT,
+                        callback=self._service_cb,
+                    )
+                return
+            except TypeError:
+                # this port's Timer only works in milliseconds
+                self._tick_hz = 1000
+                self._slack_us = 1000
+
+        self._timer.init(
+            period=(delay_us + 500) // 1000,
+            mode=Timer.ONE_SHOT,
+            callback=self._service_cb,
+        )
+
+    def _push(self, task):
+        heap = self._heap
+        i = self._size
+        heap[i] = task
+        self._size = i + 1
+        self._sift_up(i)
+
+    def _remove_at(self, i):
+        heap = self._heap
+        task = heap[i]
+        size = self._size - 1
+        self._size = size
+        last = heap[size]
+        heap[size] = None
+        if i < size:
+            heap[i] = last
+            self._sift_down(i)
+            self._sift_up(i)
+        return task
+
+    def _sift_up(self, i):
+        heap = self._heap
+        while i > 0:
+            parent = (i - 1) >> 1
+            if ticks_diff(heap[i]._deadline, heap[parent]._deadline) >= 0:
+                break
+            heap[i], heap[parent] = heap[parent], heap[i]
+            i = parent
+
+    def _sift_down(self, i):
+        heap = self._heap
+        size = self._size
+        while True:
+            smallest = i
+            child = 2 * i + 1
+            if (
+                child < size
+                and ticks_diff(heap[child]._deadline, heap[smallest]._deadline) < 0
+            ):
+                smallest = child
+            child += 1
+            if (
+                child < size
+                and ticks_diff(heap[child]._deadline, heap[smallest]._deadline) < 0
+            ):
+                smallest = child
+            if smallest == i:
+                break
+            heap[i], heap[smallest] = heap[smallest], heap[i]
+            i = smallest
+
+
+_scheduler = Scheduler()
+
+
+def configure_scheduler(
+    late_policy=None,
+    spin_us=None,
+    hard_irq=None,
+    timing=None,
+    second_core=None,
+    cache_size=None,
+):
+    """
+    Configures the scheduler which runs every background output change, e.g.
+    :meth:`PWMLED.blink`, :meth:`PWMLED.pulse` and :meth:`Speaker.play`.
+
+    :param str late_policy:
+        What to do when a frame is serviced late, e.g. because the program
+        was busy:
+
+        + ``"skip"`` (the default) - go straight to the frame that should be
+          showing now, so sequences stay in sync with each other and with
+          real time.
+        + ``"catch_up"`` - play every missed frame as quickly as possible.
+        + ``"stretch"`` - play the next frame and shift the rest of the
+          sequence later.
+
+        If :data:`None`, the policy is not changed.
+
+    :param int spin_us:
+        How many microseconds before a deadline the scheduler will busy-wait
+        for it, rather than re-arming its Timer. Larger values make short
+        frames (e.g. high ``fps`` fades or short beeps) more accurate at the
+        cost of CPU time. ``0`` disables busy-waiting. Defaults to 250. If
+        :data:`None`, the value is not changed.
+
+    :param bool hard_irq:
+        If :data:`True`, frames are written from a hard IRQ, so they are not
+        delayed by the garbage collector or by other Python code. Work which
+        isn't safe in a hard IRQ, like turning a device off at the end of a
+        sequence, is deferred with ``micropython.schedule``. Defaults to
+        :data:`False`. If :data:`None`, the value is not changed.
+
+    :param bool timing:
+        If :data:`True`, how late every frame is written and how long it
+        takes to write are recorded, globally and for each device, and can
+        be read with :func:`timing_stats`. Defaults to :data:`False`. If
+        :data:`None`, the value is not changed.
+
+    :param bool second_core:
+        If :data:`True`, background output changes (including
+        :class:`Stepper` steps started with ``wait=False``) are run from a
+        loop on the Pico's second core, leaving the first core free for your
+        program and input device callbacks. Setting it back to :data:`False`
+        stops the loop. Requires the ``_thread`` module. Defaults to
+        :data:`False`. If :data:`None`, the value is not changed.
+
+    :param int cache_size:
+        How many compiled sequences (e.g. the fades of a
+        :meth:`PWMLED.pulse`) are kept so they can be shared by devices
+        playing the same sequence, see :func:`keyframe_cache_stats`. ``0``
+        turns the cache off. Defaults to 8. If :data:`None`, the value is
+        not changed.
+    """
+    if cache_size is not None:
+        _keyframe_cache.size = max(0, int(cache_size))
+        _keyframe_cache.clear()
+
+    if second_core is not None:
+        if second_core:
+            _scheduler.start_thread()
+        else:
+            _scheduler.stop_thread()
+
+    if timing is not None:
+        _scheduler.timing = bool(timing)
+
+    if hard_irq is not None:
+        if hard_irq:
+            # allow exceptions raised in the hard IRQ to be reported
+            alloc_emergency_exception_buf(100)
+        _scheduler.hard_irq = bool(hard_irq)
+        _scheduler._armed = None
+        _scheduler._rearm()
+
+    if spin_us is not None:
+        _scheduler.spin_us = max(0, int(spin_us))
+
+    if late_policy is not None:
+        if late_policy not in _LATE_POLICIES:
+            raise ValueError(
+                "Invalid late_policy. Must be one of: {}".format(_LATE_POLICIES)
+            )
+        _scheduler.late_policy = late_policy
+
+
+class TimingStats:
+    """
+    Internal class which records how late frames are written and how long
+    they take to write, in fixed-size counters so recording a frame doesn't
+    allocate memory.
+    """
+
+    # the upper bounds, in microseconds, of the lateness histogram buckets,
+    # frames later than the last bound are counted in an extra bucket
+    BUCKETS_US = (10, 50, 100, 250, 500, 1000, 5000, 20000)
+
+    # the totals the means are worked out from are halved, along with the
+    # number of frames they count, before they outgrow MicroPython's small
+    # integers (and would allocate); the frame count stops at the limit
+    TOTAL_LIMIT = 1 << 28
+
+    def __init__(self):
+        self._histogram = array("I", [0] * (len(self.BUCKETS_US) + 1))
+        self.reset()
+
+    def reset(self):
+        """
+        Clears every counter.
+        """
+        self._frames = 0
+        self._late_min = 0
+        self._late_max = 0
+        self._late_total = 0
+        self._write_max = 0
+        self._write_total = 0
+        self._total_frames = 0
+        histogram = self._histogram
+        for i in range(len(histogram)):
+            histogram[i] = 0
+
+    def _record(self, late_us, write_us):
+        if self._frames == 0 or late_us < self._late_min:
+            self._late_min = late_us
+        if self._frames == 0 or late_us > self._late_max:
+            self._late_max = late_us
+        if write_us > self._write_max:
+            self._write_max = write_us
+        if self._frames < self.TOTAL_LIMIT:
+            self._frames += 1
+
+        limit = self.TOTAL_LIMIT
+        if self._late_total > limit or self._write_total > limit:
+            frames = self._total_frames
+            if frames & 1:
+                # take one frame's worth out first, so halving keeps the means
+                self._late_total -= self._late_total // frames
+                self._write_total -= self._write_total // frames
+                frames -= 1
+            self._late_total >>= 1
+            self._write_total >>= 1
+            self._total_frames = frames >> 1
+        self._total_frames += 1
+        self._late_total += late_us
+        self._write_total += write_us
+
+        i = 0
+        for bound in self.BUCKETS_US:
+            if late_us <= bound:
+                break
+            i += 1
+        self._histogram[i] += 1
+
+    def as_dict(self):
+        """
+        Returns the counters as a dictionary.
+        """
+        frames = self._total_frames
+        return {
+            "frames": self._frames,
+            "late_min_us": self._late_min,
+            "late_max_us": self._late_max,
+            "late_mean_us": self._late_total // frames if frames else 0,
+            "write_max_us": self._write_max,
+            "write_mean_us": self._write_total // frames if frames else 0,
+            "late_histogram": [
+                (bound, self._histogram[i])
+                for i, bound in enumerate(self.BUCKETS_US + (None,))
+            ],
+        }
+
+
+_timing_stats = TimingStats()
+
+
+def timing_stats(device=None):
+    """
+    Returns how late, in microseconds, background output changes have been
+    written compared to when they were scheduled, and how long writing
+    them took. Timing must first be turned on with
+    ``configure_scheduler(timing=True)``.
+
+    The statistics are returned as a dictionary with the keys ``frames``,
+    ``late_min_us``, ``late_max_us``, ``late_mean_us``, ``write_max_us``,
+    ``write_mean_us`` and ``late_histogram``, a list of
+    ``(upper bound in microseconds, frames)`` pairs where the last bound is
+    :data:`None`.
+
+    :param device:
+        The output device to return the statistics for. If :data:`None` (the
+        default), the statistics for every device are returned.
+    """
+    if device is None:
+        return _timing_stats.as_dict()
+    if device._timing_stats is None:
+        return TimingStats().as_dict()
+    return device._timing_stats.as_dict()
+
+
+def reset_timing_stats(device=None):
+    """
+    Clears the statistics returned by :func:`timing_stats`.
+
+    :param device:
+        The output device to clear the statistics of. If :data:`None` (the
+        default), the statistics for every device are cleared.
+    """
+    if device is None:
+        _timing_stats.reset()
+    elif device._timing_stats is not None:
+        device._timing_stats.reset()
+
+
+# The object (a picozero.debug.PinRecorder) which output writes are logged
+# to, if one is recording; it is the only debugging hook output devices check
+_recorder = None
+
+# set in a recorded pin number for a PWM duty cycle, rather than a level
+_RECORD_PWM = 0x80
+
+
+# The object (set by picozero.debug) which input devices report pin changes
+# and callbacks to, while an input debugging tool is in use; it is the only
+# debugging hook input devices check
+_input_hook = None
+
+# Every open input device, so debugging tools can set up what they need for
+# each one before any of its pin changes
+_inputs = []
+
+
+def _run_callback(callback):
+    callback()
+
+
+# Sleeps shorter than this (in milliseconds) aren't worth the time it takes
+# to enter and leave lightsleep, so idle() just waits instead
+_IDLE_MIN_SLEEP_MS = 2
+
+# The longest idle() sleeps (in milliseconds) while there are input devices
+# whose pins can't wake the Pico, so their changes are handled this quickly
+_IDLE_INPUT_SLEEP_MS = 10
+
+# The open input devices whose pins can't wake the Pico from lightsleep
+_sleepless_inputs = []
+
+# How long (in milliseconds) idle() waits at a time, without lightsleep,
+# while PWM outputs are running
+_IDLE_PWM_WAIT_MS = 10
+
+
+def _pwm_running():
+    # returns True if any PWM output is at a duty other than 0 or full, which
+    # stops (part way through a cycle) while the Pico is in lightsleep
+    for device in PWMOutputDevice._channels_used.values():
+        pwm = getattr(device, "_pwm", None)
+        if pwm is not None and 0 < pwm.duty_u16() < 65535:
+            return True
+    return False
+
+
+def idle(seconds=None):
+    """
+    Waits, in ``machine.lightsleep``, until the next background output change
+    (e.g. the next blink of an LED) is due, services it and goes back to
+    sleep, saving power while the program has nothing else to do.
+
+    An input device's pin changing, e.g. a :class:`Button` being pressed,
+    wakes the Pico early so its callbacks can run. Where the port can't wake
+    the Pico from lightsleep on a pin change (``Pin.irq`` has no ``wake``
+    argument), ``idle`` sleeps for at most 10ms at a time while any input
+    devices are open, so their callbacks run up to 10ms late.
+
+    ``machine.lightsleep`` stops the clock the PWM outputs run from, so while any PWM
+    device (e.g. a dimmed :class:`PWMLED`, a :class:`Servo` or a
+    :class:`Speaker` playing a note) is at a value other than fully off or
+    fully on, ``idle`` waits without lightsleep instead, which saves less
+    power.
+
+    How many times the Pico woke up and how long it slept can be read with
+    :func:`idle_stats`.
+
+    :param float seconds:
+        The number of seconds to idle for. If :data:`None` (the default),
+        idle forever.
+    """
+    start = ticks_us()
+    end = None if seconds is None else ticks_add(start, int(seconds * 1000000))
+
+    while True:
+        now = ticks_us()
+        wait_us = None if end is None else ticks_diff(end, now)
+        if wait_us is not None and wait_us <= 0:
+            break
+
+        deadline = _scheduler.next_deadline()
+        if deadline is not None:
+            until_us = ticks_diff(deadline, now)
+            if wait_us is None or until_us < wait_us:
+                wait_us = until_us
+
+        if wait_us is not None:
+            # wake up early enough for the Timer to hit the deadline exactly
+            sleep_for_ms = (
+                wait_us - _scheduler._latency_us - _scheduler.spin_us
+            ) // 1000
+            if sleep_for_ms < _IDLE_MIN_SLEEP_MS or _scheduler._lock is not None:
+                # there isn't time to sleep, or the scheduler is running on
+                # the second core which mustn't be stopped
+                sleep_us(max(0, min(wait_us, 1000)))
+                continue
+        else:
+            sleep_for_ms = None
+
+        if _sleepless_inputs and (
+            sleep_for_ms is None or sleep_for_ms > _IDLE_INPUT_SLEEP_MS
+        ):
+            # an input's pin changing won't wake the Pico, so wake up to let
+            # its IRQ (latched while asleep) run
+            sleep_for_ms = _IDLE_INPUT_SLEEP_MS
+
+        if _pwm_running():
+            # wait with the clocks running, so the PWM outputs carry on
+            if sleep_for_ms is None or sleep_for_ms > _IDLE_PWM_WAIT_MS:
+                sleep_for_ms = _IDLE_PWM_WAIT_MS
+            sleep_us(sleep_for_ms * 1000)
+            continue
+
+        before = ticks_us()
+        if sleep_for_ms is None:
+            lightsleep()
+        else:
+            lightsleep(sleep_for_ms)
+        after = ticks_us()
+
+        _scheduler.idle_wakeups += 1
+        _scheduler.idle_sleep_us += ticks_diff(after, before)
+        if sleep_for_ms is None or ticks_diff(after, before) < sleep_for_ms * 1000:
+            # woken by an IRQ rather than the end of the sleep
+            _scheduler.idle_early_wakeups += 1
+
+        deadline = _scheduler.next_deadline()
+        if deadline is not None and ticks_diff(deadline, after) <= 0:
+            # the Timer may not have called back while the Pico was asleep
+            _scheduler._service()
+
+    _scheduler.idle_us += ticks_diff(ticks_us(), start)
+
+
+def idle_stats():
+    """
+    Returns a dictionary of statistics recorded by :func:`idle`:
+
+    + ``wakeups`` - the number of times the Pico has woken from lightsleep.
+    + ``early_wakeups`` - how many of those were caused by an IRQ, e.g. a
+      button being pressed, rather than a background output change.
+    + ``sleep_ms`` - the total time spent in lightsleep.
+    + ``idle_ms`` - the total time spent in :func:`idle`, so
+      ``sleep_ms / idle_ms`` is the fraction of the time the Pico was asleep.
+    """
+    return {
+        "wakeups": _scheduler.idle_wakeups,
+        "early_wakeups": _scheduler.idle_early_wakeups,
+        "sleep_ms": _scheduler.idle_sleep_us // 1000,
+        "idle_ms": _scheduler.idle_us // 1000,
+    }
+
+
+def reset_idle_stats():
+    """
+    Clears the statistics returned by :func:`idle_stats`.
+    """
+    _scheduler.idle_wakeups = 0
+    _scheduler.idle_early_wakeups = 0
+    _scheduler.idle_sleep_us = 0
+    _scheduler.idle_us = 0
+
+
+class ScheduledCall:
+    """
+    A function call scheduled by :func:`every` or :func:`after`, which can
+    be cancelled.
+
+    :param function fn:
+        The function to call, with no arguments.
+
+    :param float interval:
+        The number of seconds between calls, or :data:`None` to only call
+        the function once.
+
+    :param float delay:
+        The number of seconds until the first call.
+
+    :attr:`calls` counts the calls which have run, :attr:`coalesced` the
+    calls which were merged into another because the program was busy and
+    :attr:`dropped` the calls which were lost because the
+    ``micropython.schedule`` queue was full.
+    """
+
+    def __init__(self, fn, interval, delay):
+        self._fn = fn
+        self._interval_us = None if interval is None else int(interval * 1000000)
+        self._running = True
+        self._deadline = None
+        self._pending = False
+        self._cancelled = False
+        self._call_cb = self._call
+        self.calls = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+        if self._interval_us is not None and self._interval_us <= 0:
+            raise ValueError("interval must be greater than 0")
+
+        _scheduler.add(self, ticks_add(ticks_us(), max(0, int(delay * 1000000))))
+
+    def _service(self, now, deadline=None):
+        if deadline is None:
+            deadline = self._deadline
+
+        if self._pending:
+            # the last call hasn't run yet, don't queue another one
+            self.coalesced += 1
+        else:
+            try:
+                schedule(self._call_cb, None)
+                self._pending = True
+            except RuntimeError:
+                # the micropython schedule queue is full
+                self.dropped += 1
+
+        interval = self._interval_us
+        if interval is None:
+            self._running = False
+            return None
+
+        # don't try to make up for calls which should already have happened
+        deadline = ticks_add(deadline, interval)
+        while ticks_diff(deadline, now) <= 0:
+            deadline = ticks_add(deadline, interval)
+            self.coalesced += 1
+        return deadline
+
+    def _call(self, _):
+        self._pending = False
+        if not self._cancelled:
+            self.calls += 1
+            self._fn()
+
+    def cancel(self):
+        """
+        Stops the function being called. A call which is already waiting to
+        run is also cancelled.
+        """
+        self._cancelled = True
+        self._running = False
+        _scheduler.remove(self)
+
+    @property
+    def active(self):
+        """
+        Returns :data:`True` if the function will be called again.
+        """
+        return not self._cancelled and (self._running or self._pending)
+
+
+def every(interval, fn, delay=None):
+    """
+    Calls a function repeatedly in the background, e.g. to read a sensor
+    every 50 milliseconds::
+
+        from picozero import Pot, every
+
+        pot = Pot(0)
+        every(0.05, lambda: print(pot.value))
+
+    The function is run with ``micropython.schedule``, from the same Timer as
+    every other background change. If the previous call still hasn't run
+    when the next is due, they are merged into one call.
+
+    Returns a :class:`ScheduledCall` which can be used to cancel the calls.
+
+    :param float interval:
+        The number of seconds between calls.
+
+    :param function fn:
+        The function to call, with no arguments.
+
+    :param float delay:
+        The number of seconds until the first call. If :data:`None` (the
+        default), it is the same as ``interval``.
+    """
+    return ScheduledCall(fn, interval, interval if delay is None else delay)
+
+
+def after(delay, fn):
+    """
+    Calls a function once, in the background, after a delay, e.g. to turn an
+    LED off after 5 seconds::
+
+        from picozero import pico_led, after
+
+        pico_led.on()
+        after(5, pico_led.off)
+
+    Returns a :class:`ScheduledCall` which can be used to cancel the call.
+
+    :param float delay:
+        The number of seconds to wait before calling the function.
+
+    :param function fn:
+        The function to call, with no arguments.
+    """
+    return ScheduledCall(fn, None, delay)
+
+
+# The longest a single compiled frame can last. Longer holds are split into
+# several frames so that every deadline stays well within the range that
+# ticks_diff can compare.
+_MAX_FRAME_US = 1 << 28
+
+
+class Keyframes:
+    """
+    Internal class which compiles a sequence of values for an output device
+    into compact buffers of device states and frame times.
+
+    :param OutputDevice output_device:
+        The OutputDevice object the sequence will be written to.
+
+    :param generator:
+        A generator function that yields a 2d list of
+        ((value, seconds), *).
+
+    Each value is converted to the device's native state(s) (e.g. a
+    ``duty_u16``) once, so playing the frames back only needs to index
+    the buffers. Consecutive values which convert to the same states (e.g.
+    the steps of a slow fade with a low ``duty_factor``) are merged into one
+    longer frame, so the scheduler isn't woken to write a state that
+    hasn't changed.
+    """
+
+    def __init__(self, output_device, generator):
+        self.width = output_device._state_width
+        self.states = array(output_device._state_typecode)
+        self.times = array("I")
+
+        for value, seconds in generator():
+            states = output_device._value_to_states(value)
+            us = int(seconds * 1000000)
+
+            last = len(self.times) - 1
+            if last >= 0 and self._same_states(last, states):
+                # hold the previous frame for longer instead
+                held = min(us, _MAX_FRAME_US - self.times[last])
+                self.times[last] += held
+                us -= held
+                if us <= 0:
+                    continue
+
+            while True:
+                self.states.extend(states)
+                self.times.append(min(us, _MAX_FRAME_US))
+                us -= _MAX_FRAME_US
+                if us <= 0:
+                    break
+
+        self.frames = len(self.times)
+
+    def _same_states(self, frame, states):
+        width = self.width
+        i = frame * width
+        for j in range(width):
+            if self.states[i + j] != states[j]:
+                return False
+        return True
+
+
+def _fade_steps(fade_time, fps, levels, table=None):
+    """
+    Returns the number of steps, and the seconds per step, to fade over
+    `fade_time` seconds at `fps`. If the device only has `levels` distinct
+    states between the start and end of a linear fade, it uses at most that
+    many (longer) steps, so every step changes the state. Eased fades (with
+    an easing `table`) keep every step, as the steep part of the curve needs
+    them even though the flat part repeats states.
+    """
+    steps = int(fps * fade_time)
+    duration = steps / fps
+    if table is None and 1 < levels < steps:
+        steps = levels
+    return steps, duration / steps if steps else 0
+
+
+def _perceptual(t):
+    # the CIE 1931 lightness curve, so equal steps look equally bright
+    lightness = 100 * t
+    if lightness <= 8:
+        return lightness / 903.3
+    return ((lightness + 16) / 116) ** 3
+
+
+# The easing curves which can be used for fades, as functions of the
+# progress through the fade (0 to 1)
+_EASINGS = {
+    "ease_in": lambda t: t * t,
+    "ease_out": lambda t: 1 - (1 - t) * (1 - t),
+    "ease_in_out": lambda t: 2 * t * t if t < 0.5 else 1 - 2 * (1 - t) * (1 - t),
+    "sine": lambda t: (1 - cos(pi * t)) / 2,
+    "cubic": lambda t: 4 * t * t * t if t < 0.5 else 1 - 4 * (1 - t) ** 3,
+    "exponential": lambda t: (2 ** (10 * t) - 1) / 1023,
+    "perceptual": _perceptual,
+}
+
+# The number of steps in an easing lookup table
+_EASING_STEPS = 256
+
+_easing_tables = {}
+
+
+def _easing_table(easing):
+    """
+    Returns the lookup table for an easing curve, ``_EASING_STEPS + 1``
+    fixed-point values from 0 to 65535, generating it the first time it is
+    used. Linear fades don't need a table, so :data:`None` is returned.
+    """
+    if easing == "linear":
+        return None
+    table = _easing_tables.get(easing)
+    if table is None:
+        if easing not in _EASINGS:
+            raise ValueError(
+                "Invalid easing. Must be one of: {}".format(
+                    ("linear",) + tuple(sorted(_EASINGS))
+                )
+            )
+        curve = _EASINGS[easing]
+        table = array("H", bytearray(2 * (_EASING_STEPS + 1)))
+        for i in range(_EASING_STEPS + 1):
+            table[i] = int(clamp(curve(i / _EASING_STEPS), 0, 1) * 65535 + 0.5)
+        _easing_tables[easing] = table
+    return table
+
+
+def _ease(table, t):
+    """
+    Returns the eased value of the progress `t` (0 to 1) from an easing
+    lookup table (see :func:`_easing_table`).
+    """
+    if table is None:
+        return t
+    return table[int(clamp(t, 0, 1) * _EASING_STEPS)] / 65535
+
+
+class KeyframeCache:
+    """
+    Internal class which keeps the most recently used :class:`Keyframes`,
+    so that devices playing the same sequence (e.g. 30 LEDs all pulsing with
+    the same fade times) share one compiled copy rather than each computing
+    its own.
+
+    :param int size:
+        The maximum number of sequences to keep. When the cache is full, the
+        least recently used sequence is discarded.
+    """
+
+    def __init__(self, size=8):
+        self.size = size
+        self._entries = {}
+        # keys, least recently used first
+        self._order = []
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, output_device, generator, key):
+        """
+        Returns the :class:`Keyframes` for the sequence, compiling them if
+        they aren't in the cache.
+
+        :param key:
+            A hashable description of the sequence (e.g. its fade times and
+            fps). It is combined with the device's type and
+            :meth:`~OutputDevice._state_key`, so only devices which convert
+            values to the same states share it. If :data:`None`, the
+            sequence isn't cached.
+        """
+        if key is None or self.size <= 0:
+            return Keyframes(output_device, generator)
+
+        key = (key, type(output_device), output_device._state_key())
+        try:
+            keyframes = self._entries.get(key)
+        except TypeError:
+            # e.g. colours given as lists
+            return Keyframes(output_device, generator)
+
+        if keyframes is not None:
+            self.hits += 1
+            self._order.remove(key)
+            self._order.append(key)
+            return keyframes
+
+        self.misses += 1
+        keyframes = Keyframes(output_device, generator)
+        self._entries[key] = keyframes
+        self._order.append(key)
+        while len(self._order) > self.size:
+            del self._entries[self._order.pop(0)]
+        return keyframes
+
+    def clear(self):
+        """
+        Empties the cache and resets the hit and miss counters.
+        """
+        self._entries = {}
+        self._order = []
+        self.hits = 0
+        self.misses = 0
+
+
+_keyframe_cache = KeyframeCache()
+
+
+def keyframe_cache_stats():
+    """
+    Returns a dictionary describing the cache of compiled sequences shared
+    between devices, with the keys ``hits``, ``misses``, ``entries`` and
+    ``size`` (the maximum number of entries, see :func:`configure_scheduler`).
+    """
+    return {
+        "hits": _keyframe_cache.hits,
+        "misses": _keyframe_cache.misses,
+        "entries": len(_keyframe_cache._order),
+        "size": _keyframe_cache.size,
+    }
+
+
+def clear_keyframe_cache():
+    """
+    Empties the cache of compiled sequences and resets its statistics.
+    """
+    _keyframe_cache.clear()
+
+
 class ValueChange:
     """
     Internal class to control the value of an output device.
@@ -104,7 +1249,8 @@ class ValueChange:
         ((value, seconds), *).
 
         The output_device's value will be set for the number of
-        seconds.
+        seconds. The sequence is compiled into :class:`Keyframes` once,
+        when the ValueChange is created.
 
     :param int n:
         The number of times to repeat the sequence. If None, the
@@ -113,72 +1259,441 @@ class ValueChange:
     :param bool wait:
         If True the ValueChange object will block (wait) until
         the sequence has completed.
+
+    :param bool asynchronous:
+        If True the sequence isn't started until :meth:`run_async` is
+        awaited.
+
+    :param key:
+        If given, the compiled sequence is shared through the
+        :class:`KeyframeCache` with other devices using the same key.
+
+    :param bool hold:
+        If True the device is left at the sequence's last value when it
+        finishes, rather than being turned off.
     """
 
-    def __init__(self, output_device, generator, n, wait):
+    def __init__(
+        self,
+        output_device,
+        generator,
+        n,
+        wait,
+        asynchronous=False,
+        key=None,
+        hold=False,
+    ):
         self._output_device = output_device
-        self._generator = generator
+        self._keyframes = _keyframe_cache.compile(output_device, generator, key)
         self._n = n
+        self._frame = 0
+        self._hold = hold
 
-        self._gen = self._generator()
-
-        self._timer = Timer()
         self._running = True
         self._wait = wait
+        self._deadline = None
+        self._finish_cb = self._finish
+        if _scheduler.timing and output_device._timing_stats is None:
+            output_device._timing_stats = TimingStats()
 
-        self._set_value()
+        if asynchronous:
+            return
+
+        start = ticks_us()
+        us = self._next_frame()
+        if us is None or not self._running:
+            return
 
-    def _set_value(self, timer_obj=None):
         if self._wait:
-            # wait for the exection to end
-            next_seq = self._get_value()
-            while next_seq is not None:
-                value, seconds = next_seq
+            # wait for the execution to end
+            deadline = ticks_add(start, us)
+            while deadline is not None:
+                delay_us = ticks_diff(deadline, ticks_us())
+                if delay_us > 0:
+                    sleep_us(delay_us)
+                deadline = self._service(ticks_us(), deadline)
+        else:
+            # let the scheduler run the sequence
+            _scheduler.add(self, ticks_add(start, us))
 
-                self._output_device._write(value)
-                sleep(seconds)
+    async def run_async(self):
+        """
+        Runs the sequence from a uasyncio task, returning when it has
+        completed. If the task is cancelled, the device is turned off.
+        """
+        try:
+            start = ticks_us()
+            us = self._next_frame()
+            deadline = None if us is None else ticks_add(start, us)
+            while deadline is not None and self._running:
+                delay_us = ticks_diff(deadline, ticks_us())
+                # always yield, so the event loop is never blocked
+                await asyncio.sleep(max(0, delay_us) / 1000000)
+                if not self._running:
+                    break
+                deadline = self._service(ticks_us(), deadline)
+        finally:
+            if self._running:
+                # the task was cancelled
+                self._running = False
+                self._output_device.off()
+
+    def _service(self, now, deadline=None):
+        """
+        Writes the frame that is due at `now` and returns the deadline of the
+        one after it, or `None` if the sequence has finished.
+        """
+        if deadline is None:
+            deadline = self._deadline
+
+        if _scheduler.timing:
+            late = ticks_diff(now, deadline)
+            deadline = self._advance(now, deadline)
+            write = ticks_diff(ticks_us(), now)
+            _timing_stats._record(late, write)
+            stats = self._output_device._timing_stats
+            if stats is not None:
+                stats._record(late, write)
+            return deadline
+
+        return self._advance(now, deadline)
+
+    def _advance(self, now, deadline):
+        policy = _scheduler.late_policy
+        if policy == "skip":
+            # pass over any frames which should already have finished
+            while True:
+                us = self._next_frame(False)
+                if us is None:
+                    if self._hold and self._frame:
+                        # the last frame is the one the device is left at
+                        self._write_frame(self._frame - 1)
+                    return None
+                if ticks_diff(ticks_add(deadline, us), now) > 0:
+                    break
+                deadline = ticks_add(deadline, us)
+            self._write_frame(self._frame - 1)
+        else:
+            us = self._next_frame()
+            if us is None:
+                return None
+            if policy == "stretch":
+                deadline = now
+
+        return ticks_add(deadline, us)
+
+    def _next_frame(self, write=True):
+        """
+        Moves to the next frame in the sequence, writing it if `write` is
+        True, and returns how long, in microseconds, it should be held for,
+        or `None` if the sequence has finished.
+        """
+        keyframes = self._keyframes
+        if self._frame == keyframes.frames:
+            if self._n is not None:
+                self._n -= 1
+            if self._n == 0 or keyframes.frames == 0:
+                # the sequence has finished, turn the device off
+                self._running = False
+                if self._hold:
+                    return None
+                if _scheduler._in_hard_irq:
+                    try:
+                        schedule(self._finish_cb, None)
+                    except RuntimeError:
+                        pass
+                else:
+                    self._output_device.off()
+                return None
+            self._frame = 0
 
-                next_seq = self._get_value()
+        i = self._frame
+        self._frame = i + 1
+        if write:
+            self._write_frame(i)
+        return keyframes.times[i]
 
-        else:
-            # run the timer
-            next_seq = self._get_value()
-            if next_seq is not None:
-                value, seconds = next_seq
-
-                self._output_device._write(value)
-                self._timer.init(
-                    period=int(seconds * 1000),
-                    mode=Timer.ONE_SHOT,
-                    callback=self._set_value,
-                )
+    def _write_frame(self, i):
+        keyframes = self._keyframes
+        self._output_device._write_states(keyframes.states, i * keyframes.width)
 
-        if next_seq is None:
-            # the sequence has finished, turn the device off
+    def _finish(self, _):
+        # turn the device off, unless something else has taken control of it
+        if self._output_device._value_changer is self:
             self._output_device.off()
-            self._running = False
 
-    def _get_value(self):
-        try:
-            return next(self._gen)
+    def stop(self):
+        """
+        Stops the ValueChange object running.
+        """
+        self._running = False
+        _scheduler.remove(self)
 
-        except StopIteration:
 
-            self._n = self._n - 1 if self._n is not None else None
-            if self._n == 0:
-                # it's the end, return None
-                return None
-            else:
-                # recreate the generator and start again
-                self._gen = self._generator()
-                return next(self._gen)
+# RP2040 PWM registers, used to fade a PWM output with DMA
+_PWM_BASE = 0x40050000
+_PWM_SLICE_STRIDE = 0x14
+_PWM_CC = 0x0C
+_PWM_TOP = 0x10
+# the DMA request raised when PWM slice 0 wraps, slice n is n higher
+_DREQ_PWM_WRAP0 = 24
+# the most compare values (one per PWM period) a DMA fade writes; longer
+# fades, or faster PWM frequencies, are run by the scheduler instead
+_PWM_FADE_MAX_TRANSFERS = 1024
+
+
+def _rp2040():
+    """
+    Returns True if picozero is running on an RP2040, whose PWM registers
+    and DMA requests are the ones above.
+    """
+    try:
+        from sys import implementation
+
+        return "RP2040" in implementation._machine
+    except (ImportError, AttributeError):
+        return False
+
+
+# fades are only run by DMA on the chip the registers above belong to, e.g.
+# on an RP2350 they are run by the scheduler
+_dma_fades = DMA is not None and _rp2040()
+
+
+def _pwm_slice_address(pin):
+    """
+    Returns the PWM slice and channel (0 for A, 1 for B) of a pin and the
+    address of the slice's registers.
+    """
+    pwm_slice = (pin >> 1) & 7
+    return pwm_slice, pin & 1, _PWM_BASE + pwm_slice * _PWM_SLICE_STRIDE
+
+
+def _pwm_duty_to_cc(duty, top):
+    """
+    Converts a ``duty_u16`` value to a compare value for a slice whose
+    counter wraps at `top`, as ``PWM.duty_u16`` does.
+    """
+    return min((duty * (top + 1) + 32767) // 65535, top + 1)
+
+
+def _pwm_fade_words(start_cc, end_cc, transfers, channel, cc_register, table=None):
+    """
+    Returns the words to write to a slice's CC register, one per PWM period,
+    to fade `channel` from `start_cc` to `end_cc`, following the easing
+    lookup `table` (or linearly if it is :data:`None`). Both channels share
+    the register, so the other channel's compare value is taken from
+    `cc_register` and kept.
+    """
+    cc_register &= 0xFFFFFFFF
+    shift = 16 * channel
+    other = cc_register & ~(0xFFFF << shift) & 0xFFFFFFFF
+    words = array("I", bytearray(4 * transfers))
+    change = end_cc - start_cc
+    for i in range(transfers):
+        if table is None:
+            cc = start_cc + change * (i + 1) // transfers
+        else:
+            index = (i + 1) * _EASING_STEPS // transfers
+            cc = start_cc + change * table[index] // 65535
+        words[i] = other | (cc << shift)
+    return words
+
+
+class PWMFade:
+    """
+    Internal class which fades a :class:`PWMOutputDevice` using DMA: every
+    time the PWM counter wraps, the DMA channel writes the next compare value
+    to the slice's CC register, so the CPU is only involved at the start
+    and the end of the fade.
+
+    :param PWMOutputDevice output_device:
+        The device to fade.
+
+    :param int end:
+        The ``duty_u16`` to fade to.
+
+    :param float duration:
+        The length of the fade in seconds.
+
+    :param bool wait:
+        If True the PWMFade object will block (wait) until the fade has
+        completed.
+
+    :param table:
+        The easing lookup table for the fade, or :data:`None` for a linear
+        fade.
+    """
+
+    def __init__(self, output_device, end, duration, wait, table=None):
+        self._output_device = output_device
+        self._end = end
+        self._running = True
+        self._deadline = None
+
+        pwm_slice, channel, address = _pwm_slice_address(output_device._pin_num)
+        top = mem32[address + _PWM_TOP] & 0xFFFF
+        transfers = max(1, int(duration * output_device._pwm.freq()))
+        # kept for as long as the DMA channel reads it
+        self._words = _pwm_fade_words(
+            _pwm_duty_to_cc(output_device._pwm.duty_u16(), top),
+            _pwm_duty_to_cc(end, top),
+            transfers,
+            channel,
+            mem32[address + _PWM_CC],
+            table,
+        )
+
+        self._dma = DMA()
+        self._dma.config(
+            read=self._words,
+            write=address + _PWM_CC,
+            count=transfers,
+            ctrl=self._dma.pack_ctrl(
+                size=2,
+                inc_read=True,
+                inc_write=False,
+                treq_sel=_DREQ_PWM_WRAP0 + pwm_slice,
+            ),
+            trigger=True,
+        )
+
+        deadline = ticks_add(ticks_us(), int(duration * 1000000))
+        if wait:
+            while deadline is not None:
+                sleep_us(max(0, ticks_diff(deadline, ticks_us())))
+                deadline = self._service(ticks_us())
+        else:
+            _scheduler.add(self, deadline)
+
+    def _service(self, now, deadline=None):
+        if self._dma.active():
+            # the PWM frequency was changed, wait for the last transfers
+            return ticks_add(now, 1000)
+        self._release()
+        self._output_device._write_state(self._end)
+        return None
+
+    def _release(self):
+        self._running = False
+        if self._dma is not None:
+            self._dma.close()
+            self._dma = None
 
     def stop(self):
         """
-        Stops the ValueChange object running.
+        Stops the fade, leaving the device at its current value.
+        """
+        _scheduler.remove(self)
+        if self._dma is not None:
+            self._dma.active(0)
+        self._release()
+
+
+# animations are interpolated in this many steps, small enough that the
+# arithmetic stays within MicroPython's small integers for 16 bit states
+_ANIMATION_STEP_BITS = 12
+_ANIMATION_STEPS = 1 << _ANIMATION_STEP_BITS
+
+
+class Animation:
+    """
+    Internal class which moves an output device in frames from the value it
+    is at to a target value, and which can be given a new target while it
+    is running without stopping (see :meth:`PWMOutputDevice.animate_to`).
+
+    The states the device is moved between are kept in preallocated arrays,
+    so neither a frame nor a new target allocates memory.
+
+    :param OutputDevice output_device:
+        The device to animate.
+
+    :param states:
+        The native states the device is at.
+    """
+
+    def __init__(self, output_device, states):
+        self._output_device = output_device
+        width = output_device._state_width
+        self._start = array("l", [0] * width)
+        self._delta = array("l", [0] * width)
+        self._states = array("l", states)
+        self._t0 = 0
+        self._scale = 1
+        self._frame_us = 0
+        self._running = False
+        self._deadline = None
+
+    def retarget(self, states, duration, fps, called):
+        """
+        Moves the device to the `states` over `duration` seconds, starting
+        from the states last written. The first frame is written straight
+        away; `called` is the ``ticks_us`` at which the change was asked for.
+        """
+        # stop the scheduler servicing the animation while it is changed
+        _scheduler.remove(self)
+        for j in range(len(self._states)):
+            self._start[j] = self._states[j]
+            self._delta[j] = states[j] - self._states[j]
+        self._scale = max(1, int(duration * 1000000) >> _ANIMATION_STEP_BITS)
+        self._frame_us = max(1, int(1000000 / fps))
+        # the first frame is one frame into the animation, so the device
+        # starts moving towards the target as soon as it is written
+        self._t0 = ticks_add(called, -self._frame_us)
+        output_device = self._output_device
+        if _scheduler.timing and output_device._timing_stats is None:
+            output_device._timing_stats = TimingStats()
+
+        deadline = self._service(ticks_us(), called)
+        if deadline is None:
+            self._running = False
+        else:
+            self._running = True
+            _scheduler.add(self, deadline)
+
+    def _service(self, now, deadline=None):
+        if deadline is None:
+            deadline = self._deadline
+
+        if _scheduler.timing:
+            late = ticks_diff(now, deadline)
+            finished = self._write(now)
+            write = ticks_diff(ticks_us(), now)
+            _timing_stats._record(late, write)
+            stats = self._output_device._timing_stats
+            if stats is not None:
+                stats._record(late, write)
+        else:
+            finished = self._write(now)
+
+        if finished:
+            self._running = False
+            return None
+        deadline = ticks_add(deadline, self._frame_us)
+        if ticks_diff(deadline, now) <= 0:
+            # frames are interpolated from the time, so late ones are skipped
+            deadline = ticks_add(now, self._frame_us)
+        return deadline
+
+    def _write(self, now):
+        # writes the frame for `now`, returning True if it is the last one
+        step = ticks_diff(now, self._t0) // self._scale
+        if step > _ANIMATION_STEPS:
+            step = _ANIMATION_STEPS
+        start = self._start
+        delta = self._delta
+        states = self._states
+        for j in range(len(states)):
+            states[j] = start[j] + (delta[j] * step >> _ANIMATION_STEP_BITS)
+        self._output_device._write_states(states, 0)
+        return step == _ANIMATION_STEPS
+
+    def stop(self):
+        """
+        Stops the animation, leaving the device at its current value.
         """
         self._running = False
-        self._timer.deinit()
+        _scheduler.remove(self)
 
 
 ###############################################################################
@@ -191,6 +1706,14 @@ class OutputDevice:
     Base class for output devices.
     """
 
+    # the number of native states (e.g. duty values) that make up one value
+    # of the device and the array typecode used to store them
+    _state_width = 1
+    _state_typecode = "H"
+
+    # created when the device is first changed with timing turned on
+    _timing_stats = None
+
     def __init__(self, active_high=True, initial_value=False):
         self.active_high = active_high
         if initial_value is not None:
@@ -254,6 +1777,31 @@ class OutputDevice:
                 wait,
             )
 
+    async def on_async(self, value=1, t=None):
+        """
+        Turns the device on. If `t` is given, this can be awaited from a
+        uasyncio task and will return once the time has expired, without
+        blocking other tasks.
+
+        :param float value:
+            The value to set when turning on. Defaults to 1.
+
+        :param float t:
+            The time in seconds that the device should be on. If None is
+            specified, the device will stay on. The default is None.
+        """
+        if t is None:
+            self.value = value
+        else:
+            await self._start_change_async(
+                lambda: iter(
+                    [
+                        (value, t),
+                    ]
+                ),
+                1,
+            )
+
     def off(self):
         """
         Turns the device off.
@@ -305,14 +1853,74 @@ class OutputDevice:
         if on_time > 0 or off_time > 0:
             self._start_change(lambda: iter([(1, on_time), (0, off_time)]), n, wait)
 
-    def _start_change(self, generator, n, wait):
-        self._value_changer = ValueChange(self, generator, n, wait)
+    async def blink_async(self, on_time=1, off_time=None, n=None):
+        """
+        Makes the device turn on and off repeatedly. This can be awaited from
+        a uasyncio task and will return once the device has stopped, without
+        blocking other tasks. Cancelling the task turns the device off.
+
+        :param float on_time:
+            The length of time in seconds that the device will be on. Defaults to 1.
+
+        :param float off_time:
+            The length of time in seconds that the device will be off. If `None`,
+            it will be the same as ``on_time``. Defaults to `None`.
+
+        :param int n:
+            The number of times to repeat the blink operation. If None is
+            specified, the device will continue blinking forever. The default
+            is None.
+        """
+        off_time = on_time if off_time is None else off_time
+
+        self.off()
+
+        if on_time > 0 or off_time > 0:
+            await self._start_change_async(
+                lambda: iter([(1, on_time), (0, off_time)]), n
+            )
+
+    def _value_to_states(self, value):
+        return (self._value_to_state(value),)
+
+    def _write_states(self, states, i):
+        self._write_state(states[i])
+
+    def _state_key(self):
+        # everything (other than the device's type) that _value_to_states
+        # depends on, used to share compiled sequences between devices
+        return self._active_state
+
+    def _start_change(self, generator, n, wait, key=None, hold=False):
+        self._stop_change()
+        self._value_changer = ValueChange(
+            self, generator, n, wait, key=key, hold=hold
+        )
+
+    async def _start_change_async(self, generator, n, key=None):
+        self._stop_change()
+        self._value_changer = ValueChange(self, generator, n, False, True, key)
+        await self._value_changer.run_async()
 
     def _stop_change(self):
         if self._value_changer is not None:
             self._value_changer.stop()
             self._value_changer = None
 
+    def _animate_to(self, value, duration, fps):
+        called = ticks_us()
+        end = self._value_to_states(value)
+        animation = self._value_changer
+        if type(animation) is not Animation:
+            current = self.value
+            self._stop_change()
+            # with no value to move from (e.g. a Servo which is off) the
+            # device moves straight to the target
+            start = end if current is None else self._value_to_states(current)
+            animation = Animation(self, start)
+            self._value_changer = animation
+        animation.retarget(end, duration, fps, called)
+
     def close(self):
         """
         Turns the device off.
@@ -352,7 +1960,12 @@ class DigitalOutputDevice(OutputDevice, PinMixin):
         return self._state_to_value(self._pin.value())
 
     def _write(self, value):
-        self._pin.value(self._value_to_state(value))
+        self._write_state(self._value_to_state(value))
+
+    def _write_state(self, state):
+        self._pin.value(state)
+        if _recorder is not None:
+            _recorder._record(self._pin_num, state)
 
     def close(self):
         """
@@ -496,11 +2109,19 @@ class PWMOutputDevice(OutputDevice, PinMixin):
     def _value_to_state(self, value):
         return int(self._duty_factor * (value if self.active_high else 1 - value))
 
+    def _state_key(self):
+        return (self._duty_factor, self._active_state)
+
     def _read(self):
         return self._state_to_value(self._pwm.duty_u16())
 
     def _write(self, value):
-        self._pwm.duty_u16(self._value_to_state(value))
+        self._write_state(self._value_to_state(value))
+
+    def _write_state(self, state):
+        self._pwm.duty_u16(state)
+        if _recorder is not None:
+            _recorder._record(self._pin_num | _RECORD_PWM, state)
 
     @property
     def is_active(self):
@@ -528,13 +2149,83 @@ class PWMOutputDevice(OutputDevice, PinMixin):
         on_time=1,
         off_time=None,
         n=None,
-        wait=False,
+        wait=False,
+        fade_in_time=0,
+        fade_out_time=None,
+        fps=25,
+        easing="linear",
+    ):
+        """
+        Makes the device turn on and off repeatedly.
+
+        :param float on_time:
+            The length of time in seconds the device will be on. Defaults to 1.
+
+        :param float off_time:
+            The length of time in seconds the device will be off. If `None`,
+            it will be the same as ``on_time``. Defaults to `None`.
+
+        :param int n:
+            The number of times to repeat the blink operation. If `None`, the
+            device will continue blinking forever. The default is `None`.
+
+        :param bool wait:
+           If True, the method will block until the LED stops blinking. If False,
+           the method will return and the LED will blink in the background.
+           Defaults to False.
+
+        :param float fade_in_time:
+            The length of time in seconds to spend fading in. Defaults to 0.
+
+        :param float fade_out_time:
+            The length of time in seconds to spend fading out. If `None`,
+            it will be the same as ``fade_in_time``. Defaults to `None`.
+
+        :param int fps:
+           The frames per second that will be used to calculate the number of
+           steps between off/on states when fading. Defaults to 25.
+
+        :param str easing:
+           The curve used when fading: ``"linear"`` (the default),
+           ``"ease_in"``, ``"ease_out"``, ``"ease_in_out"``, ``"sine"``,
+           ``"cubic"``, ``"exponential"`` or ``"perceptual"``, which fades
+           evenly as the eye sees brightness.
+        """
+        self.off()
+
+        blink_generator = self._blink_generator(
+            on_time, off_time, fade_in_time, fade_out_time, fps, easing
+        )
+        if blink_generator is not None:
+            self._start_change(
+                blink_generator,
+                n,
+                wait,
+                (
+                    "blink",
+                    on_time,
+                    off_time,
+                    fade_in_time,
+                    fade_out_time,
+                    fps,
+                    easing,
+                ),
+            )
+
+    async def blink_async(
+        self,
+        on_time=1,
+        off_time=None,
+        n=None,
         fade_in_time=0,
         fade_out_time=None,
         fps=25,
+        easing="linear",
     ):
         """
-        Makes the device turn on and off repeatedly.
+        Makes the device turn on and off repeatedly. This can be awaited from
+        a uasyncio task and will return once the device has stopped, without
+        blocking other tasks. Cancelling the task turns the device off.
 
         :param float on_time:
             The length of time in seconds the device will be on. Defaults to 1.
@@ -547,11 +2238,6 @@ class PWMOutputDevice(OutputDevice, PinMixin):
             The number of times to repeat the blink operation. If `None`, the
             device will continue blinking forever. The default is `None`.
 
-        :param bool wait:
-           If True, the method will block until the LED stops blinking. If False,
-           the method will return and the LED will blink in the background.
-           Defaults to False.
-
         :param float fade_in_time:
             The length of time in seconds to spend fading in. Defaults to 0.
 
@@ -562,38 +2248,149 @@ class PWMOutputDevice(OutputDevice, PinMixin):
         :param int fps:
            The frames per second that will be used to calculate the number of
            steps between off/on states when fading. Defaults to 25.
+
+        :param str easing:
+           The curve used when fading: ``"linear"`` (the default),
+           ``"ease_in"``, ``"ease_out"``, ``"ease_in_out"``, ``"sine"``,
+           ``"cubic"``, ``"exponential"`` or ``"perceptual"``, which fades
+           evenly as the eye sees brightness.
         """
         self.off()
 
+        blink_generator = self._blink_generator(
+            on_time, off_time, fade_in_time, fade_out_time, fps, easing
+        )
+        if blink_generator is not None:
+            await self._start_change_async(
+                blink_generator,
+                n,
+                (
+                    "blink",
+                    on_time,
+                    off_time,
+                    fade_in_time,
+                    fade_out_time,
+                    fps,
+                    easing,
+                ),
+            )
+
+    def _blink_generator(
+        self, on_time, off_time, fade_in_time, fade_out_time, fps, easing="linear"
+    ):
         off_time = on_time if off_time is None else off_time
         fade_out_time = fade_in_time if fade_out_time is None else fade_out_time
+        levels = abs(self._value_to_state(1) - self._value_to_state(0))
+        table = _easing_table(easing)
 
         def blink_generator():
             if fade_in_time > 0:
-                for s in [
-                    (i * (1 / fps) / fade_in_time, 1 / fps)
-                    for i in range(int(fps * fade_in_time))
-                ]:
-                    yield s
+                steps, t = _fade_steps(fade_in_time, fps, levels, table)
+                for i in range(steps):
+                    yield (_ease(table, i * t / fade_in_time), t)
 
             if on_time > 0:
                 yield (1, on_time)
 
             if fade_out_time > 0:
-                for s in [
-                    (1 - (i * (1 / fps) / fade_out_time), 1 / fps)
-                    for i in range(int(fps * fade_out_time))
-                ]:
-                    yield s
+                steps, t = _fade_steps(fade_out_time, fps, levels, table)
+                for i in range(steps):
+                    yield (_ease(table, 1 - (i * t / fade_out_time)), t)
 
             if off_time > 0:
                 yield (0, off_time)
 
         # is there anything to change?
         if on_time > 0 or off_time > 0 or fade_in_time > 0 or fade_out_time > 0:
-            self._start_change(blink_generator, n, wait)
+            return blink_generator
+        return None
+
+    def fade_to(self, value, duration=1, wait=False, fps=25, easing="linear"):
+        """
+        Fades the device from its current value to a new value.
+
+        On a Raspberry Pi Pico (RP2040) the fade is run by DMA, which
+        updates the PWM duty cycle every PWM period without using the CPU.
+        Where that isn't available, or the fade would take more than 1024
+        PWM periods, the fade is run in frames by the same Timer as
+        :meth:`blink`. DMA fades write both channels of the PWM slice, so a
+        change to the other pin on the slice made during the fade is undone.
+
+        :param float value:
+            The value to fade to, between 0 and 1.
+
+        :param float duration:
+            The length of time in seconds the fade should take. Defaults to 1.
+
+        :param bool wait:
+           If True, the method will block until the fade has finished. If
+           False, the method will return and the device will fade in the
+           background. Defaults to False.
+
+        :param int fps:
+           The frames per second used when DMA isn't available. Defaults
+           to 25.
+
+        :param str easing:
+           The curve used for the fade: ``"linear"`` (the default),
+           ``"ease_in"``, ``"ease_out"``, ``"ease_in_out"``, ``"sine"``,
+           ``"cubic"``, ``"exponential"`` or ``"perceptual"``.
+        """
+        start = self._read()
+        if duration <= 0 or start is None:
+            # there's nothing to fade from (e.g. a Servo which is off)
+            self.value = value
+            return
+
+        table = _easing_table(easing)
+        self._stop_change()
+        end = self._value_to_state(value)
+        if _dma_fades and duration * self._pwm.freq() <= _PWM_FADE_MAX_TRANSFERS:
+            self._value_changer = PWMFade(self, end, duration, wait, table)
+            return
+
+        levels = abs(end - self._value_to_state(start))
+
+        def fade_generator():
+            steps, t = _fade_steps(duration, fps, levels, table)
+            for i in range(steps):
+                yield (start + (value - start) * _ease(table, i * t / duration), t)
+            yield (value, 0)
+
+        self._start_change(fade_generator, 1, wait, hold=True)
 
-    def pulse(self, fade_in_time=1, fade_out_time=None, n=None, wait=False, fps=25):
+    def animate_to(self, value, duration=1, fps=25):
+        """
+        Moves the device from its current value towards a new value, like
+        :meth:`fade_to`, but can be called again while it is moving: the
+        device then moves to the new value from wherever it has got to,
+        without being turned off first. This makes it suitable for changing
+        the value many times a second, e.g. to follow a sensor.
+
+        The first step towards the new value is written before the method
+        returns; the time taken to write it is recorded by
+        :func:`timing_stats` (with ``configure_scheduler(timing=True)``).
+
+        :param float value:
+            The value to move to, between 0 and 1.
+
+        :param float duration:
+            The length of time in seconds the move should take. Defaults to 1.
+
+        :param int fps:
+           The frames per second of the move. Defaults to 25.
+        """
+        self._animate_to(value, duration, fps)
+
+    def pulse(
+        self,
+        fade_in_time=1,
+        fade_out_time=None,
+        n=None,
+        wait=False,
+        fps=25,
+        easing="linear",
+    ):
         """
         Makes the device pulse on and off repeatedly.
 
@@ -617,6 +2414,11 @@ class PWMOutputDevice(OutputDevice, PinMixin):
            If True, the method will block until the LED stops pulsing. If False,
            the method will return and the LED will pulse in the background.
            Defaults to False.
+
+        :param str easing:
+           The curve used when fading: ``"linear"`` (the default),
+           ``"ease_in"``, ``"ease_out"``, ``"ease_in_out"``, ``"sine"``,
+           ``"cubic"``, ``"exponential"`` or ``"perceptual"``.
         """
         self.blink(
             on_time=0,
@@ -626,6 +2428,44 @@ class PWMOutputDevice(OutputDevice, PinMixin):
             n=n,
             wait=wait,
             fps=fps,
+            easing=easing,
+        )
+
+    async def pulse_async(
+        self, fade_in_time=1, fade_out_time=None, n=None, fps=25, easing="linear"
+    ):
+        """
+        Makes the device pulse on and off repeatedly. This can be awaited from
+        a uasyncio task and will return once the device has stopped, without
+        blocking other tasks. Cancelling the task turns the device off.
+
+        :param float fade_in_time:
+            The length of time in seconds that the device will take to turn on.
+            Defaults to 1.
+
+        :param float fade_out_time:
+           The length of time in seconds that the device will take to turn off.
+           Defaults to 1.
+
+        :param int n:
+           The number of times to pulse the LED. If None, the LED will pulse
+           forever. Defaults to None.
+
+        :param int fps:
+           The frames per second that will be used to calculate the number of
+           steps between off/on states. Defaults to 25.
+
+        :param str easing:
+           The curve used when fading, see :meth:`pulse`.
+        """
+        await self.blink_async(
+            on_time=0,
+            off_time=0,
+            fade_in_time=fade_in_time,
+            fade_out_time=fade_out_time,
+            n=n,
+            fps=fps,
+            easing=easing,
         )
 
     def close(self):
@@ -934,6 +2774,27 @@ class Speaker(OutputDevice, PinMixin):
         if value[1] is not None:
             self._pwm_buzzer.volume = value[1]
 
+    # a frame of a tune is (freq, duty) - a freq of 0 leaves it unchanged
+    _state_width = 2
+    _state_typecode = "I"
+
+    def _value_to_states(self, value):
+        freq, volume = value
+        if type(freq) is str:
+            freq = self._to_freq(freq)
+        if volume is None:
+            # a frame always writes the duty, so it can't be left unchanged
+            raise ValueError("a Speaker keyframe's volume can't be None")
+        return (
+            0 if freq is None else int(freq),
+            self._pwm_buzzer._value_to_state(volume),
+        )
+
+    def _write_states(self, states, i):
+        if states[i]:
+            self._pwm_buzzer._pwm.freq(states[i])
+        self._pwm_buzzer._write_state(states[i + 1])
+
     def _to_freq(self, freq):
         if freq is not None and freq != "" and freq != 0:
             if type(freq) is str:
@@ -1024,7 +2885,33 @@ class Speaker(OutputDevice, PinMixin):
         """
 
         self.off()
+        self._start_change(self._tune_generator(tune, duration, volume), n, wait)
+
+    async def play_async(self, tune=440, duration=1, volume=1, n=1):
+        """
+        Plays a tune for a given duration. This can be awaited from a
+        uasyncio task and will return once the tune has finished, without
+        blocking other tasks. Cancelling the task stops the tune.
+
+        :param int tune:
+            The tune to play, see :meth:`play`. Defaults to `440`.
+
+        :param int volume:
+            The volume of the tune; 1 is maximum volume, 0 is mute. Defaults to 1.
+
+        :param float duration:
+            The duration of each note in seconds. Defaults to 1.
+
+        :param int n:
+           The number of times to play the tune. If None, the tune will play
+           forever. Defaults to 1.
+        """
+        self.off()
+        await self._start_change_async(
+            self._tune_generator(tune, duration, volume), n
+        )
 
+    def _tune_generator(self, tune, duration, volume):
         # tune isn't a list, so it must be a single frequency or note
         if not isinstance(tune, (list, tuple)):
             tune = [(tune, duration)]
@@ -1052,9 +2939,10 @@ class Speaker(OutputDevice, PinMixin):
                     yield ((freq, freq_volume), freq_duration * 0.9)
                     yield ((freq, 0), freq_duration * 0.1)
 
-        self._start_change(tune_generator, n, wait)
+        return tune_generator
 
     def close(self):
+        self._stop_change()
         self._pwm_buzzer.close()
 
 
@@ -1121,6 +3009,21 @@ class RGBLED(OutputDevice, PinsMixin):
         for led, v in zip(self._leds, value):
             led.value = v
 
+    _state_width = 3
+
+    def _value_to_states(self, value):
+        if type(value) is not tuple:
+            value = (value,) * 3
+        return tuple(led._value_to_state(v) for led, v in zip(self._leds, value))
+
+    def _write_states(self, states, i):
+        for led in self._leds:
+            led._write_state(states[i])
+            i += 1
+
+    def _state_key(self):
+        return tuple(led._state_key() for led in self._leds)
+
     @property
     def value(self):
         """
@@ -1235,6 +3138,28 @@ class RGBLED(OutputDevice, PinsMixin):
             self._last = self.value
             self.value = (0, 0, 0)
 
+    def animate_to(self, color, duration=1, fps=25):
+        """
+        Moves the LED from its current colour towards a new colour, and can
+        be called again while it is moving: the LED then moves to the new
+        colour from wherever it has got to, without being turned off first.
+
+        The first step towards the new colour is written before the method
+        returns; the time taken to write it is recorded by
+        :func:`timing_stats` (with ``configure_scheduler(timing=True)``).
+
+        :param tuple color:
+            The colour to move to, as an RGB 3-tuple of ``(red, green,
+            blue)``.
+
+        :param float duration:
+            The length of time in seconds the move should take. Defaults to 1.
+
+        :param int fps:
+           The frames per second of the move. Defaults to 25.
+        """
+        self._animate_to(color, duration, fps)
+
     def blink(
         self,
         on_times=1,
@@ -1243,6 +3168,7 @@ class RGBLED(OutputDevice, PinsMixin):
         n=None,
         wait=False,
         fps=25,
+        easing="linear",
     ):
         """
         Makes the device blink between colours repeatedly.
@@ -1264,9 +3190,55 @@ class RGBLED(OutputDevice, PinsMixin):
             continue blinking, and return immediately. If :data:`False`, only
             return when the blinking is finished (warning: the default value of
             *n* will result in this method never returning).
+        :param str easing:
+            The curve used when fading: ``"linear"`` (the default),
+            ``"ease_in"``, ``"ease_out"``, ``"ease_in_out"``, ``"sine"``,
+            ``"cubic"``, ``"exponential"`` or ``"perceptual"``.
+        """
+        self.off()
+        self._start_change(
+            self._blink_generator(on_times, fade_times, colors, fps, easing),
+            n,
+            wait,
+            ("blink", on_times, fade_times, colors, fps, easing),
+        )
+
+    async def blink_async(
+        self,
+        on_times=1,
+        fade_times=0,
+        colors=((1, 0, 0), (0, 1, 0), (0, 0, 1)),
+        n=None,
+        fps=25,
+        easing="linear",
+    ):
+        """
+        Makes the device blink between colours repeatedly. This can be
+        awaited from a uasyncio task and will return once the blinking has
+        finished, without blocking other tasks. Cancelling the task turns the
+        device off.
+
+        :param float on_times:
+            Single value or tuple of numbers of seconds to stay on each colour. Defaults to 1 second.
+        :param float fade_times:
+            Single value or tuple of times to fade between each colour. Must be 0 if
+            *pwm* was :data:`False` when the class was constructed.
+        :param colors:
+            The colours to blink between. Defaults to red, green, blue.
+        :type n: int or None
+        :param n:
+            Number of times to blink; :data:`None` (the default) means forever.
+        :param str easing:
+            The curve used when fading, see :meth:`blink`.
         """
         self.off()
+        await self._start_change_async(
+            self._blink_generator(on_times, fade_times, colors, fps, easing),
+            n,
+            ("blink", on_times, fade_times, colors, fps, easing),
+        )
 
+    def _blink_generator(self, on_times, fade_times, colors, fps, easing="linear"):
         if type(on_times) is not tuple:
             on_times = (on_times,) * len(colors)
         if type(fade_times) is not tuple:
@@ -1274,6 +3246,7 @@ class RGBLED(OutputDevice, PinsMixin):
         # If any value is above zero then treat all as 0-255 values
         if any(v > 1 for v in sum(colors, ())):
             colors = tuple(tuple(self._from_255(v) for v in t) for t in colors)
+        table = _easing_table(easing)
 
         def blink_generator():
 
@@ -1290,17 +3263,27 @@ class RGBLED(OutputDevice, PinsMixin):
                     yield (colors[c], on_times[c])
 
                 if fade_times[c] > 0:
-                    for i in range(int(fps * fade_times[c])):
+                    next_color = colors[(c + 1) % len(colors)]
+                    # the number of states the channel changing most moves
+                    # through
+                    levels = max(
+                        abs(a - b)
+                        for a, b in zip(
+                            self._value_to_states(colors[c]),
+                            self._value_to_states(next_color),
+                        )
+                    )
+                    steps, t = _fade_steps(fade_times[c], fps, levels, table)
+                    for i in range(steps):
                         v = lerp(
-                            i * (1 / fps) / fade_times[c],
+                            _ease(table, i * t / fade_times[c]),
                             True,
-                            colors[(c + 1) % len(colors)],
+                            next_color,
                             colors[c],
                         )
-                        t = 1 / fps
                         yield (v, t)
 
-        self._start_change(blink_generator, n, wait)
+        return blink_generator
 
     def pulse(
         self,
@@ -1309,6 +3292,7 @@ class RGBLED(OutputDevice, PinsMixin):
         n=None,
         wait=False,
         fps=25,
+        easing="linear",
     ):
         """
         Makes the device fade between colours repeatedly.
@@ -1324,9 +3308,25 @@ class RGBLED(OutputDevice, PinsMixin):
         :type n: int or None
         :param n:
             Number of times to pulse; :data:`None` (the default) means forever.
+        :param str easing:
+            The curve used when fading, see :meth:`blink`.
         """
         on_times = 0
-        self.blink(on_times, fade_times, colors, n, wait, fps)
+        self.blink(on_times, fade_times, colors, n, wait, fps, easing)
+
+    async def pulse_async(
+        self,
+        fade_times=1,
+        colors=((0, 0, 0), (1, 0, 0), (0, 0, 0), (0, 1, 0), (0, 0, 0), (0, 0, 1)),
+        n=None,
+        fps=25,
+        easing="linear",
+    ):
+        """
+        Makes the device fade between colours repeatedly. This can be awaited
+        from a uasyncio task, see :meth:`pulse` and :meth:`blink_async`.
+        """
+        await self.blink_async(0, fade_times, colors, n, fps, easing)
 
     def cycle(
         self,
@@ -1335,6 +3335,7 @@ class RGBLED(OutputDevice, PinsMixin):
         n=None,
         wait=False,
         fps=25,
+        easing="linear",
     ):
         """
         Makes the device fade in and out repeatedly.
@@ -1349,9 +3350,25 @@ class RGBLED(OutputDevice, PinsMixin):
         :type n: int or None
         :param n:
             Number of times to cycle; :data:`None` (the default) means forever.
+        :param str easing:
+            The curve used when fading, see :meth:`blink`.
         """
         on_times = 0
-        self.blink(on_times, fade_times, colors, n, wait, fps)
+        self.blink(on_times, fade_times, colors, n, wait, fps, easing)
+
+    async def cycle_async(
+        self,
+        fade_times=1,
+        colors=((1, 0, 0), (0, 1, 0), (0, 0, 1)),
+        n=None,
+        fps=25,
+        easing="linear",
+    ):
+        """
+        Makes the device fade in and out repeatedly. This can be awaited from
+        a uasyncio task, see :meth:`cycle` and :meth:`blink_async`.
+        """
+        await self.blink_async(0, fade_times, colors, n, fps, easing)
 
     def close(self):
         super().close()
@@ -1483,6 +3500,44 @@ class Motor(PinsMixin):
         """
         self.on(-speed, t, wait)
 
+    async def on_async(self, speed=1, t=None):
+        """
+        Turns the motor on and makes it turn. If `t` is given, this can be
+        awaited from a uasyncio task and will return once the time has
+        expired, without blocking other tasks.
+
+        :param float speed:
+            The speed as a value between -1 and 1: 1 turns the motor at
+            full speed in one direction, -1 turns the motor at full speed in
+            the opposite direction. Defaults to 1.
+
+        :param float t:
+            The time in seconds that the motor should run for. If None is
+            specified, the motor will stay on. The default is None.
+        """
+        if speed > 0:
+            self._backward.off()
+            await self._forward.on_async(speed, t)
+
+        elif speed < 0:
+            self._forward.off()
+            await self._backward.on_async(-speed, t)
+
+        else:
+            self.off()
+
+    async def forward_async(self, speed=1, t=None):
+        """
+        Makes the motor turn "forward", see :meth:`on_async`.
+        """
+        await self.on_async(speed, t)
+
+    async def backward_async(self, speed=1, t=None):
+        """
+        Makes the motor turn "backward", see :meth:`on_async`.
+        """
+        await self.on_async(-speed, t)
+
     def close(self):
         """
         Closes the device and releases any resources. Once closed, the device
@@ -1645,6 +3700,48 @@ class Robot:
         self._left.forward(speed, t, False)
         self._right.backward(speed, t, wait)
 
+    async def forward_async(self, speed=1, t=None):
+        """
+        Makes the robot move "forward". If `t` is given, this can be awaited
+        from a uasyncio task and will return once the time has expired,
+        without blocking other tasks.
+
+        :param float speed:
+            The speed as a value between 0 and 1: 1 is full speed, 0 is stop. Defaults to 1.
+
+        :param float t:
+            The time in seconds that the robot should move for. If None is
+            specified, the robot will continue to move until stopped. The default
+            is None.
+        """
+        await asyncio.gather(
+            self._left.forward_async(speed, t), self._right.forward_async(speed, t)
+        )
+
+    async def backward_async(self, speed=1, t=None):
+        """
+        Makes the robot move "backward", see :meth:`forward_async`.
+        """
+        await asyncio.gather(
+            self._left.backward_async(speed, t), self._right.backward_async(speed, t)
+        )
+
+    async def left_async(self, speed=1, t=None):
+        """
+        Makes the robot turn "left", see :meth:`forward_async`.
+        """
+        await asyncio.gather(
+            self._left.backward_async(speed, t), self._right.forward_async(speed, t)
+        )
+
+    async def right_async(self, speed=1, t=None):
+        """
+        Makes the robot turn "right", see :meth:`forward_async`.
+        """
+        await asyncio.gather(
+            self._left.forward_async(speed, t), self._right.backward_async(speed, t)
+        )
+
     def stop(self):
         """
         Stops the robot.
@@ -1664,6 +3761,60 @@ class Robot:
 Rover = Robot
 
 
+class StepperChange:
+    """
+    Internal class to step a :class:`Stepper` in the background, from the
+    same scheduler as the output devices' value changes.
+
+    :param Stepper stepper:
+        The Stepper to move.
+
+    :param int steps:
+        The number of steps to move.
+
+    :param int direction:
+        1 for clockwise, -1 for counter-clockwise.
+    """
+
+    def __init__(self, stepper, steps, direction):
+        self._stepper = stepper
+        self._steps = steps
+        self._direction = direction
+        self._running = True
+        self._deadline = None
+
+        start = ticks_us()
+        us = self._next_step()
+        if us is not None:
+            _scheduler.add(self, ticks_add(start, us))
+
+    def _service(self, now, deadline=None):
+        if deadline is None:
+            deadline = self._deadline
+        us = self._next_step()
+        if us is None:
+            return None
+        return ticks_add(deadline, us)
+
+    def _next_step(self):
+        # takes the next step and returns how long to wait before the one
+        # after it, so changes to step_delay take effect straight away
+        if self._steps == 0:
+            self._running = False
+            return None
+        self._steps -= 1
+        stepper = self._stepper
+        stepper._move(self._direction)
+        return stepper._step_delay_us
+
+    def stop(self):
+        """
+        Stops the StepperChange object running.
+        """
+        self._running = False
+        _scheduler.remove(self)
+
+
 class Stepper(PinsMixin):
     """
     Represents a stepper motor connected via a driver board (e.g. ULN2003).
@@ -1715,10 +3866,11 @@ class Stepper(PinsMixin):
 
         self._pin_nums = tuple(pins)
         self._pins = tuple(DigitalOutputDevice(pin) for pin in pins)
-        self._step_delay = step_delay
+        self._set_step_delay(step_delay)
         self._steps_per_rotation = steps_per_rotation
         self._current_step = 0
         self._step_count = 0
+        self._stepper_change = None
 
         if step_sequence not in self.STEP_SEQUENCES:
             raise ValueError(
@@ -1754,15 +3906,27 @@ class Stepper(PinsMixin):
             # Numeric direction: positive = clockwise, negative = counter-clockwise
             return 1 if direction >= 0 else -1
 
+    def _set_step_delay(self, step_delay):
+        # the delay in microseconds is worked out here, rather than for each
+        # step, as background steps are taken by the scheduler's Timer
+        # callback, which mustn't allocate memory
+        self._step_delay = step_delay
+        self._step_delay_us = int(step_delay * 1000000)
+
     def _set_step(self, pattern):
         """Set the pin states for a step pattern."""
-        for pin, state in zip(self._pins, pattern):
-            pin.value = state
+        # a plain loop over the pins, which doesn't allocate memory
+        pins = self._pins
+        for i in range(4):
+            pins[i]._write_state(pattern[i])
 
     def _single_step(self, direction=1):
         """Execute a single step in the given direction."""
-        normalised_direction = self._normalise_direction(direction)
+        self._move(self._normalise_direction(direction))
+        sleep(self._step_delay)
 
+    def _move(self, normalised_direction):
+        """Energise the coils for the next step in the given direction."""
         if normalised_direction > 0:  # Clockwise
             self._current_step = (self._current_step + 1) % len(self._sequence)
             self._step_count += 1
@@ -1771,9 +3935,13 @@ class Stepper(PinsMixin):
             self._step_count -= 1
 
         self._set_step(self._sequence[self._current_step])
-        sleep(self._step_delay)
 
-    def step(self, steps, direction=1):
+    def _stop_stepping(self):
+        if self._stepper_change is not None:
+            self._stepper_change.stop()
+            self._stepper_change = None
+
+    def step(self, steps, direction=1, wait=True):
         """
         Move the stepper motor by a number of steps.
 
@@ -1786,13 +3954,31 @@ class Stepper(PinsMixin):
             - String: 'cw'/'clockwise' for clockwise, 'ccw'/'counter-clockwise' for counter-clockwise
             Defaults to 1 (clockwise).
         :type direction: int or str
+
+        :param bool wait:
+            If True (the default), the method will block until the motor has
+            finished moving. If False, the method will return and the motor
+            will move in the background.
         """
         steps = abs(int(steps))
+        self._stop_stepping()
+
+        if wait:
+            for _ in range(steps):
+                self._single_step(direction)
+        else:
+            self._stepper_change = StepperChange(
+                self, steps, self._normalise_direction(direction)
+            )
 
-        for _ in range(steps):
-            self._single_step(direction)
+    @property
+    def is_moving(self):
+        """
+        Returns :data:`True` if the motor is moving in the background.
+        """
+        return self._stepper_change is not None and self._stepper_change._running
 
-    def step_to(self, steps, direction):
+    def step_to(self, steps, direction, wait=True):
         """
         Move to a specific step position from the current position.
 
@@ -1807,6 +3993,10 @@ class Stepper(PinsMixin):
             Direction to move. Accepts:
             - String: 'cw'/'clockwise' for clockwise, 'ccw'/'counter-clockwise' for counter-clockwise
         :type direction: str
+
+        :param bool wait:
+            If True (the default), the method will block until the motor has
+            finished moving. If False, the motor will move in the background.
         """
         target_steps = int(steps)
         current_steps = self._step_count
@@ -1816,16 +4006,16 @@ class Stepper(PinsMixin):
         if normalised_dir > 0:  # Clockwise - move TO absolute position
             distance = target_steps - current_steps
             if distance > 0:
-                self.step(distance, direction)
+                self.step(distance, direction, wait)
             elif distance < 0:
                 # Wrap around clockwise
-                self.step(self._steps_per_rotation + distance, direction)
+                self.step(self._steps_per_rotation + distance, direction, wait)
             # if distance == 0, don't move
         else:  # Counter-clockwise - move BY relative steps
             if target_steps > 0:
-                self.step(target_steps, direction)
+                self.step(target_steps, direction, wait)
 
-    def turn(self, angle, direction):
+    def turn(self, angle, direction, wait=True):
         """
         Turn the stepper motor by a specific angle.
 
@@ -1836,12 +4026,16 @@ class Stepper(PinsMixin):
             Direction to turn. Accepts:
             - String: 'cw'/'clockwise' for clockwise, 'ccw'/'counter-clockwise' for counter-clockwise
         :type direction: str
+
+        :param bool wait:
+            If True (the default), the method will block until the motor has
+            finished moving. If False, the motor will move in the background.
         """
         angle = abs(float(angle))
         steps = int((angle / 360.0) * self._steps_per_rotation)
-        self.step(steps, direction)
+        self.step(steps, direction, wait)
 
-    def rotate(self, rotations, direction):
+    def rotate(self, rotations, direction, wait=True):
         """
         Rotate the stepper motor by full rotations.
 
@@ -1852,12 +4046,16 @@ class Stepper(PinsMixin):
             Direction to rotate. Accepts:
             - String: 'cw'/'clockwise' for clockwise, 'ccw'/'counter-clockwise' for counter-clockwise
         :type direction: str
+
+        :param bool wait:
+            If True (the default), the method will block until the motor has
+            finished moving. If False, the motor will move in the background.
         """
         rotations = abs(float(rotations))
         steps = int(rotations * self._steps_per_rotation)
-        self.step(steps, direction)
+        self.step(steps, direction, wait)
 
-    def turn_to(self, angle, direction):
+    def turn_to(self, angle, direction, wait=True):
         """
         Turn to a specific angle position (0-359 degrees).
 
@@ -1869,6 +4067,10 @@ class Stepper(PinsMixin):
             Direction to turn. Accepts:
             - String: 'cw'/'clockwise' for clockwise, 'ccw'/'counter-clockwise' for counter-clockwise
         :type direction: str
+
+        :param bool wait:
+            If True (the default), the method will block until the motor has
+            finished moving. If False, the motor will move in the background.
         """
         # normalise target angle to 0-359 range
         target_angle = abs(float(angle)) % 360.0
@@ -1891,7 +4093,7 @@ class Stepper(PinsMixin):
         # Convert angle to steps and rotate
         steps = int((rotation_angle / 360.0) * self._steps_per_rotation)
         if steps > 0:
-            self.step(steps, direction)
+            self.step(steps, direction, wait)
 
     def reset_position(self):
         """Reset the step counter to zero (home position)."""
@@ -1899,6 +4101,7 @@ class Stepper(PinsMixin):
 
     def off(self):
         """Turn off all coils to reduce power consumption."""
+        self._stop_stepping()
         self._set_step([0, 0, 0, 0])
 
     def set_speed(self, rpm):
@@ -1920,7 +4123,7 @@ class Stepper(PinsMixin):
         # Total steps per minute = RPM * steps_per_rotation
         # Total steps per second = (RPM * steps_per_rotation) / 60
         # Delay per step = 1 / steps_per_second = 60 / (RPM * steps_per_rotation)
-        self._step_delay = 60.0 / (rpm * self._steps_per_rotation)
+        self._set_step_delay(60.0 / (rpm * self._steps_per_rotation))
 
     def run_continuous(self, seconds=None, direction=1):
         """
@@ -1962,7 +4165,7 @@ class Stepper(PinsMixin):
 
     @step_delay.setter
     def step_delay(self, value):
-        self._step_delay = float(value)
+        self._set_step_delay(float(value))
 
     @property
     def step_count(self):
@@ -2056,6 +4259,9 @@ class Servo(PWMOutputDevice):
             else int(self._min_duty + ((self._max_duty - self._min_duty) * value))
         )
 
+    def _state_key(self):
+        return (self._min_duty, self._max_duty)
+
     def min(self):
         """
         Set the servo to its minimum position.
@@ -2165,8 +4371,22 @@ class DigitalInputDevice(InputDevice, PinMixin):
         self._when_activated = None
         self._when_deactivated = None
 
-        # setup interupt
-        self._pin.irq(self._pin_change, Pin.IRQ_RISING | Pin.IRQ_FALLING)
+        # setup interupt, which also wakes the Pico if it is idle()
+        trigger = Pin.IRQ_RISING | Pin.IRQ_FALLING
+        wakes = SLEEP is not None
+        if wakes:
+            try:
+                self._pin.irq(self._pin_change, trigger, wake=SLEEP)
+            except (TypeError, ValueError):
+                # this port's pins can't wake the Pico from lightsleep
+                wakes = False
+        if not wakes:
+            self._pin.irq(self._pin_change, trigger)
+            _sleepless_inputs.append(self)
+
+        _inputs.append(self)
+        if _input_hook is not None:
+            _input_hook._opened(self)
 
     def _state_to_value(self, state):
         return int(bool(state) == self._active_state)
@@ -2175,8 +4395,12 @@ class DigitalInputDevice(InputDevice, PinMixin):
         return self._state_to_value(self._state)
 
     def _pin_change(self, p):
+        hook = _input_hook
+
         # read the state that triggered the interrupt
         new_state = p.value()
+        if hook is not None:
+            hook._irq(self, new_state)
 
         # did the state actually change from our stored state?
         if self._state != new_state:
@@ -2206,15 +4430,16 @@ class DigitalInputDevice(InputDevice, PinMixin):
                     callback_to_run = self._when_deactivated
 
                 if callback_to_run is not None:
-
-                    def schedule_callback(callback):
-                        callback()
-
                     try:
-                        schedule(schedule_callback, callback_to_run)
+                        if hook is not None:
+                            hook._schedule(self, callback_to_run)
+                        else:
+                            schedule(_run_callback, callback_to_run)
 
                     except RuntimeError as e:
                         if str(e) == "schedule queue full":
+                            if hook is not None:
+                                hook._dropped(self)
                             raise EventFailedScheduleQueueFull(
                                 "{} - {} not run due to the micropython schedule being full".format(
                                     str(self), callback_to_run.__name__
@@ -2227,6 +4452,10 @@ class DigitalInputDevice(InputDevice, PinMixin):
                 # Note: _last_callback_ms is intentionally NOT updated here because we want
                 # to measure time from the last callback, not the last state change.
                 self._state = new_state
+                if hook is not None:
+                    hook._bounced(self)
+        elif hook is not None:
+            hook._unchanged(self)
 
     @property
     def is_active(self):
@@ -2271,6 +4500,10 @@ class DigitalInputDevice(InputDevice, PinMixin):
         """
         self._pin.irq(handler=None)
         self._pin = None
+        if self in _sleepless_inputs:
+            _sleepless_inputs.remove(self)
+        if self in _inputs:
+            _inputs.remove(self)
 
 
 class Switch(DigitalInputDevice):
@@ -0,0 +1,597 @@
+"""
+Timelines, which play keyframes for several output devices from a single
+clock, and animation files, which are played from flash.
+
+They are kept out of the main picozero module, so a program which doesn't
+import ``picozero.timeline`` doesn't use any memory for them::
+
+    from picozero.timeline import Timeline, StreamedTimeline
+"""
+
+from time import ticks_us, ticks_add, ticks_diff, sleep_us
+from array import array
+from struct import pack
+
+from .picozero import _scheduler
+
+
+def _take_control(devices, changer):
+    # stops whatever is changing each device and makes `changer` its value
+    # changer, so that changing the device's value stops `changer`
+    for output_device in devices:
+        output_device._stop_change()
+        output_device._value_changer = changer
+
+
+def _release_control(devices, changer):
+    for output_device in devices:
+        if output_device._value_changer is changer:
+            output_device._value_changer = None
+
+
+# The header of a binary animation file written by Timeline.save
+_ANIMATION_MAGIC = b"PZA\x01"
+_ANIMATION_HEADER_SIZE = 8
+# the size of an event without its values and the most values it can have
+_ANIMATION_EVENT_SIZE = 6
+_ANIMATION_MAX_VALUES = 4
+
+
+class Timeline:
+    """
+    Plays keyframes for several output devices from a single clock, so
+    lights, sounds and movements stay in step with each other::
+
+        from picozero import RGBLED, Speaker, Servo
+        from picozero.timeline import Timeline
+
+        rgb = RGBLED(1, 2, 3)
+        speaker = Speaker(5)
+        servo = Servo(6)
+
+        timeline = Timeline(loop=True)
+        timeline.add(rgb, [(0, (1, 0, 0)), (0.5, (0, 0, 1))])
+        timeline.add(speaker, [(0, (523, 1)), (0.25, (None, 0))])
+        timeline.add(servo, [(0, 0), (0.5, 1)])
+        timeline.play()
+
+    The keyframes of every device are compiled into one list of events,
+    sorted by time, and each event is written by the same scheduler task.
+    Events at the same time (e.g. every device's first keyframe) are
+    written in the same Timer callback.
+
+    Playing the timeline stops anything else changing its devices (e.g.
+    :meth:`~picozero.PWMOutputDevice.blink`), and changing the value of one of its
+    devices stops the timeline.
+
+    :param bool loop:
+        If :data:`True`, the timeline starts again from the beginning when
+        it reaches the end. Defaults to :data:`False`.
+
+    :param float duration:
+        The length of the timeline in seconds, e.g. to leave a gap before
+        it loops. If :data:`None` (the default), it ends at the last
+        keyframe.
+    """
+
+    def __init__(self, loop=False, duration=None):
+        self.loop = loop
+        self._duration = duration
+        self._devices = []
+        self._keyframes = []
+        self._compiled = False
+        self._running = False
+        self._deadline = None
+        self._start = 0
+        self._index = 0
+
+    def add(self, output_device, keyframes):
+        """
+        Adds keyframes for an output device to the timeline.
+
+        :param OutputDevice output_device:
+            The device to change, e.g. a :class:`~picozero.PWMLED`, :class:`~picozero.RGBLED`,
+            :class:`~picozero.Speaker` or :class:`~picozero.Servo`.
+
+        :param keyframes:
+            A list of ``(seconds, value)`` pairs, the time from the start of
+            the timeline at which the device should be set to the value.
+        """
+        if output_device not in self._devices:
+            self._devices.append(output_device)
+        device_id = self._devices.index(output_device)
+        for seconds, value in keyframes:
+            self._keyframes.append(
+                (
+                    int(seconds * 1000000),
+                    device_id,
+                    output_device._value_to_states(value),
+                )
+            )
+        self._compiled = False
+
+    def _add_sequence(self, output_device, generator, start):
+        # adds the (value, seconds) pairs from a generator function (as used
+        # by blink and play) as keyframes one after another
+        keyframes = []
+        for value, seconds in generator():
+            keyframes.append((start, value))
+            start += seconds
+        self.add(output_device, keyframes)
+        return start
+
+    def add_tune(self, speaker, tune, start=0, duration=1, volume=1):
+        """
+        Adds a tune, in any format :meth:`~picozero.Speaker.play` accepts, to the
+        timeline and returns the time, in seconds, at which it ends.
+
+        :param Speaker speaker:
+            The speaker to play the tune.
+
+        :param tune:
+            The tune to play, see :meth:`~picozero.Speaker.play`.
+
+        :param float start:
+            The time, in seconds, the tune starts. Defaults to 0.
+
+        :param float duration:
+            The duration of each note in seconds, if not given in the tune.
+            Defaults to 1.
+
+        :param float volume:
+            The volume of the tune. Defaults to 1.
+        """
+        return self._add_sequence(
+            speaker, speaker._tune_generator(tune, duration, volume), start
+        )
+
+    def add_colors(
+        self,
+        rgbled,
+        colors,
+        start=0,
+        on_times=1,
+        fade_times=0,
+        fps=25,
+        easing="linear",
+    ):
+        """
+        Adds colours, in the format :meth:`~picozero.RGBLED.blink` accepts, to the
+        timeline and returns the time, in seconds, at which they end.
+
+        :param RGBLED rgbled:
+            The RGB LED to change.
+
+        :param colors:
+            The colours to show, see :meth:`~picozero.RGBLED.blink`.
+
+        :param float start:
+            The time, in seconds, the first colour is shown. Defaults to 0.
+
+        The `on_times`, `fade_times`, `fps` and `easing` are the same as
+        for :meth:`~picozero.RGBLED.blink`.
+        """
+        return self._add_sequence(
+            rgbled,
+            rgbled._blink_generator(on_times, fade_times, colors, fps, easing),
+            start,
+        )
+
+    def save(self, path):
+        """
+        Saves the timeline to a file in a compact binary format, which can
+        be played with :class:`StreamedTimeline` without loading it all into
+        memory. :exc:`ValueError` is raised if the timeline doesn't fit the
+        format: more than 256 devices, a device with more than 4 values or
+        a state which doesn't fit in a ``u16``.
+
+        The file starts with the 4 bytes ``PZA\\x01`` and the duration of the
+        timeline in microseconds (a little-endian ``u32``). Each event is then
+        stored as the device's id (its position in the order devices were
+        added, a ``u8``), the number of values (a ``u8``), the time since the
+        previous event in microseconds (a ``u32``) and the device's native
+        state values (e.g. duty cycles), each a ``u16``.
+
+        :param str path:
+            The file to write.
+        """
+        if not self._compiled:
+            self._compile()
+
+        # check everything fits the format before anything is written
+        if len(self._devices) > 256:
+            raise ValueError("an animation file can only hold 256 devices")
+        for device in self._devices:
+            if device._state_width > _ANIMATION_MAX_VALUES:
+                raise ValueError(
+                    "a {} has more than {} values".format(
+                        type(device).__name__, _ANIMATION_MAX_VALUES
+                    )
+                )
+        for state in self._states:
+            if not 0 <= state <= 65535:
+                raise ValueError("state {} doesn't fit in a u16".format(state))
+
+        with open(path, "wb") as f:
+            f.write(_ANIMATION_MAGIC)
+            f.write(pack("<I", self._duration_us))
+            last = 0
+            for i in range(len(self._times)):
+                device = self._devices[self._device_ids[i]]
+                offset = self._offsets[i]
+                width = device._state_width
+                f.write(
+                    pack(
+                        "<BBI",
+                        self._device_ids[i],
+                        width,
+                        self._times[i] - last,
+                    )
+                )
+                for j in range(width):
+                    f.write(pack("<H", self._states[offset + j]))
+                last = self._times[i]
+
+    def _compile(self):
+        # one time-sorted list of events, stored in compact arrays: the time
+        # of each event, which device it is for and where its states start
+        events = sorted(self._keyframes, key=lambda event: event[0])
+        self._times = array("I", (event[0] for event in events))
+        self._device_ids = bytearray(event[1] for event in events)
+        self._offsets = array("I")
+        self._states = array("I")
+        for event in events:
+            self._offsets.append(len(self._states))
+            self._states.extend(event[2])
+
+        if self._duration is not None:
+            self._duration_us = int(self._duration * 1000000)
+        else:
+            self._duration_us = self._times[-1] if events else 0
+        self._compiled = True
+
+    @property
+    def duration(self):
+        """
+        Returns the length of the timeline in seconds.
+        """
+        if not self._compiled:
+            self._compile()
+        return self._duration_us / 1000000
+
+    @property
+    def position(self):
+        """
+        Returns how far, in seconds, the timeline has played.
+        """
+        if not self._running:
+            return 0
+        position = ticks_diff(ticks_us(), self._start)
+        if self.loop and 0 < self._duration_us <= position:
+            # the end of this loop has passed, but the next hasn't been
+            # serviced yet
+            position %= self._duration_us
+        # a timeline aligned to another hasn't started until that one loops
+        return max(0, position) / 1000000
+
+    @property
+    def is_playing(self):
+        """
+        Returns :data:`True` if the timeline is playing.
+        """
+        return self._running
+
+    def play(self, wait=False, align_to=None):
+        """
+        Plays the timeline from the start.
+
+        :param bool wait:
+           If True, the method will block until the timeline has finished
+           (warning: a looping timeline never finishes). If False (the
+           default), the timeline will play in the background.
+
+        :param Timeline align_to:
+           Another looping timeline which is playing. This timeline is
+           started when that one next loops, so they play in phase.
+        """
+        if not self._compiled:
+            self._compile()
+        self.stop()
+        _take_control(self._devices, self)
+
+        start = ticks_us()
+        if align_to is not None and align_to._running:
+            start = align_to._start
+            if align_to._duration_us > 0:
+                while ticks_diff(start, ticks_us()) < 0:
+                    start = ticks_add(start, align_to._duration_us)
+
+        self._start = start
+        self._index = 0
+        self._running = True
+        if not self._times:
+            self.stop()
+            return
+
+        deadline = ticks_add(start, self._times[0])
+        if wait:
+            while deadline is not None:
+                delay_us = ticks_diff(deadline, ticks_us())
+                if delay_us > 0:
+                    sleep_us(delay_us)
+                deadline = self._service(ticks_us())
+        else:
+            if ticks_diff(deadline, ticks_us()) <= 0:
+                # write the first events straight away
+                deadline = self._service(ticks_us())
+            if deadline is not None:
+                _scheduler.add(self, deadline)
+
+    def seek(self, seconds):
+        """
+        Moves the timeline to a position, setting every device to the value
+        it would have at that point.
+
+        :param float seconds:
+            The position, in seconds from the start of the timeline.
+        """
+        if not self._compiled:
+            self._compile()
+
+        position = int(seconds * 1000000)
+        if self.loop and self._duration_us > 0:
+            position %= self._duration_us
+        self.stop()
+        _take_control(self._devices, self)
+
+        # write the latest event for each device up to the position
+        latest = {}
+        index = 0
+        times = self._times
+        while index < len(times) and times[index] <= position:
+            latest[self._device_ids[index]] = index
+            index += 1
+        for i in latest.values():
+            self._write_event(i)
+
+        self._start = ticks_add(ticks_us(), -position)
+        self._index = index
+        self._running = True
+        deadline = self._next_deadline()
+        if deadline is None:
+            self.stop()
+        else:
+            _scheduler.add(self, deadline)
+
+    def stop(self):
+        """
+        Stops the timeline, leaving every device at its current value.
+        """
+        self._running = False
+        _scheduler.remove(self)
+        _release_control(self._devices, self)
+
+    def _write_event(self, i):
+        self._devices[self._device_ids[i]]._write_states(
+            self._states, self._offsets[i]
+        )
+
+    def _next_deadline(self):
+        # returns the deadline of the next event, or None if the timeline is
+        # over; _start stays at the start of the current loop until the
+        # first event of the next one is serviced
+        if self._index == len(self._times):
+            if not self.loop or self._duration_us <= 0:
+                return None
+            return ticks_add(self._start, self._duration_us + self._times[0])
+        return ticks_add(self._start, self._times[self._index])
+
+    def _service(self, now, deadline=None):
+        times = self._times
+        while True:
+            position = ticks_diff(now, self._start)
+            if (
+                self._index == len(times)
+                and self.loop
+                and 0 < self._duration_us <= position
+            ):
+                # start the next loop
+                self._start = ticks_add(self._start, self._duration_us)
+                self._index = 0
+                position -= self._duration_us
+            # write every event that is due
+            while self._index < len(times) and times[self._index] <= position:
+                self._write_event(self._index)
+                self._index += 1
+
+            deadline = self._next_deadline()
+            if deadline is None:
+                self._running = False
+                _release_control(self._devices, self)
+                return None
+            if ticks_diff(deadline, now) > 0:
+                return deadline
+
+
+class StreamedTimeline:
+    """
+    Plays an animation saved with :meth:`Timeline.save`,
+    reading one event at a time from the file through a small buffer which
+    is reused for every event, so the memory it uses doesn't depend on the
+    length of the animation::
+
+        from picozero import RGBLED, Speaker
+        from picozero.timeline import StreamedTimeline
+
+        show = StreamedTimeline("show.pza", (RGBLED(1, 2, 3), Speaker(5)))
+        show.play()
+
+    As with a :class:`Timeline`, playing the animation
+    stops anything else changing its devices, and changing the value of one
+    of them stops the animation. The file is read from the scheduler's Timer
+    callback, so it can't be played in the background with
+    ``configure_scheduler(hard_irq=True)``.
+
+    :param str path:
+        The animation file.
+
+    :param devices:
+        The output devices to play the animation on, in the same order as
+        they were added to the :class:`Timeline` which was
+        saved.
+
+    :param bool loop:
+        If :data:`True`, the animation starts again from the beginning when
+        it reaches the end. Defaults to :data:`False`.
+    """
+
+    def __init__(self, path, devices, loop=False):
+        self._path = path
+        self._devices = tuple(devices)
+        self.loop = loop
+        self._file = None
+        self._running = False
+        self._deadline = None
+
+        self._buffer = bytearray(
+            _ANIMATION_EVENT_SIZE + 2 * _ANIMATION_MAX_VALUES
+        )
+        buffer = memoryview(self._buffer)
+        # views of the buffer for reading an event's header and values,
+        # created once so reading an event doesn't allocate
+        self._event_view = buffer[:_ANIMATION_EVENT_SIZE]
+        self._value_views = tuple(
+            buffer[_ANIMATION_EVENT_SIZE : _ANIMATION_EVENT_SIZE + 2 * width]
+            for width in range(_ANIMATION_MAX_VALUES + 1)
+        )
+        self._states = array("I", [0] * _ANIMATION_MAX_VALUES)
+
+        with open(path, "rb") as f:
+            header = f.read(_ANIMATION_HEADER_SIZE)
+            if (
+                len(header) < _ANIMATION_HEADER_SIZE
+                or header[:4] != _ANIMATION_MAGIC
+            ):
+                raise ValueError("{} is not a picozero animation".format(path))
+            self._duration_us = (
+                header[4] | header[5] << 8 | header[6] << 16 | header[7] << 24
+            )
+
+            # read every event once, so a corrupt file is found now rather
+            # than in the Timer callback while it plays
+            self._file = f
+            self._time_us = 0
+            try:
+                while self._read_event():
+                    pass
+            finally:
+                self._file = None
+
+    @property
+    def is_playing(self):
+        """
+        Returns :data:`True` if the animation is playing.
+        """
+        return self._running
+
+    def play(self, wait=False):
+        """
+        Plays the animation from the start.
+
+        :param bool wait:
+           If True, the method will block until the animation has finished
+           (warning: a looping animation never finishes). If False (the
+           default), the animation will play in the background, which
+           raises :exc:`ValueError` if the scheduler runs as a hard IRQ.
+        """
+        if not wait and _scheduler.hard_irq:
+            # files can't be read from a hard IRQ
+            raise ValueError(
+                "a StreamedTimeline can't play in the background while the "
+                "scheduler runs as a hard IRQ"
+            )
+        self.stop()
+        _take_control(self._devices, self)
+
+        self._file = open(self._path, "rb")
+        self._file.seek(_ANIMATION_HEADER_SIZE)
+        self._loop_start = ticks_us()
+        self._time_us = 0
+        if not self._read_event():
+            self._close()
+            return
+        self._running = True
+
+        deadline = ticks_add(self._loop_start, self._time_us)
+        if wait:
+            while deadline is not None:
+                delay_us = ticks_diff(deadline, ticks_us())
+                if delay_us > 0:
+                    sleep_us(delay_us)
+                deadline = self._service(ticks_us())
+        else:
+            if ticks_diff(deadline, ticks_us()) <= 0:
+                deadline = self._service(ticks_us())
+            if deadline is not None:
+                _scheduler.add(self, deadline)
+
+    def stop(self):
+        """
+        Stops the animation, leaving every device at its current value.
+        """
+        _scheduler.remove(self)
+        self._close()
+
+    def _close(self):
+        self._running = False
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        _release_control(self._devices, self)
+
+    def _read_event(self):
+        # reads the next event into the buffer, returning False at the end
+        # of the file
+        if self._file.readinto(self._event_view) != _ANIMATION_EVENT_SIZE:
+            return False
+        buffer = self._buffer
+        width = buffer[1]
+        if width > _ANIMATION_MAX_VALUES or buffer[0] >= len(self._devices):
+            raise ValueError(
+                "{} is corrupt or not supported by this version of "
+                "picozero".format(self._path)
+            )
+        if self._file.readinto(self._value_views[width]) != 2 * width:
+            return False
+        self._time_us += (
+            buffer[2] | buffer[3] << 8 | buffer[4] << 16 | buffer[5] << 24
+        )
+        return True
+
+    def _write_event(self):
+        buffer = self._buffer
+        states = self._states
+        for j in range(buffer[1]):
+            i = _ANIMATION_EVENT_SIZE + 2 * j
+            states[j] = buffer[i] | buffer[i + 1] << 8
+        self._devices[buffer[0]]._write_states(states, 0)
+
+    def _service(self, now, deadline=None):
+        while True:
+            self._write_event()
+
+            if not self._read_event():
+                if not self.loop or self._duration_us <= 0:
+                    self._close()
+                    return None
+                # start the next loop from the end of this one
+                self._loop_start = ticks_add(self._loop_start, self._duration_us)
+                self._time_us = 0
+                self._file.seek(_ANIMATION_HEADER_SIZE)
+                if not self._read_event():
+                    self._close()
+                    return None
+
+            deadline = ticks_add(self._loop_start, self._time_us)
+            if ticks_diff(deadline, now) > 0:
+                return deadline
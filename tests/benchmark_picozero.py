@@ -0,0 +1,323 @@
+"""
+Benchmarks for picozero's hot paths.
+
+Each benchmark measures how many times an operation can be run per second,
+the mean time each call takes and how much memory each call allocates.
+
+On a computer the benchmarks run with the host backend in
+``picozero_host.py``, under CPython or the unix port of MicroPython::
+
+    python tests/benchmark_picozero.py
+    python tests/benchmark_picozero.py --json results.json
+
+The benchmarks can also be copied to, and run on, a Raspberry Pi Pico. With
+``--json`` the results are written as JSON (to standard output if the path
+is ``-``), so the results of different releases can be compared.
+
+Allocations are measured with ``gc.mem_alloc()`` with the garbage collector
+disabled on MicroPython, which counts every byte allocated. CPython frees
+most objects as soon as they are no longer used, so there ``tracemalloc``
+is used to measure the most memory in use at once during each call.
+"""
+
+import sys
+import gc
+
+if sys.platform != "rp2":
+    # run with the host backend, using the picozero in this repository
+    sys.path.insert(0, __file__.rsplit("/", 2)[0] if "/" in __file__ else "..")
+    import picozero_host
+
+    picozero_host.install()
+    _real_time = picozero_host._real_time
+else:
+    picozero_host = None
+    import time as _real_time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import picozero
+from picozero import (
+    DigitalOutputDevice,
+    PWMOutputDevice,
+    RGBLED,
+    DigitalInputDevice,
+    Speaker,
+    Stepper,
+)
+from picozero.picozero import _scheduler
+from time import ticks_us
+
+
+def _now_us():
+    # the real time, even when the host backend's clock is virtual
+    if hasattr(_real_time, "perf_counter_ns"):
+        return _real_time.perf_counter_ns() // 1000
+    return _real_time.ticks_us()
+
+
+def _elapsed_us(start):
+    if hasattr(_real_time, "perf_counter_ns"):
+        return _now_us() - start
+    return _real_time.ticks_diff(_now_us(), start)
+
+
+def measure_allocations(op, n):
+    """
+    Runs `op(i)` `n` times and returns the bytes allocated per call and how
+    they were measured.
+    """
+    if hasattr(gc, "mem_alloc"):
+        gc.collect()
+        gc.disable()
+        try:
+            before = gc.mem_alloc()
+            for i in range(n):
+                op(i)
+            after = gc.mem_alloc()
+        finally:
+            gc.enable()
+        return (after - before) / n, "gc.mem_alloc"
+
+    if tracemalloc is None:
+        return None, None
+
+    tracemalloc.start()
+    try:
+        total = 0
+        for i in range(n):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            op(i)
+            total += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+    return total / n, "tracemalloc peak"
+
+
+def measure(name, op, n=1000, warmup=10):
+    """
+    Runs `op(i)` `n` times and returns the results as a dictionary.
+    """
+    for i in range(warmup):
+        op(i)
+
+    gc.collect()
+    start = _now_us()
+    for i in range(n):
+        op(i)
+    elapsed = max(1, _elapsed_us(start))
+
+    alloc, method = measure_allocations(op, min(n, 200))
+
+    return {
+        "name": name,
+        "n": n,
+        "total_us": elapsed,
+        "us_per_op": elapsed / n,
+        "ops_per_sec": n * 1000000 / elapsed,
+        "alloc_bytes_per_op": alloc,
+        "alloc_method": method,
+    }
+
+
+###############################################################################
+# BENCHMARKS
+###############################################################################
+
+# each benchmark returns the operation to measure and a function which
+# cleans up after it
+
+
+def bench_digital_output_value_set():
+    d = DigitalOutputDevice(1)
+
+    def op(i):
+        d.value = i & 1
+
+    return op, d.close
+
+
+def bench_digital_output_value_get():
+    d = DigitalOutputDevice(1)
+
+    def op(i):
+        d.value
+
+    return op, d.close
+
+
+def bench_pwm_output_value_set():
+    d = PWMOutputDevice(2)
+    levels = [i / 255 for i in range(256)]
+
+    def op(i):
+        d.value = levels[i & 255]
+
+    return op, d.close
+
+
+def bench_pwm_output_value_get():
+    d = PWMOutputDevice(2)
+    d.value = 0.5
+
+    def op(i):
+        d.value
+
+    return op, d.close
+
+
+def bench_rgbled_value_set():
+    rgb = RGBLED(3, 4, 5)
+    colors = ((1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 1))
+
+    def op(i):
+        rgb.value = colors[i & 3]
+
+    return op, rgb.close
+
+
+def bench_rgbled_value_get():
+    rgb = RGBLED(3, 4, 5)
+    rgb.value = (1, 0.5, 0)
+
+    def op(i):
+        rgb.value
+
+    return op, rgb.close
+
+
+def bench_value_change_frame():
+    # writes the frames of a running pulse the way the scheduler does
+    d = PWMOutputDevice(6)
+    d.pulse(fps=100)
+    change = d._value_changer
+    _scheduler.remove(change)
+    deadline = [change._deadline]
+
+    def op(i):
+        deadline[0] = change._service(ticks_us(), deadline[0])
+
+    return op, d.close
+
+
+def bench_pin_change_dispatch():
+    button = DigitalInputDevice(7, bounce_time=None)
+    button.when_activated = lambda: None
+    button.when_deactivated = lambda: None
+    pin = button._pin
+
+    def op(i):
+        pin.value(i & 1)
+        button._pin_change(pin)
+
+    return op, button.close
+
+
+def bench_speaker_play_setup():
+    speaker = Speaker(8)
+    tune = [["c4", 0.25], ["d4", 0.25], ["e4", 0.25], ["f4", 0.25], ["g4", 1]]
+
+    def op(i):
+        speaker.play(tune, wait=False)
+
+    return op, speaker.close
+
+
+def bench_stepper_step():
+    stepper = Stepper((10, 11, 12, 13), step_delay=0)
+
+    def op(i):
+        stepper.step(1)
+
+    return op, stepper.close
+
+
+BENCHMARKS = [
+    bench_digital_output_value_set,
+    bench_digital_output_value_get,
+    bench_pwm_output_value_set,
+    bench_pwm_output_value_get,
+    bench_rgbled_value_set,
+    bench_rgbled_value_get,
+    bench_value_change_frame,
+    bench_pin_change_dispatch,
+    bench_speaker_play_setup,
+    bench_stepper_step,
+]
+
+
+def run(benchmarks=BENCHMARKS, n=1000):
+    """
+    Runs the benchmarks and returns a list of their results.
+    """
+    results = []
+    for benchmark in benchmarks:
+        op, close = benchmark()
+        try:
+            results.append(measure(benchmark.__name__[6:], op, n))
+        finally:
+            close()
+    return results
+
+
+def _environment():
+    return {
+        "picozero": picozero.__version__,
+        "implementation": sys.implementation.name,
+        "platform": sys.platform,
+        "host": picozero_host is not None,
+    }
+
+
+def print_results(results):
+    print(
+        "{:<28} {:>12} {:>10} {:>12}".format(
+            "benchmark", "ops/sec", "us/op", "bytes/op"
+        )
+    )
+    for result in results:
+        alloc = result["alloc_bytes_per_op"]
+        print(
+            "{:<28} {:>12.0f} {:>10.2f} {:>12}".format(
+                result["name"],
+                result["ops_per_sec"],
+                result["us_per_op"],
+                "-" if alloc is None else "{:.1f}".format(alloc),
+            )
+        )
+
+
+def main(args):
+    json_path = None
+    n = 1000
+    i = 0
+    while i < len(args):
+        if args[i] == "--json":
+            i += 1
+            json_path = args[i]
+        elif args[i] == "-n":
+            i += 1
+            n = int(args[i])
+        i += 1
+
+    results = run(n=n)
+    if json_path is None:
+        print_results(results)
+        return
+
+    import json
+
+    report = {"environment": _environment(), "results": results}
+    if json_path == "-":
+        print(json.dumps(report))
+    else:
+        with open(json_path, "w") as f:
+            f.write(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
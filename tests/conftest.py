@@ -0,0 +1,10 @@
+# Runs the tests with pytest on a computer, using the host backend in place
+# of the Raspberry Pi Pico's machine, micropython and time modules
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import picozero_host
+
+picozero_host.install()
@@ -0,0 +1,318 @@
+"""
+Memory profiling for picozero.
+
+Reports the memory each kind of device holds on to, both for each instance
+and in the tables its class shares between instances (e.g.
+``Speaker.NOTES``), and the memory allocated by each call of common
+operations::
+
+    python tests/memory_picozero.py
+    python tests/memory_picozero.py --json memory.json
+
+Like the benchmarks in ``benchmark_picozero.py``, the profile runs with the
+host backend on a computer or can be run on a Raspberry Pi Pico.
+:data:`THRESHOLDS` holds the most memory each device and operation is
+expected to use, for each way the memory can be measured;
+``test_memory.py`` fails if any of them is exceeded.
+"""
+
+import sys
+import gc
+
+from benchmark_picozero import (
+    measure_allocations,
+    bench_digital_output_value_set,
+    bench_pwm_output_value_set,
+    bench_rgbled_value_set,
+    bench_speaker_play_setup,
+    bench_pin_change_dispatch,
+    _environment,
+)
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from picozero import (
+    DigitalOutputDevice,
+    DigitalLED,
+    PWMOutputDevice,
+    PWMLED,
+    RGBLED,
+    Buzzer,
+    Speaker,
+    Servo,
+    Motor,
+    Stepper,
+    DigitalInputDevice,
+    Button,
+    Potentiometer,
+)
+
+
+def measure_retained(factory, n=4):
+    """
+    Creates `n` objects with `factory(i)` and returns the bytes each one
+    holds on to after a garbage collection, with the objects (which must be
+    kept until the measurement has been made).
+    """
+    objects = [None] * n
+    if hasattr(gc, "mem_alloc"):
+        gc.collect()
+        before = gc.mem_alloc()
+        for i in range(n):
+            objects[i] = factory(i)
+        gc.collect()
+        after = gc.mem_alloc()
+    else:
+        tracemalloc.start()
+        try:
+            gc.collect()
+            before = tracemalloc.get_traced_memory()[0]
+            for i in range(n):
+                objects[i] = factory(i)
+            gc.collect()
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+    return (after - before) / n, objects
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return list(value)
+    return tuple(list(value))
+
+
+def class_bytes(cls):
+    """
+    Returns the bytes held by the dictionaries, lists and tuples defined on
+    `cls` and its picozero base classes, which every instance shares. They
+    are measured by copying them, so the result is approximate.
+    """
+    tables = []
+    for klass in (cls,) + _bases(cls):
+        for value in klass.__dict__.values():
+            if isinstance(value, (dict, list, tuple)) and value:
+                tables.append(value)
+    if not tables:
+        return 0
+    retained, _ = measure_retained(lambda i: [_copy(t) for t in tables], 1)
+    return retained
+
+
+def _bases(cls):
+    bases = ()
+    for base in cls.__bases__:
+        if base is not object:
+            bases += (base,) + _bases(base)
+    return bases
+
+
+# each device is created on pins which don't share PWM channels with the
+# others, so several can be created at once
+DEVICES = [
+    (DigitalOutputDevice, lambda i: DigitalOutputDevice(i)),
+    (DigitalLED, lambda i: DigitalLED(i)),
+    (PWMOutputDevice, lambda i: PWMOutputDevice(i)),
+    (PWMLED, lambda i: PWMLED(i)),
+    (RGBLED, lambda i: RGBLED(i * 3, i * 3 + 1, i * 3 + 2)),
+    (Buzzer, lambda i: Buzzer(i)),
+    (Speaker, lambda i: Speaker(i)),
+    (Servo, lambda i: Servo(i)),
+    (Motor, lambda i: Motor(i * 2, i * 2 + 1)),
+    (Stepper, lambda i: Stepper((i * 4, i * 4 + 1, i * 4 + 2, i * 4 + 3))),
+    (DigitalInputDevice, lambda i: DigitalInputDevice(i)),
+    (Button, lambda i: Button(i)),
+    (Potentiometer, lambda i: Potentiometer(26 + i % 3)),
+]
+
+
+def bench_led_blink():
+    led = PWMLED(9)
+
+    def op(i):
+        led.blink(on_time=0.5, off_time=0.5)
+
+    return op, led.close
+
+
+OPERATIONS = [
+    ("DigitalOutputDevice.value", bench_digital_output_value_set),
+    ("PWMOutputDevice.value", bench_pwm_output_value_set),
+    ("RGBLED.value", bench_rgbled_value_set),
+    ("PWMLED.blink", bench_led_blink),
+    ("Speaker.play", bench_speaker_play_setup),
+    ("DigitalInputDevice._pin_change", bench_pin_change_dispatch),
+]
+
+# The most bytes each device instance may hold on to, and each call of an
+# operation may allocate, by how the memory is measured (the
+# ``alloc_method`` of a report).
+#
+# The "tracemalloc peak" thresholds were set from the host backend under
+# CPython, whose objects are several times the size of MicroPython's. The
+# "gc.mem_alloc" thresholds were set from the host backend under a 32-bit
+# build of MicroPython 1.27, whose objects are the same size as on the
+# Pico; there the host backend's stand-in pins are counted as well, which
+# the Pico's pins don't allocate. Both have some headroom.
+THRESHOLDS = {
+    "tracemalloc peak": {
+        "instance_bytes": {
+            "DigitalOutputDevice": 800,
+            "DigitalLED": 800,
+            "PWMOutputDevice": 1000,
+            "PWMLED": 1000,
+            "RGBLED": 3200,
+            "Buzzer": 800,
+            "Speaker": 2000,
+            "Servo": 1000,
+            "Motor": 2200,
+            "Stepper": 3200,
+            "DigitalInputDevice": 1000,
+            "Button": 1000,
+            "Potentiometer": 800,
+        },
+        "call_bytes": {
+            "DigitalOutputDevice.value": 64,
+            "PWMOutputDevice.value": 128,
+            "RGBLED.value": 512,
+            "PWMLED.blink": 2048,
+            "Speaker.play": 3072,
+            "DigitalInputDevice._pin_change": 512,
+        },
+    },
+    "gc.mem_alloc": {
+        "instance_bytes": {
+            "DigitalOutputDevice": 256,
+            "DigitalLED": 256,
+            "PWMOutputDevice": 320,
+            "PWMLED": 320,
+            "RGBLED": 1280,
+            "Buzzer": 256,
+            "Speaker": 384,
+            "Servo": 320,
+            "Motor": 640,
+            "Stepper": 1024,
+            "DigitalInputDevice": 256,
+            "Button": 256,
+            "Potentiometer": 192,
+        },
+        "call_bytes": {
+            "DigitalOutputDevice.value": 16,
+            "PWMOutputDevice.value": 32,
+            "RGBLED.value": 192,
+            "PWMLED.blink": 1024,
+            "Speaker.play": 3072,
+            "DigitalInputDevice._pin_change": 128,
+        },
+    },
+}
+
+
+def profile(n=4):
+    """
+    Returns the memory used by each device and operation, as a dictionary
+    with the keys ``devices`` and ``operations``.
+    """
+    devices = []
+    for cls, factory in DEVICES:
+        # the first instance can allocate memory which is then shared, e.g.
+        # the scheduler's Timer
+        factory(0).close()
+        instance, objects = measure_retained(factory, n)
+        for obj in objects:
+            obj.close()
+        devices.append(
+            {
+                "class": cls.__name__,
+                "instance_bytes": instance,
+                "class_bytes": class_bytes(cls),
+            }
+        )
+
+    operations = []
+    method = None
+    for name, bench in OPERATIONS:
+        op, close = bench()
+        try:
+            for i in range(10):
+                op(i)
+            call, method = measure_allocations(op, 100)
+        finally:
+            close()
+        operations.append({"name": name, "call_bytes": call})
+
+    return {"devices": devices, "operations": operations, "alloc_method": method}
+
+
+def check(report, thresholds=THRESHOLDS):
+    """
+    Returns a list describing every device and operation in the `report`
+    (from :func:`profile`) which uses more memory than its threshold, for
+    the way the report's memory was measured.
+    """
+    thresholds = thresholds.get(report["alloc_method"])
+    if thresholds is None:
+        return []
+
+    failures = []
+    limits = thresholds["instance_bytes"]
+    for device in report["devices"]:
+        limit = limits.get(device["class"])
+        if limit is not None and device["instance_bytes"] > limit:
+            failures.append(
+                "{} instance holds {:.0f} bytes (limit {})".format(
+                    device["class"], device["instance_bytes"], limit
+                )
+            )
+    limits = thresholds["call_bytes"]
+    for operation in report["operations"]:
+        limit = limits.get(operation["name"])
+        if limit is not None and operation["call_bytes"] > limit:
+            failures.append(
+                "{} allocates {:.0f} bytes per call (limit {})".format(
+                    operation["name"], operation["call_bytes"], limit
+                )
+            )
+    return failures
+
+
+def print_report(report):
+    print("{:<28} {:>16} {:>14}".format("device", "bytes/instance", "class bytes"))
+    for device in report["devices"]:
+        print(
+            "{:<28} {:>16.0f} {:>14.0f}".format(
+                device["class"], device["instance_bytes"], device["class_bytes"]
+            )
+        )
+    print()
+    print("{:<32} {:>12}".format("operation", "bytes/call"))
+    for operation in report["operations"]:
+        print("{:<32} {:>12.1f}".format(operation["name"], operation["call_bytes"]))
+    for failure in check(report):
+        print("over threshold:", failure)
+
+
+def main(args):
+    report = profile()
+    if "--json" not in args:
+        print_report(report)
+        return
+
+    import json
+
+    json_path = args[args.index("--json") + 1]
+    report["environment"] = _environment()
+    if json_path == "-":
+        print(json.dumps(report))
+    else:
+        with open(json_path, "w") as f:
+            f.write(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
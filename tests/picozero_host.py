@@ -0,0 +1,757 @@
+"""
+Host backend for picozero.
+
+Provides stand-in ``machine``, ``micropython`` and ``time`` modules that run
+on a virtual clock, so picozero (and programs written with it) can run under
+CPython or the unix port of MicroPython without a Raspberry Pi Pico.
+
+Time only moves when something sleeps or when the clock is advanced, which
+makes every run deterministic and lets long animations complete instantly::
+
+    import picozero_host
+    clock = picozero_host.install()
+
+    from picozero import LED
+
+    led = LED(1)
+    led.blink()
+    clock.advance(1.5)
+
+To run an existing program or the test suite on the host::
+
+    python tests/picozero_host.py tests/test_picozero.py
+"""
+
+import sys
+
+try:
+    from types import ModuleType
+except ImportError:
+    ModuleType = type(sys)
+
+import time as _real_time
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+
+class TimeLimitReached(KeyboardInterrupt):
+    """
+    Raised in the program being run when the clock passes the limit set with
+    :meth:`VirtualClock.set_time_limit`, as though Ctrl-C had been pressed.
+    """
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + TICKS_HALFPERIOD) & TICKS_MAX) - TICKS_HALFPERIOD
+
+
+class VirtualClock:
+    """
+    A microsecond clock which only moves when it is advanced. Timers
+    registered with the clock fire, in deadline order, as time passes them.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.now_us = 0
+        self._timers = []
+        self._scheduled = []
+        self._irq_depth = 0
+        self.schedule_queue_size = 32
+        # every read of the clock costs this much virtual time, so that code
+        # which busy-waits on ticks_ms() / ticks_us() still makes progress
+        self.read_cost_us = 10
+        self.time_limit_us = None
+        # the number of Timer callbacks which have been run
+        self.timer_callbacks = 0
+        # set when a pin set to wake the Pico (Pin.irq's wake argument)
+        # changes, which ends a lightsleep
+        self.woken = False
+
+    def set_time_limit(self, seconds):
+        """
+        Raises :class:`TimeLimitReached` in the running program once the
+        clock has passed *seconds*, or never if *seconds* is None.
+        """
+        self.time_limit_us = None if seconds is None else int(seconds * 1000000)
+
+    def _check_time_limit(self):
+        if (
+            self.time_limit_us is not None
+            and self.now_us >= self.time_limit_us
+            and not self._irq_depth
+        ):
+            raise TimeLimitReached()
+
+    def _read(self):
+        if self.read_cost_us:
+            if self._irq_depth:
+                # time passes inside an IRQ, but other timers wait for it
+                self.now_us += self.read_cost_us
+            else:
+                self.advance_us(self.read_cost_us)
+        self._check_time_limit()
+        return self.now_us
+
+    def ticks_us(self):
+        return self._read() & TICKS_MAX
+
+    def ticks_ms(self):
+        return (self._read() // 1000) & TICKS_MAX
+
+    def ticks_cpu(self):
+        return self.ticks_us()
+
+    def advance(self, seconds):
+        self.advance_us(int(round(seconds * 1000000)))
+
+    def advance_us(self, us):
+        target = self.now_us + max(0, int(us))
+        while True:
+            timer = self._next_timer()
+            if timer is None or timer._deadline > target:
+                break
+            self.now_us = max(self.now_us, timer._deadline)
+            timer._fire()
+        self.now_us = max(self.now_us, target)
+        self._check_time_limit()
+
+    def at(self, seconds, fn):
+        """
+        Calls *fn* (with no arguments) as an IRQ when the clock reaches
+        *seconds*, e.g. to press a button at a scripted time.
+        """
+        event = _ClockEvent(int(seconds * 1000000), fn)
+        self._timers.append(event)
+        return event
+
+    def run_until_idle(self, limit=3600):
+        """
+        Advances the clock until no timers are armed or *limit* seconds of
+        virtual time have passed.
+        """
+        end = self.now_us + int(limit * 1000000)
+        while True:
+            timer = self._next_timer()
+            if timer is None or timer._deadline > end:
+                return
+            self.advance_us(timer._deadline - self.now_us)
+
+    def next_deadline_us(self):
+        timer = self._next_timer()
+        return None if timer is None else timer._deadline
+
+    def _next_timer(self):
+        armed = [t for t in self._timers if t._deadline is not None]
+        if not armed:
+            return None
+        return min(armed, key=lambda t: (t._deadline, t._seq))
+
+    # --- IRQ context and micropython.schedule ------------------------------
+
+    def irq(self, handler, arg):
+        self._irq_depth += 1
+        try:
+            handler(arg)
+        finally:
+            self._irq_depth -= 1
+        if self._irq_depth == 0:
+            self.run_scheduled()
+
+    def schedule(self, fn, arg):
+        if len(self._scheduled) >= self.schedule_queue_size:
+            raise RuntimeError("schedule queue full")
+        self._scheduled.append((fn, arg))
+        if self._irq_depth == 0:
+            self.run_scheduled()
+
+    def run_scheduled(self):
+        while self._scheduled:
+            fn, arg = self._scheduled.pop(0)
+            fn(arg)
+
+
+class _ClockEvent:
+    _seq = 0
+
+    def __init__(self, deadline, fn):
+        self._deadline = deadline
+        self._fn = fn
+        _ClockEvent._seq -= 1
+        self._seq = _ClockEvent._seq
+
+    def _fire(self):
+        self._deadline = None
+        clock.irq(lambda _: self._fn(), None)
+
+
+clock = VirtualClock()
+
+
+###############################################################################
+# machine
+###############################################################################
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    # every Pin object created, by id, so host code can reach the "wires"
+    pins = {}
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._mode = mode
+        self._pull = pull
+        self._handler = None
+        self._trigger = 0
+        self._wake = None
+        if pull == Pin.PULL_UP:
+            self._state = 1
+        else:
+            self._state = 0
+        if value is not None:
+            self._state = 1 if value else 0
+        Pin.pins[id] = self
+
+    def init(self, mode=-1, pull=-1, value=None):
+        self.__init__(self.id, mode, pull, value)
+
+    def value(self, v=None):
+        if v is None:
+            return self._state
+        self._set(1 if v else 0)
+
+    def on(self):
+        self._set(1)
+
+    def off(self):
+        self._set(0)
+
+    high = on
+    low = off
+
+    def toggle(self):
+        self._set(1 - self._state)
+
+    __call__ = value
+
+    def _set(self, state):
+        self._state = state
+
+    def irq(
+        self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False, wake=None
+    ):
+        self._handler = handler
+        self._trigger = trigger
+        self._wake = wake
+
+    def drive(self, level):
+        """
+        Drives the pin from "outside" (e.g. a button being pressed) and runs
+        the IRQ handler if the edge matches the configured trigger.
+        """
+        level = 1 if level else 0
+        old = self._state
+        self._state = level
+        if self._handler is None or old == level:
+            return
+        if (level and self._trigger & Pin.IRQ_RISING) or (
+            not level and self._trigger & Pin.IRQ_FALLING
+        ):
+            if self._wake is not None:
+                clock.woken = True
+            clock.irq(self._handler, self)
+
+    def __repr__(self):
+        return "Pin({})".format(self.id)
+
+
+class PWM:
+    def __init__(self, pin, freq=None, duty_u16=None):
+        self._pin = pin
+        self._freq = 1000
+        self._duty = 0
+        self._enabled = True
+        if freq is not None:
+            self.freq(freq)
+        if duty_u16 is not None:
+            self.duty_u16(duty_u16)
+
+    def freq(self, f=None):
+        if f is None:
+            return self._freq
+        self._freq = int(f)
+
+    def duty_u16(self, d=None):
+        if d is None:
+            return self._duty
+        self._duty = int(d)
+        self._pin._state = 1 if d else 0
+
+    def deinit(self):
+        self._enabled = False
+
+
+class ADC:
+    CORE_TEMP = 4
+
+    # the onboard temperature sensor reads ~27C
+    _defaults = {4: int(0.706 / 3.3 * 65535)}
+
+    adcs = {}
+
+    def __init__(self, pin):
+        self._pin = pin
+        self._value = ADC._defaults.get(pin, 0)
+        ADC.adcs[pin] = self
+
+    def read_u16(self):
+        # a conversion takes time, so loops which only read an ADC progress
+        clock._read()
+        return self._value
+
+    def set(self, value):
+        self._value = int(value)
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    _seq = 0
+
+    def __init__(self, id=-1, **kwargs):
+        self._deadline = None
+        self._callback = None
+        self._period_us = 0
+        self._mode = Timer.ONE_SHOT
+        self._seq = 0
+        clock._timers.append(self)
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(
+        self,
+        mode=PERIODIC,
+        freq=-1,
+        period=-1,
+        tick_hz=1000,
+        callback=None,
+        hard=False,
+    ):
+        if freq > 0:
+            period_us = int(1000000 / freq)
+        else:
+            period_us = int(period * 1000000 // tick_hz)
+        self._mode = mode
+        self._callback = callback
+        self._period_us = max(0, period_us)
+        self._deadline = clock.now_us + self._period_us
+        Timer._seq += 1
+        self._seq = Timer._seq
+
+    def deinit(self):
+        self._deadline = None
+
+    def _fire(self):
+        clock.timer_callbacks += 1
+        if self._mode == Timer.PERIODIC:
+            self._deadline += max(1, self._period_us)
+        else:
+            self._deadline = None
+        if self._callback is not None:
+            clock.irq(self._callback, self)
+
+
+_irq_state = [0]
+
+
+def disable_irq():
+    _irq_state[0] += 1
+    return _irq_state[0] - 1
+
+
+def enable_irq(state):
+    _irq_state[0] = state
+
+
+SLEEP = 2
+
+
+def lightsleep(ms=None):
+    # sleeps until the time is up (or no timers are armed) or a pin set to
+    # wake the Pico changes
+    end = clock.now_us + (3600000000 if ms is None else ms * 1000)
+    clock.woken = False
+    while not clock.woken:
+        timer = clock._next_timer()
+        if timer is None or timer._deadline > end:
+            if ms is not None:
+                clock.advance_us(end - clock.now_us)
+            return
+        clock.advance_us(timer._deadline - clock.now_us)
+
+
+def idle():
+    pass
+
+
+def freq():
+    return 125000000
+
+
+def unique_id():
+    return b"host"
+
+
+###############################################################################
+# time
+###############################################################################
+
+
+# sleeping briefly releases the GIL, so a thread started with _thread (e.g.
+# the scheduler on the "second core") gets a chance to run
+
+
+def sleep(seconds):
+    _real_time.sleep(0)
+    clock.advance(seconds)
+
+
+def sleep_ms(ms):
+    _real_time.sleep(0)
+    clock.advance_us(ms * 1000)
+
+
+def sleep_us(us):
+    _real_time.sleep(0)
+    clock.advance_us(us)
+
+
+def ticks_ms():
+    return clock.ticks_ms()
+
+
+def ticks_us():
+    return clock.ticks_us()
+
+
+def ticks_cpu():
+    return clock.ticks_cpu()
+
+
+###############################################################################
+# micropython
+###############################################################################
+
+
+def schedule(fn, arg):
+    clock.schedule(fn, arg)
+
+
+def const(value):
+    return value
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+###############################################################################
+# asyncio
+###############################################################################
+
+
+class _VirtualSelector:
+    """
+    Stands in for the event loop's selector: rather than blocking for I/O it
+    moves the virtual clock on to the loop's next timer.
+    """
+
+    def __init__(self):
+        self._map = {}
+
+    def register(self, fileobj, events, data=None):
+        self._map[fileobj] = (events, data)
+
+    def unregister(self, fileobj):
+        return self._map.pop(fileobj, None)
+
+    def modify(self, fileobj, events, data=None):
+        self._map[fileobj] = (events, data)
+
+    def select(self, timeout=None):
+        if timeout is None:
+            clock.run_until_idle()
+        elif timeout > 0:
+            clock.advance(timeout)
+        return []
+
+    def get_map(self):
+        return self._map
+
+    def close(self):
+        self._map.clear()
+
+
+def _install_asyncio():
+    try:
+        import asyncio
+        import selectors
+    except ImportError:
+        # MicroPython's asyncio uses the (virtual) time module directly
+        return
+
+    class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+        def __init__(self):
+            super().__init__(_VirtualSelector())
+
+        def time(self):
+            return clock.now_us / 1000000
+
+        def _make_self_pipe(self):
+            pass
+
+        def _close_self_pipe(self):
+            pass
+
+        def _write_to_self(self):
+            pass
+
+    class VirtualTimePolicy(asyncio.DefaultEventLoopPolicy):
+        def new_event_loop(self):
+            return VirtualTimeEventLoop()
+
+    asyncio.set_event_loop_policy(VirtualTimePolicy())
+
+
+def replay_inputs(edges):
+    """
+    Replays input edges, e.g. from ``picozero.debug.InputRecorder.load``, moving
+    the clock on to each edge's time (relative to now) and running the pin's
+    IRQ handler as the edge did, so debouncing and callbacks see exactly what
+    was recorded. A capture of any length replays as fast as it can be
+    processed.
+
+    :param edges:
+        A list of ``(time in microseconds, pin, level)`` tuples.
+    """
+    start = clock.now_us
+    for time_us, pin, level in edges:
+        target = start + time_us
+        if target > clock.now_us:
+            clock.advance_us(target - clock.now_us)
+        p = Pin.pins[pin]
+        p._state = level
+        if p._handler is not None:
+            # every recorded edge raised an interrupt, even a bounce that
+            # read back the level the pin was already at
+            clock.irq(p._handler, p)
+
+
+# builtins which allocate memory on MicroPython every time they are called
+ALLOCATING_BUILTINS = frozenset(
+    (
+        "zip",
+        "enumerate",
+        "map",
+        "filter",
+        "reversed",
+        "sorted",
+        "iter",
+        "list",
+        "tuple",
+        "dict",
+        "set",
+        "float",
+        "int",
+        "str",
+        "bytes",
+        "bytearray",
+        "array",
+    )
+)
+
+# bytecode which makes a new object
+_ALLOCATING_OPS = frozenset(
+    (
+        "BUILD_LIST",
+        "BUILD_TUPLE",
+        "BUILD_MAP",
+        "BUILD_CONST_KEY_MAP",
+        "BUILD_SET",
+        "BUILD_SLICE",
+        "BUILD_STRING",
+        "BINARY_SLICE",
+        "FORMAT_VALUE",
+        "LIST_APPEND",
+        "MAKE_FUNCTION",
+    )
+)
+
+
+def _allocating_ops(code):
+    # returns the reason each line of `code` allocates memory, by line number
+    import dis
+
+    reasons = {}
+    line = None
+    for ins in dis.get_instructions(code):
+        if hasattr(ins, "line_number"):
+            line = ins.line_number
+        elif ins.starts_line is not None:
+            line = ins.starts_line
+
+        reason = None
+        if ins.opname in _ALLOCATING_OPS:
+            reason = ins.opname
+        elif ins.opname == "LOAD_GLOBAL" and ins.argval in ALLOCATING_BUILTINS:
+            # from Python 3.11 a global which is called pushes a NULL too
+            if ins.argrepr.startswith("NULL") or sys.version_info < (3, 11):
+                reason = "calls " + ins.argval
+        elif ins.opname == "BINARY_OP" and ins.argrepr in ("/", "/="):
+            reason = "divides into a float"
+        elif ins.opname == "LOAD_CONST" and type(ins.argval) is float:
+            reason = "uses a float"
+        if reason is not None and line is not None:
+            reasons.setdefault(line, reason)
+    return reasons
+
+
+def allocating_lines(op, filename):
+    """
+    Runs `op()` and returns a list describing each line of the file
+    `filename` which ran and which allocates memory on MicroPython: it
+    builds a list, tuple, dictionary, string or function, calls one of
+    :data:`ALLOCATING_BUILTINS`, or works with floats.
+
+    CPython allocates every integer larger than 256, so measuring code with
+    tracemalloc can't show whether it would allocate on a Pico; this is used
+    instead of ``gc.mem_alloc()`` to check that code which runs in an
+    interrupt doesn't allocate.
+    """
+    ran = set()
+
+    def trace_lines(frame, event, arg):
+        if event == "line":
+            ran.add((frame.f_code, frame.f_lineno))
+        return trace_lines
+
+    def trace_calls(frame, event, arg):
+        if frame.f_code.co_filename == filename:
+            return trace_lines
+        return None
+
+    sys.settrace(trace_calls)
+    try:
+        op()
+    finally:
+        sys.settrace(None)
+
+    lines = []
+    reasons = {}
+    for code, line in ran:
+        if code not in reasons:
+            reasons[code] = _allocating_ops(code)
+        if line in reasons[code]:
+            lines.append("line {}: {}".format(line, reasons[code][line]))
+    return sorted(lines)
+
+
+def _build_modules():
+    machine = ModuleType("machine")
+    for name in (
+        "Pin",
+        "PWM",
+        "ADC",
+        "Timer",
+        "disable_irq",
+        "enable_irq",
+        "lightsleep",
+        "idle",
+        "SLEEP",
+        "freq",
+        "unique_id",
+    ):
+        setattr(machine, name, globals()[name])
+
+    micropython = ModuleType("micropython")
+    for name in ("schedule", "const", "alloc_emergency_exception_buf"):
+        setattr(micropython, name, globals()[name])
+
+    time = ModuleType("time")
+    for name in (
+        "sleep",
+        "sleep_ms",
+        "sleep_us",
+        "ticks_ms",
+        "ticks_us",
+        "ticks_cpu",
+        "ticks_add",
+        "ticks_diff",
+    ):
+        setattr(time, name, globals()[name])
+
+    def _getattr(name):
+        return getattr(_real_time, name)
+
+    time.__getattr__ = _getattr
+    for name in ("time", "time_ns", "monotonic", "perf_counter", "localtime"):
+        if hasattr(_real_time, name):
+            setattr(time, name, getattr(_real_time, name))
+
+    return {"machine": machine, "micropython": micropython, "time": time}
+
+
+def install():
+    """
+    Installs the stand-in modules into ``sys.modules`` and returns the
+    :class:`VirtualClock` that drives them. Call this before importing
+    picozero.
+    """
+    sys.modules.update(_build_modules())
+    _install_asyncio()
+    return clock
+
+
+if __name__ == "__main__":
+    import os
+
+    if len(sys.argv) < 2:
+        print("usage: picozero_host.py program.py [args...]")
+        sys.exit(2)
+
+    # so the program shares this clock if it imports picozero_host
+    sys.modules["picozero_host"] = sys.modules[__name__]
+
+    program = sys.argv[1]
+    sys.argv = sys.argv[1:]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, root)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(program)))
+    install()
+
+    try:
+        import runpy
+
+        runpy.run_path(program, run_name="__main__")
+    except ImportError:
+        # the unix port of MicroPython has no runpy
+        with open(program) as f:
+            exec(f.read(), {"__name__": "__main__", "__file__": program})
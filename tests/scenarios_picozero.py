@@ -0,0 +1,277 @@
+"""
+Benchmark scenarios built from the programs in ``docs/examples``.
+
+Each example is run headless with the host backend in ``picozero_host.py``,
+on a virtual clock, for a few seconds of virtual time. Buttons, sensors and
+potentiometers are driven by scripted input events, and programs which
+never finish are stopped, as though Ctrl-C was pressed, when their time is
+up. Every run reports:
+
+* ``cpu_ms`` - the processor time the run took
+* ``heap_peak_bytes`` - the most memory allocated at once by the program,
+  not counting importing picozero (CPython only)
+* ``timers`` and ``timer_callbacks`` - the Timers created and how many times
+  their callbacks ran
+* ``pin_writes`` - the levels and duty cycles written to output pins
+* ``frames``, ``late_max_us`` and ``late_mean_us`` - the background output
+  changes written and how late they were (see
+  :func:`picozero.timing_stats`)
+
+Run every scenario, or only those named::
+
+    python tests/scenarios_picozero.py
+    python tests/scenarios_picozero.py rgb_cycle speaker_tune
+    python tests/scenarios_picozero.py --json scenarios.json
+"""
+
+import sys
+import gc
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import picozero_host
+
+picozero_host.install()
+_real_time = picozero_host._real_time
+clock = picozero_host.clock
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from benchmark_picozero import _environment
+
+EXAMPLES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docs", "examples"
+)
+
+# how long, in seconds of virtual time, a scenario runs for unless it sets
+# its own duration
+DURATION = 5
+
+
+def press(pin, at, hold=0.5, active=0):
+    """
+    Returns the events which press a button (pulled up, so active low by
+    default) at `at` seconds and release it `hold` seconds later.
+    """
+    return [(at, pin, active), (at + hold, pin, 1 - active)]
+
+
+def presses(pin, count, every=1, hold=0.5, active=0):
+    events = []
+    for i in range(count):
+        events += press(pin, 0.5 + i * every, hold, active)
+    return events
+
+
+def adc(pin, values, every=0.5):
+    """
+    Returns the events which set an ADC's reading to each of `values`
+    (between 0 and 1) in turn, `every` seconds.
+    """
+    return [(i * every, ("adc", pin), value) for i, value in enumerate(values)]
+
+
+# The input events and virtual duration of the examples which need them. Each
+# event is (seconds, pin, level) or (seconds, ("adc", pin), value).
+SCENARIOS = {
+    "button_function": {"events": presses(18, 3, every=1.5)},
+    "button_is_pressed": {"events": presses(18, 3, every=1.5)},
+    "button_led": {"events": presses(18, 4)},
+    "motion_sensor": {"events": presses(2, 3, every=1.5, active=1)},
+    "motion_sensor_callbacks": {"events": presses(2, 4, active=1)},
+    "touch_sensor": {"events": presses(2, 3, every=1.5, active=1)},
+    "touch_sensor_callbacks": {"events": presses(2, 4, active=1)},
+    "pot_led": {"events": adc(26, [0, 0.25, 0.5, 0.75, 1]), "duration": 1},
+    "potentiometer": {"events": adc(26, [0, 0.25, 0.5, 0.75, 1])},
+    "ultrasonic_distance_sensor": {"duration": 2},
+    "rgb_cycle": {"duration": 15},
+    "robot_rover_square": {"duration": 10},
+    "speaker_tune": {"duration": 20},
+    "servo_sweep": {"duration": 12},
+    "stepper_analog_clock": {"duration": 10},
+    "stepper_automatic_blinds": {"duration": 30},
+}
+
+
+class _Discard:
+    # stands in for sys.stdout, so the examples' output isn't printed
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def _reset():
+    # forget every device and import picozero again, so each scenario starts
+    # from a freshly booted Pico
+    clock.reset()
+    picozero_host.Pin.pins.clear()
+    picozero_host.ADC.adcs.clear()
+    for name in list(sys.modules):
+        if name == "picozero" or name.startswith("picozero."):
+            del sys.modules[name]
+    gc.collect()
+
+
+def _drive(pin, level):
+    def drive():
+        if isinstance(pin, tuple):
+            adc = picozero_host.ADC.adcs.get(pin[1])
+            if adc is not None:
+                adc.set(level * 65535)
+        else:
+            p = picozero_host.Pin.pins.get(pin)
+            if p is not None:
+                p.drive(level)
+
+    return drive
+
+
+def _cpu_ms():
+    if hasattr(_real_time, "process_time"):
+        return _real_time.process_time() * 1000
+    return _real_time.ticks_ms()
+
+
+def run_scenario(name):
+    """
+    Runs the example called `name` and returns its results as a dictionary.
+    """
+    scenario = SCENARIOS.get(name, {})
+    duration = scenario.get("duration", DURATION)
+    with open(os.path.join(EXAMPLES, name + ".py")) as f:
+        code = compile(f.read(), name + ".py", "exec")
+
+    _reset()
+    timers = []
+    timer_init = picozero_host.Timer.__init__
+
+    def counting_init(self, *args, **kwargs):
+        timers.append(self)
+        timer_init(self, *args, **kwargs)
+
+    picozero_host.Timer.__init__ = counting_init
+
+    import picozero
+    from picozero.debug import PinRecorder
+
+    picozero.configure_scheduler(timing=True)
+    recorder = PinRecorder(size=16)
+    recorder.start()
+
+    if tracemalloc is not None:
+        tracemalloc.start()
+    stdout = sys.stdout
+    sys.stdout = _Discard()
+    start = _cpu_ms()
+    error = None
+    try:
+        for at, pin, level in scenario.get("events", ()):
+            clock.at(at, _drive(pin, level))
+
+        clock.set_time_limit(duration)
+        try:
+            exec(code, {"__name__": "__main__"})
+        except KeyboardInterrupt:
+            pass
+        # let anything still running in the background finish its time
+        clock.set_time_limit(None)
+        if clock.now_us < duration * 1000000:
+            clock.advance_us(duration * 1000000 - clock.now_us)
+    except Exception as e:
+        error = "{}: {}".format(type(e).__name__, e)
+    finally:
+        clock.set_time_limit(None)
+        cpu_ms = _cpu_ms() - start
+        recorder.stop()
+        sys.stdout = stdout
+        picozero_host.Timer.__init__ = timer_init
+        peak = None
+        if tracemalloc is not None:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    stats = picozero.timing_stats()
+    return {
+        "name": name,
+        "virtual_s": clock.now_us / 1000000,
+        "cpu_ms": cpu_ms,
+        "heap_peak_bytes": peak,
+        "timers": len(timers),
+        "timer_callbacks": clock.timer_callbacks,
+        "pin_writes": len(recorder.changes()) + recorder.overwritten,
+        "frames": stats.get("frames", 0),
+        "late_max_us": stats.get("late_max_us", 0),
+        "late_mean_us": stats.get("late_mean_us", 0),
+        "error": error,
+    }
+
+
+def scenario_names():
+    """
+    Returns the name of every example in ``docs/examples``.
+    """
+    return sorted(f[:-3] for f in os.listdir(EXAMPLES) if f.endswith(".py"))
+
+
+def print_results(results):
+    print(
+        "{:<26} {:>7} {:>9} {:>6} {:>9} {:>6} {:>6} {:>8}".format(
+            "scenario",
+            "cpu ms",
+            "heap peak",
+            "timers",
+            "callbacks",
+            "writes",
+            "frames",
+            "late max",
+        )
+    )
+    for result in results:
+        peak = result["heap_peak_bytes"]
+        print(
+            "{:<26} {:>7.0f} {:>9} {:>6} {:>9} {:>6} {:>6} {:>8}".format(
+                result["name"],
+                result["cpu_ms"],
+                "-" if peak is None else peak,
+                result["timers"],
+                result["timer_callbacks"],
+                result["pin_writes"],
+                result["frames"],
+                result["late_max_us"],
+            )
+        )
+        if result["error"]:
+            print("    failed:", result["error"])
+
+
+def main(args):
+    json_path = None
+    if "--json" in args:
+        i = args.index("--json")
+        json_path = args[i + 1]
+        args = args[:i] + args[i + 2 :]
+
+    results = [run_scenario(name) for name in args or scenario_names()]
+    if json_path is None:
+        print_results(results)
+        return
+
+    import json
+
+    report = {"environment": _environment(), "results": results}
+    if json_path == "-":
+        print(json.dumps(report))
+    else:
+        with open(json_path, "w") as f:
+            f.write(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
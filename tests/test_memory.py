@@ -0,0 +1,43 @@
+import unittest
+
+import memory_picozero
+
+
+class TestMemory(unittest.TestCase):
+    def test_memory_thresholds(self):
+        report = memory_picozero.profile()
+        if report["alloc_method"] not in memory_picozero.THRESHOLDS:
+            self.skipTest("no thresholds are set for " + str(report["alloc_method"]))
+
+        names = [device["class"] for device in report["devices"]]
+        self.assertIn("Speaker", names)
+        speaker = report["devices"][names.index("Speaker")]
+        # the NOTES table is shared by every Speaker
+        self.assertGreater(speaker["class_bytes"], speaker["instance_bytes"])
+
+        self.assertEqual(memory_picozero.check(report), [])
+
+    def test_memory_check(self):
+        report = {
+            "alloc_method": "tracemalloc peak",
+            "devices": [{"class": "RGBLED", "instance_bytes": 10000}],
+            "operations": [{"name": "RGBLED.value", "call_bytes": 0}],
+        }
+        failures = memory_picozero.check(report)
+        self.assertEqual(len(failures), 1)
+        self.assertIn("RGBLED", failures[0])
+
+        # MicroPython's objects are smaller, so its thresholds are too
+        report = {
+            "alloc_method": "gc.mem_alloc",
+            "devices": [{"class": "RGBLED", "instance_bytes": 2000}],
+            "operations": [{"name": "RGBLED.value", "call_bytes": 256}],
+        }
+        self.assertEqual(len(memory_picozero.check(report)), 2)
+
+        report["alloc_method"] = None
+        self.assertEqual(memory_picozero.check(report), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,34 @@
 import unittest
+import asyncio
+import gc
+import os
+from io import StringIO
 from picozero import *
-from time import ticks_ms
+from picozero.debug import (
+    PinRecorder,
+    profile_callbacks,
+    callback_stats,
+    reset_callback_stats,
+    InputRecorder,
+    count_events,
+    event_stats,
+    reset_event_stats,
+)
+from picozero.timeline import Timeline, StreamedTimeline
+from picozero.picozero import (
+    _scheduler,
+    TimingStats,
+    _pwm_slice_address,
+    _pwm_duty_to_cc,
+    _pwm_fade_words,
+    _PWM_CC,
+    _PWM_TOP,
+    _PWM_FADE_MAX_TRANSFERS,
+    _DREQ_PWM_WRAP0,
+    _easing_table,
+    PWMFade,
+)
+from time import ticks_ms, ticks_us, ticks_diff, sleep
 
 
 def log_device_values(d, timeout):
@@ -66,6 +94,17 @@ class MockEvent:
         self._is_set = False
 
 
+class FailingTask:
+    # a scheduler task which fails, e.g. like a file read error
+    _running = True
+
+    def _service(self, now, deadline=None):
+        raise OSError("read failed")
+
+    def stop(self):
+        pass
+
+
 class Testpicozero(unittest.TestCase):
 
     def assertInRange(self, value, lower, upper):
@@ -140,6 +179,912 @@ class Testpicozero(unittest.TestCase):
 
         d.close()
 
+    def test_scheduler_shared_timer(self):
+        d1 = DigitalOutputDevice(1)
+        d2 = DigitalOutputDevice(2)
+
+        d1.blink(on_time=0.1, off_time=0.1, n=2)
+        d2.blink(on_time=0.15, off_time=0.15, n=1)
+        self.assertEqual(_scheduler._size, 2)
+
+        values = log_device_values(d2, 0.5)
+        self.assertEqual(values, [1, 0])
+        self.assertFalse(d1.value)
+        self.assertEqual(_scheduler._size, 0)
+
+        d1.blink()
+        d1.off()
+        self.assertEqual(_scheduler._size, 0)
+
+        d1.close()
+        d2.close()
+
+    def test_scheduler_timer_during_remove(self):
+        d1 = DigitalOutputDevice(1)
+        d2 = DigitalOutputDevice(2)
+        d1.blink(on_time=0.01, off_time=0.01, n=2)
+        d2.blink(on_time=0.01, off_time=0.01)
+
+        remove_at = _scheduler._remove_at
+
+        def timer_then_remove_at(i):
+            # the one-shot Timer calls back while the heap is being changed
+            _scheduler._timer.deinit()
+            _scheduler._service(_scheduler._timer)
+            remove_at(i)
+
+        _scheduler._remove_at = timer_then_remove_at
+        try:
+            d2.value = 0
+        finally:
+            del _scheduler._remove_at
+
+        # the other blink carries on
+        sleep(0.1)
+        self.assertIsNone(d1._value_changer)
+        self.assertEqual(_scheduler._size, 0)
+
+        d1.close()
+        d2.close()
+
+    def test_scheduler_task_error(self):
+        d = DigitalOutputDevice(1)
+        d.blink(on_time=0.01, off_time=0.01, n=2)
+        _scheduler.add(FailingTask(), ticks_us() + 5000)
+        with self.assertRaises(OSError):
+            sleep(0.1)
+        self.assertFalse(_scheduler._busy)
+        self.assertFalse(_scheduler._in_hard_irq)
+
+        # the failing task is dropped and the blink carries on
+        sleep(0.1)
+        self.assertIsNone(d._value_changer)
+        self.assertEqual(_scheduler._size, 0)
+
+        d.blink(on_time=0.01, off_time=0.01, n=1, wait=True)
+        self.assertFalse(d.value)
+
+        d.close()
+
+    def test_scheduler_no_drift(self):
+        d = DigitalOutputDevice(1)
+
+        # 1/30 of a second can't be represented in whole milliseconds
+        start = ticks_ms()
+        d.blink(on_time=1 / 30, off_time=1 / 30, n=30)
+        while d._value_changer is not None and ticks_diff(ticks_ms(), start) < 3000:
+            pass
+        self.assertInRange(ticks_diff(ticks_ms(), start), 1990, 2030)
+
+        d.close()
+
+    def test_scheduler_late_policy(self):
+        d = DigitalOutputDevice(1)
+
+        for policy, expected_deadline in (("skip", 400000), ("stretch", 450000)):
+            configure_scheduler(late_policy=policy)
+
+            start = ticks_us()
+            d.blink(on_time=0.1, off_time=0.1)
+            change = d._value_changer
+
+            # hold the scheduler up so it misses 3 frames
+            _scheduler._busy = True
+            while ticks_diff(ticks_us(), start) < 350000:
+                pass
+            _scheduler._busy = False
+            _scheduler._service()
+
+            self.assertEqual(d.value, 0)
+            self.assertInRange(
+                ticks_diff(change._deadline, start),
+                expected_deadline - 2000,
+                expected_deadline + 2000,
+            )
+            d.off()
+
+        configure_scheduler(late_policy="skip")
+        with self.assertRaises(ValueError):
+            configure_scheduler(late_policy="unknown")
+
+        d.close()
+
+    def test_scheduler_microsecond_frames(self):
+        d = PWMBuzzer(10)
+
+        edges = []
+        last = d.value
+        d.beep(on_time=0.0005, off_time=0.0005, n=10)
+        start = ticks_us()
+        while d._value_changer is not None and ticks_diff(ticks_us(), start) < 100000:
+            value = d.value
+            if value != last:
+                edges.append(ticks_us())
+                last = value
+
+        intervals = [ticks_diff(b, a) for a, b in zip(edges, edges[1:])]
+        self.assertEqual(len(intervals), 19)
+        for interval in intervals:
+            self.assertInRange(interval, 400, 600)
+
+        d.close()
+
+    def assertFramesDoNotAllocate(self, n=20):
+        # services the scheduler as its Timer would, n times, once frames
+        # have been held up long enough for some to be late
+        start = ticks_us()
+        _scheduler._busy = True
+        while ticks_diff(ticks_us(), start) < 300000:
+            pass
+        _scheduler._busy = False
+
+        def frames():
+            for i in range(n):
+                while ticks_diff(_scheduler._heap[0]._deadline, ticks_us()) > 0:
+                    pass
+                _scheduler._service(_scheduler._timer)
+
+        if hasattr(gc, "mem_alloc"):
+            gc.collect()
+            before = gc.mem_alloc()
+            frames()
+            self.assertEqual(gc.mem_alloc() - before, 0)
+        else:
+            # CPython allocates every integer, so look for the calls which
+            # allocate on MicroPython instead
+            import picozero.picozero as pz
+            import picozero_host
+
+            self.assertEqual(picozero_host.allocating_lines(frames, pz.__file__), [])
+
+    def test_scheduler_frames_do_not_allocate(self):
+        for late_policy in ("skip", "catch_up"):
+            for hard_irq in (False, True):
+                configure_scheduler(
+                    late_policy=late_policy, hard_irq=hard_irq, timing=True
+                )
+
+                d = PWMLED(1)
+                d.pulse(fade_in_time=0.2, fade_out_time=0.2, fps=100)
+                self.assertFramesDoNotAllocate()
+                d.close()
+
+                rgb = RGBLED(2, 4, 6)
+                rgb.pulse(fade_times=0.2, fps=100)
+                self.assertFramesDoNotAllocate()
+                rgb.close()
+
+                stepper = Stepper((8, 9, 10, 11), step_delay=0.005)
+                stepper.step(1000, wait=False)
+                self.assertFramesDoNotAllocate()
+                stepper.close()
+
+        configure_scheduler(late_policy="skip", hard_irq=False, timing=False)
+
+    def test_timing_stats_stay_small(self):
+        # the totals the means are worked out from never outgrow a small
+        # integer, which would allocate
+        stats = TimingStats()
+        for i in range(100):
+            stats._record(1 << 27, 100)
+        self.assertLessEqual(stats._late_total, 2 * TimingStats.TOTAL_LIMIT)
+        result = stats.as_dict()
+        self.assertEqual(result["frames"], 100)
+        self.assertEqual(result["late_mean_us"], 1 << 27)
+        self.assertEqual(result["write_mean_us"], 100)
+
+    def test_timing_stats(self):
+        d1 = DigitalOutputDevice(1)
+        d2 = DigitalOutputDevice(2)
+
+        configure_scheduler(timing=True)
+        reset_timing_stats()
+
+        d1.blink(on_time=0.01, off_time=0.01, n=5, wait=True)
+        d2.blink(on_time=0.01, off_time=0.01, n=5, wait=True)
+
+        stats = timing_stats()
+        self.assertEqual(stats["frames"], 20)
+        self.assertEqual(sum(n for bound, n in stats["late_histogram"]), 20)
+        self.assertIsNone(stats["late_histogram"][-1][0])
+        self.assertTrue(stats["late_min_us"] <= stats["late_mean_us"])
+        self.assertTrue(stats["late_mean_us"] <= stats["late_max_us"])
+        self.assertTrue(stats["write_mean_us"] <= stats["write_max_us"])
+
+        self.assertEqual(timing_stats(d1)["frames"], 10)
+        self.assertEqual(timing_stats(d2)["frames"], 10)
+
+        reset_timing_stats(d1)
+        self.assertEqual(timing_stats(d1)["frames"], 0)
+        self.assertEqual(timing_stats()["frames"], 20)
+
+        configure_scheduler(timing=False)
+        d1.blink(on_time=0.01, off_time=0.01, n=1, wait=True)
+        self.assertEqual(timing_stats()["frames"], 20)
+
+        reset_timing_stats()
+        self.assertEqual(timing_stats()["frames"], 0)
+
+        d1.close()
+        d2.close()
+
+    def test_scheduler_second_core(self):
+        try:
+            import _thread
+        except ImportError:
+            self.skipTest("_thread is not available")
+
+        d = DigitalOutputDevice(1)
+        stepper = Stepper((2, 3, 4, 5), step_delay=0.001)
+
+        configure_scheduler(second_core=True)
+        try:
+            d.blink(on_time=0.01, off_time=0.01, n=2)
+            stepper.step(10, wait=False)
+
+            start = ticks_ms()
+            while (
+                d._value_changer is not None or stepper.is_moving
+            ) and ticks_diff(ticks_ms(), start) < 1000:
+                sleep(0.001)
+
+            self.assertIsNone(d._value_changer)
+            self.assertFalse(d.value)
+            self.assertEqual(stepper.step_count, 10)
+
+            # changing a device stops its background change
+            d.blink(on_time=0.01, off_time=0.01)
+            d.value = 1
+            sleep(0.05)
+            self.assertEqual(d.value, 1)
+        finally:
+            configure_scheduler(second_core=False)
+
+        self.assertTrue(_scheduler._thread_done)
+        d.blink(on_time=0.01, off_time=0.01, n=1, wait=True)
+
+        d.close()
+        stepper.close()
+
+    def test_scheduler_second_core_task_error(self):
+        try:
+            import _thread
+        except ImportError:
+            self.skipTest("_thread is not available")
+
+        import sys
+
+        # CPython reports the thread's exception, which is expected here
+        unraisablehook = getattr(sys, "unraisablehook", None)
+        if unraisablehook is not None:
+            sys.unraisablehook = lambda unraisable: None
+
+        d = DigitalOutputDevice(1)
+        configure_scheduler(second_core=True)
+        try:
+            # the thread stops when the task fails
+            _scheduler.add(FailingTask(), ticks_us())
+            start = ticks_ms()
+            while not _scheduler._thread_done and ticks_diff(ticks_ms(), start) < 1000:
+                sleep(0.001)
+            self.assertTrue(_scheduler._thread_done)
+            self.assertFalse(_scheduler._thread_running)
+            self.assertIsNone(_scheduler._lock)
+
+            # and the Timer services the other tasks
+            d.blink(on_time=0.01, off_time=0.01, n=1, wait=True)
+            self.assertFalse(d.value)
+            self.assertEqual(_scheduler._size, 0)
+        finally:
+            configure_scheduler(second_core=False)
+            if unraisablehook is not None:
+                sys.unraisablehook = unraisablehook
+
+        d.close()
+
+    def test_idle(self):
+        d = DigitalOutputDevice(1)
+
+        reset_idle_stats()
+        d.blink(on_time=0.1, off_time=1, n=2)
+        start = ticks_ms()
+        idle(3)
+        self.assertInRange(ticks_diff(ticks_ms(), start), 2990, 3010)
+        self.assertIsNone(d._value_changer)
+        self.assertFalse(d.value)
+
+        stats = idle_stats()
+        # woken for each of the 3 changes and at the end of the 3 seconds
+        self.assertInRange(stats["wakeups"], 3, 6)
+        self.assertEqual(stats["early_wakeups"], 0)
+        self.assertInRange(stats["idle_ms"], 2990, 3010)
+        self.assertInRange(stats["sleep_ms"], 2900, stats["idle_ms"])
+
+        reset_idle_stats()
+        self.assertEqual(idle_stats()["wakeups"], 0)
+
+        d.close()
+
+    def test_idle_with_pwm_running(self):
+        led = PWMLED(1)
+
+        # a dimmed LED would stop in lightsleep
+        led.value = 0.5
+        reset_idle_stats()
+        start = ticks_ms()
+        idle(0.5)
+        self.assertInRange(ticks_diff(ticks_ms(), start), 490, 510)
+        self.assertEqual(idle_stats()["wakeups"], 0)
+        self.assertAlmostEqual(led.value, 0.5, places=2)
+
+        # a pulse is serviced while waiting
+        led.pulse(fade_in_time=0.1, fade_out_time=0.1, n=1)
+        idle(0.5)
+        self.assertIsNone(led._value_changer)
+        self.assertEqual(led.value, 0)
+
+        # fully on or off, the Pico can lightsleep
+        for value in (0, 1):
+            led.value = value
+            reset_idle_stats()
+            idle(0.5)
+            self.assertGreater(idle_stats()["wakeups"], 0)
+            self.assertEqual(led.value, value)
+
+        led.close()
+
+    def test_idle_wakes_for_inputs(self):
+        try:
+            import picozero_host
+        except ImportError:
+            self.skipTest("needs the host backend to press the button")
+        import picozero.picozero as pz
+
+        def press_during_idle(button):
+            pressed = []
+            button.when_pressed = lambda: pressed.append(ticks_ms())
+            reset_idle_stats()
+            start = ticks_ms()
+            picozero_host.clock.at(
+                picozero_host.clock.now_us / 1000000 + 0.5,
+                lambda: button._pin.drive(0),
+            )
+            idle(1)
+            button._pin.drive(1)
+            self.assertEqual(len(pressed), 1)
+            self.assertInRange(ticks_diff(pressed[0], start), 500, 510)
+            return idle_stats()
+
+        # the button's pin wakes the Pico as soon as it is pressed
+        button = Button(2)
+        self.assertNotIn(button, pz._sleepless_inputs)
+        stats = press_during_idle(button)
+        self.assertEqual(stats["wakeups"], 2)
+        self.assertEqual(stats["early_wakeups"], 1)
+        button.close()
+
+        # without a pin wake, idle() only sleeps for short periods
+        sleep_mode = pz.SLEEP
+        pz.SLEEP = None
+        try:
+            button = Button(2)
+        finally:
+            pz.SLEEP = sleep_mode
+        self.assertIn(button, pz._sleepless_inputs)
+        stats = press_during_idle(button)
+        self.assertInRange(stats["wakeups"], 90, 101)
+        self.assertEqual(stats["early_wakeups"], 0)
+        button.close()
+        self.assertNotIn(button, pz._sleepless_inputs)
+
+    def test_every_and_after(self):
+        calls = []
+
+        start = ticks_ms()
+        periodic = every(0.05, lambda: calls.append(ticks_diff(ticks_ms(), start)))
+        once = after(0.12, lambda: calls.append("after"))
+        cancelled = after(0.1, lambda: calls.append("cancelled"))
+        cancelled.cancel()
+        self.assertFalse(cancelled.active)
+
+        sleep(0.22)
+        periodic.cancel()
+        sleep(0.1)
+
+        self.assertEqual(calls.count("after"), 1)
+        self.assertNotIn("cancelled", calls)
+        times = [t for t in calls if t != "after"]
+        self.assertEqual(len(times), 4)
+        for i, t in enumerate(times):
+            self.assertInRange(t, (i + 1) * 50, (i + 1) * 50 + 5)
+        self.assertEqual(periodic.calls, 4)
+        self.assertFalse(periodic.active)
+        self.assertFalse(once.active)
+        self.assertEqual(_scheduler._size, 0)
+
+        with self.assertRaises(ValueError):
+            every(0, lambda: None)
+
+    def test_every_coalesces_late_calls(self):
+        calls = []
+        periodic = every(0.1, lambda: calls.append(1))
+
+        # hold the scheduler up so 3 calls are due at once
+        start = ticks_ms()
+        _scheduler._busy = True
+        while ticks_diff(ticks_ms(), start) < 350:
+            pass
+        _scheduler._busy = False
+        _scheduler._service()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(periodic.coalesced, 2)
+        periodic.cancel()
+
+    def test_keyframe_cache(self):
+        clear_keyframe_cache()
+        configure_scheduler(cache_size=2)
+
+        d1 = PWMLED(1)
+        d2 = PWMLED(2)
+        d3 = PWMLED(3, active_high=False)
+
+        d1.pulse(fade_in_time=1, fps=25)
+        d2.pulse(fade_in_time=1, fps=25)
+        self.assertIs(d1._value_changer._keyframes, d2._value_changer._keyframes)
+
+        # the states depend on active_high, so they can't be shared
+        d3.pulse(fade_in_time=1, fps=25)
+        self.assertIsNot(d1._value_changer._keyframes, d3._value_changer._keyframes)
+
+        stats = keyframe_cache_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["entries"], 2)
+
+        # the least recently used sequence (d3's) is discarded
+        d1.pulse(fade_in_time=1, fps=25)
+        d2.blink(on_time=0.5, fade_in_time=0.5)
+        d1.pulse(fade_in_time=1, fps=25)
+        d3.pulse(fade_in_time=1, fps=25)
+        stats = keyframe_cache_stats()
+        self.assertEqual(stats["hits"], 3)
+        self.assertEqual(stats["misses"], 4)
+        self.assertEqual(stats["entries"], 2)
+
+        configure_scheduler(cache_size=8)
+        self.assertEqual(keyframe_cache_stats()["hits"], 0)
+
+        d1.close()
+        d2.close()
+        d3.close()
+
+    def test_timeline(self):
+        d1 = DigitalOutputDevice(1)
+        d2 = PWMLED(2)
+        rgb = RGBLED(3, 4, 5)
+
+        timeline = Timeline()
+        timeline.add(d1, [(0, 1), (0.2, 0)])
+        timeline.add(d2, [(0, 0.5), (0.1, 1), (0.3, 0)])
+        timeline.add(rgb, [(0, (1, 0, 0)), (0.2, (0, 0, 1))])
+        self.assertEqual(timeline.duration, 0.3)
+
+        # every device's first keyframe is written when the timeline starts,
+        # and the timeline takes over from anything else changing them
+        d2.blink()
+        timeline.play()
+        self.assertTrue(timeline.is_playing)
+        self.assertEqual(_scheduler._size, 1)
+        self.assertIs(d1._value_changer, timeline)
+        self.assertIs(rgb._value_changer, timeline)
+        self.assertEqual(d1.value, 1)
+        self.assertAlmostEqual(d2.value, 0.5, places=2)
+        self.assertEqual(rgb.value, (1, 0, 0))
+
+        sleep(0.15)
+        self.assertEqual((d1.value, d2.value, rgb.value), (1, 1, (1, 0, 0)))
+        sleep(0.1)
+        self.assertEqual((d1.value, d2.value, rgb.value), (0, 1, (0, 0, 1)))
+        sleep(0.1)
+        self.assertEqual(d2.value, 0)
+        self.assertFalse(timeline.is_playing)
+        self.assertIsNone(d1._value_changer)
+        self.assertIsNone(rgb._value_changer)
+
+        # seeking sets each device to its value at that point
+        timeline.seek(0.15)
+        self.assertEqual((d1.value, d2.value, rgb.value), (1, 1, (1, 0, 0)))
+        sleep(0.1)
+        self.assertEqual(d1.value, 0)
+        timeline.stop()
+        self.assertIsNone(d2._value_changer)
+
+        # changing a device's value stops the timeline
+        timeline.play()
+        d2.value = 0.25
+        self.assertFalse(timeline.is_playing)
+        self.assertIsNone(d1._value_changer)
+        self.assertEqual(_scheduler._size, 0)
+        sleep(0.35)
+        self.assertEqual(d1.value, 1)
+        self.assertAlmostEqual(d2.value, 0.25, places=2)
+
+        timeline.play(wait=True)
+        self.assertFalse(timeline.is_playing)
+        self.assertEqual(d2.value, 0)
+
+        # a speaker's keyframes can be notes, but must have a volume
+        speaker = Speaker(6, initial_freq=262)
+        timeline = Timeline()
+        timeline.add(speaker, [(0, ("a4", 1)), (0.1, (None, 0))])
+        timeline.play()
+        self.assertEqual(speaker.freq, 440)
+        self.assertGreater(speaker._pwm_buzzer._pwm.duty_u16(), 0)
+        sleep(0.15)
+        self.assertEqual(speaker.freq, 440)
+        self.assertEqual(speaker._pwm_buzzer._pwm.duty_u16(), 0)
+        with self.assertRaises(ValueError):
+            timeline.add(speaker, [(0.2, (440, None))])
+
+        d1.close()
+        d2.close()
+        rgb.close()
+        speaker.close()
+
+    def test_timeline_loop(self):
+        d1 = DigitalOutputDevice(1)
+        d2 = DigitalOutputDevice(2)
+
+        timeline1 = Timeline(loop=True, duration=0.2)
+        timeline1.add(d1, [(0, 1), (0.1, 0)])
+        timeline2 = Timeline(loop=True, duration=0.2)
+        timeline2.add(d2, [(0, 1), (0.1, 0)])
+
+        timeline1.play()
+        values = log_device_values(d1, 0.45)
+        self.assertEqual(values, [1, 0, 1, 0, 1])
+
+        # timeline2 starts when timeline1 next loops, in phase with it
+        timeline2.play(align_to=timeline1)
+        self.assertEqual(d2.value, 0)
+        self.assertEqual(ticks_diff(timeline2._start, timeline1._start) % 200000, 0)
+        sleep(0.2)
+        self.assertEqual(d1.value, d2.value)
+        sleep(0.1)
+        self.assertEqual(d1.value, d2.value)
+
+        timeline1.stop()
+        timeline2.stop()
+        self.assertEqual(_scheduler._size, 0)
+
+        # the position runs on past the last keyframe to the end of the loop
+        timeline = Timeline(loop=True, duration=1)
+        timeline.add(d1, [(0, 1), (0.5, 0)])
+        timeline.play()
+        positions = []
+        for i in range(3):
+            sleep(0.3)
+            positions.append(timeline.position)
+        self.assertInRange(positions[0], 0.29, 0.31)
+        self.assertInRange(positions[1], 0.59, 0.61)
+        self.assertInRange(positions[2], 0.89, 0.91)
+        sleep(0.3)
+        self.assertInRange(timeline.position, 0.19, 0.21)
+        self.assertEqual(d1.value, 1)
+        timeline.stop()
+
+        d1.close()
+        d2.close()
+
+    def test_streamed_timeline(self):
+        d = DigitalOutputDevice(1)
+        rgb = RGBLED(2, 3, 4, pwm=False)
+        speaker = Speaker(5)
+
+        timeline = Timeline()
+        timeline.add(d, [(0, 1), (0.1, 0), (0.2, 1)])
+        end = timeline.add_colors(rgb, ((1, 0, 0), (0, 0, 1)), on_times=0.1)
+        self.assertAlmostEqual(end, 0.2)
+        end = timeline.add_tune(speaker, [("c4", 0.1), ("d4", 0.1)])
+        self.assertAlmostEqual(end, 0.2)
+        timeline.save("test_animation.pza")
+
+        with open("test_animation.pza", "rb") as f:
+            data = f.read()
+        self.assertEqual(data[:4], b"PZA\x01")
+        # d has 3 events, rgb 2 and the speaker 2 notes, each followed by a gap
+        self.assertEqual(len(data), 8 + 3 * (6 + 2) + 2 * (6 + 6) + 4 * (6 + 4))
+
+        show = StreamedTimeline("test_animation.pza", (d, rgb, speaker))
+        d.blink()
+        show.play()
+        self.assertTrue(show.is_playing)
+        self.assertIs(d._value_changer, show)
+        self.assertIs(speaker._value_changer, show)
+        self.assertEqual(d.value, 1)
+        self.assertEqual(rgb.value, (1, 0, 0))
+        self.assertEqual(speaker.freq, 262)
+
+        sleep(0.15)
+        self.assertEqual(d.value, 0)
+        self.assertEqual(rgb.value, (0, 0, 1))
+        self.assertEqual(speaker.freq, 294)
+
+        sleep(0.1)
+        self.assertFalse(show.is_playing)
+        self.assertEqual(d.value, 1)
+        self.assertEqual(speaker.volume, 0)
+        self.assertEqual(_scheduler._size, 0)
+        self.assertIsNone(d._value_changer)
+
+        # changing a device's value stops the animation
+        show.play()
+        rgb.value = (0, 1, 0)
+        self.assertFalse(show.is_playing)
+        self.assertIsNone(speaker._value_changer)
+        self.assertEqual(_scheduler._size, 0)
+
+        show.loop = True
+        show.play()
+        sleep(0.32)
+        self.assertTrue(show.is_playing)
+        self.assertEqual(d.value, 0)
+        show.stop()
+        self.assertEqual(_scheduler._size, 0)
+
+        # the file can't be read from a hard IRQ, but can in the foreground
+        configure_scheduler(hard_irq=True)
+        try:
+            with self.assertRaises(ValueError):
+                show.play()
+            self.assertFalse(show.is_playing)
+            show.loop = False
+            show.play(wait=True)
+            self.assertEqual(d.value, 1)
+        finally:
+            configure_scheduler(hard_irq=False)
+
+        with self.assertRaises(ValueError):
+            with open("test_animation.pza", "wb") as f:
+                f.write(b"nope")
+            StreamedTimeline("test_animation.pza", (d,))
+
+        # an event with more values than the format allows, or for a device
+        # which wasn't given, is rejected rather than read past
+        for event in (b"\x00\x09\x00\x00\x00\x00", b"\x03\x01\x00\x00\x00\x00"):
+            with open("test_animation.pza", "wb") as f:
+                f.write(b"PZA\x01\x00\x00\x00\x00" + event + bytes(18))
+            with self.assertRaises(ValueError) as cm:
+                StreamedTimeline("test_animation.pza", (d, rgb, speaker))
+            self.assertIn("corrupt", str(cm.exception))
+
+        # a timeline which doesn't fit the format isn't saved
+        timeline = Timeline()
+        timeline.add(speaker, [(0, (70000, 1))])
+        with self.assertRaises(ValueError):
+            timeline.save("test_animation.pza")
+
+        class Wide(DigitalOutputDevice):
+            _state_width = 5
+
+            def _value_to_states(self, value):
+                return (0,) * 5
+
+        wide = Wide(6)
+        timeline = Timeline()
+        timeline.add(wide, [(0, 1)])
+        with self.assertRaises(ValueError):
+            timeline.save("test_animation.pza")
+        wide.close()
+
+        os.remove("test_animation.pza")
+        d.close()
+        rgb.close()
+        speaker.close()
+
+    def test_pin_recorder(self):
+        d = DigitalOutputDevice(1)
+        p = PWMOutputDevice(2)
+        stepper = Stepper((3, 4, 5, 6))
+
+        recorder = PinRecorder(size=16)
+        d.on()
+        recorder.start()
+        self.assertTrue(recorder.is_recording)
+        d.blink(on_time=0.1, off_time=0.1, n=2, wait=True)
+        p.value = 0.5
+        stepper.step(1)
+        recorder.stop()
+        self.assertFalse(recorder.is_recording)
+        d.on()
+
+        changes = recorder.changes()
+        # blink starts by turning the device off
+        self.assertEqual(
+            [c[1:] for c in changes[:5]],
+            [(1, 0, False), (1, 1, False), (1, 0, False), (1, 1, False), (1, 0, False)],
+        )
+        self.assertInRange(changes[2][0] - changes[1][0], 99000, 101000)
+        self.assertEqual(changes[6][1:], (2, 32767, True))
+        self.assertEqual([c[1] for c in changes[7:]], [3, 4, 5, 6])
+
+        f = StringIO()
+        recorder.write_vcd(f)
+        vcd = f.getvalue()
+        self.assertIn("$var wire 1 ! GP1 $end", vcd)
+        self.assertIn('$var wire 16 " GP2_duty $end', vcd)
+        self.assertIn("b111111111111111 \"", vcd)
+
+        # the oldest changes are overwritten once the buffer is full
+        recorder.clear()
+        recorder.start()
+        for i in range(20):
+            d.value = i & 1
+        recorder.stop()
+        self.assertEqual(len(recorder.changes()), 16)
+        self.assertEqual(recorder.overwritten, 4)
+        self.assertEqual(recorder.changes()[0][0], 0)
+
+        d.close()
+        p.close()
+        stepper.close()
+
+    def test_profile_callbacks(self):
+        d = DigitalInputDevice(1)
+        pin = d._pin
+
+        def slow():
+            sleep(0.002)
+
+        def fast():
+            pass
+
+        d.when_activated = slow
+        d.when_deactivated = fast
+
+        import picozero.picozero as pz
+
+        # input devices only call the debugging hook while it's needed
+        self.assertIsNone(pz._input_hook)
+        profile_callbacks(budget_us=1000)
+        self.assertIsNotNone(pz._input_hook)
+        for i in range(3):
+            pin.value(1)
+            d._pin_change(pin)
+            pin.value(0)
+            d._pin_change(pin)
+
+        stats = callback_stats()
+        self.assertEqual([s["callback"] for s in stats], ["slow", "fast"])
+        self.assertEqual(stats[0]["calls"], 3)
+        self.assertEqual(stats[0]["device"], str(d))
+        self.assertInRange(stats[0]["max_us"], 2000, 2500)
+        self.assertEqual(stats[0]["over_budget"], 3)
+        self.assertEqual(stats[1]["over_budget"], 0)
+        self.assertGreaterEqual(stats[1]["latency_max_us"], 0)
+
+        reset_callback_stats()
+        self.assertEqual(callback_stats(), [])
+
+        profile_callbacks(False)
+        self.assertIsNone(pz._input_hook)
+        pin.value(1)
+        d._pin_change(pin)
+        self.assertEqual(callback_stats(), [])
+
+        d.close()
+
+    def test_input_recorder(self):
+        d = DigitalInputDevice(1, bounce_time=0.05)
+        pin = d._pin
+        pressed = []
+        d.when_activated = lambda: pressed.append(ticks_ms())
+
+        recorder = InputRecorder(size=8)
+        recorder.start()
+        for level in (1, 0, 1):
+            # a press which bounces
+            pin.value(level)
+            d._pin_change(pin)
+            sleep(0.001)
+        sleep(0.1)
+        pin.value(0)
+        d._pin_change(pin)
+        recorder.stop()
+        self.assertFalse(recorder.is_recording)
+        import picozero.picozero as pz
+
+        self.assertIsNone(pz._input_hook)
+
+        edges = recorder.edges()
+        self.assertEqual(
+            [(e[1], e[2]) for e in edges], [(1, 1), (1, 0), (1, 1), (1, 0)]
+        )
+        self.assertInRange(edges[1][0] - edges[0][0], 1000, 1100)
+        self.assertEqual(len(pressed), 1)
+
+        recorder.save("test_edges.pze")
+        self.assertEqual(InputRecorder.load("test_edges.pze"), edges)
+        os.remove("test_edges.pze")
+
+        try:
+            from picozero_host import replay_inputs
+        except ImportError:
+            replay_inputs = None
+        if replay_inputs is not None:
+            # the recording replays through the same debouncing
+            d.close()
+            d = DigitalInputDevice(1, bounce_time=0.05)
+            d.when_activated = lambda: pressed.append(ticks_ms())
+            del pressed[:]
+            replay_inputs(edges)
+            self.assertEqual(len(pressed), 1)
+            self.assertEqual(d.value, 0)
+
+        d.close()
+
+    def test_event_stats(self):
+        d = DigitalInputDevice(1, bounce_time=0.05)
+        pin = d._pin
+        d.when_activated = lambda: None
+        count_events()
+
+        # every device's counts are created before its pin changes, so the
+        # interrupt handler only increments them
+        import picozero.debug as debug
+
+        self.assertIn(d, debug._input_hook.device_events)
+        d2 = DigitalInputDevice(2)
+        self.assertIn(d2, debug._input_hook.device_events)
+        d2.close()
+
+        for level in (1, 0, 1, 1):
+            pin.value(level)
+            d._pin_change(pin)
+        sleep(0.1)
+        pin.value(0)
+        d._pin_change(pin)
+
+        # no callback is set for deactivation, so only 1 is scheduled
+        expected = {
+            "irqs": 5,
+            "unchanged": 1,
+            "bounced": 2,
+            "scheduled": 1,
+            "dropped": 0,
+        }
+        self.assertEqual(event_stats(d), expected)
+        self.assertEqual(event_stats(), expected)
+
+        try:
+            import picozero_host
+        except ImportError:
+            picozero_host = None
+        if picozero_host is not None:
+            picozero_host.clock.schedule_queue_size = 0
+            sleep(0.1)
+            pin.value(1)
+            with self.assertRaises(EventFailedScheduleQueueFull):
+                d._pin_change(pin)
+            picozero_host.clock.schedule_queue_size = 32
+            self.assertEqual(event_stats(d)["dropped"], 1)
+
+        reset_event_stats(d)
+        self.assertEqual(event_stats(d)["irqs"], 0)
+        self.assertGreater(event_stats()["irqs"], 0)
+
+        # nothing is counted once counting is turned off
+        import picozero.picozero as pz
+
+        count_events(False)
+        self.assertIsNone(pz._input_hook)
+        pin.value(0)
+        d._pin_change(pin)
+        self.assertEqual(event_stats()["irqs"], 0)
+
+        d.close()
+
     def test_digital_LED(self):
         d = DigitalLED(1)
         self.assertFalse(d.is_lit)
@@ -297,6 +1242,322 @@ class Testpicozero(unittest.TestCase):
 
         d.close()
 
+    def test_pwm_output_device_keyframes(self):
+        d = PWMOutputDevice(7)
+
+        d.pulse(fade_in_time=0.5, fade_out_time=0.5, fps=4)
+        keyframes = d._value_changer._keyframes
+
+        self.assertEqual(keyframes.frames, 4)
+        self.assertEqual(list(keyframes.states), [0, 32767, 65535, 32767])
+        self.assertEqual(list(keyframes.times), [250000] * 4)
+
+        # repeating the sequence reuses the same compiled keyframes
+        log_device_values(d, 1.1)
+        self.assertIs(d._value_changer._keyframes, keyframes)
+
+        d.on(t=600)
+        keyframes = d._value_changer._keyframes
+        self.assertEqual(sum(keyframes.times), 600000000)
+        self.assertTrue(max(keyframes.times) < 600000000)
+
+        d.close()
+
+    def test_pwm_output_device_fade_resolution(self):
+        d = PWMOutputDevice(7, duty_factor=10)
+
+        # 100 steps, but only 10 different duty values
+        d.pulse(fade_in_time=1, fade_out_time=1, fps=100)
+        keyframes = d._value_changer._keyframes
+        self.assertEqual(keyframes.frames, 20)
+        self.assertEqual(list(keyframes.states[:10]), list(range(10)))
+        self.assertEqual(sum(keyframes.times), 2000000)
+
+        # the first step of the fade out is the same as the on value, so
+        # they are merged into one frame
+        d.blink(on_time=1, fade_in_time=0.5, fps=2)
+        keyframes = d._value_changer._keyframes
+        self.assertEqual(list(keyframes.states), [0, 10, 0])
+        self.assertEqual(list(keyframes.times), [500000, 1500000, 1000000])
+
+        d.close()
+
+    def test_pwm_output_device_fade_to(self):
+        d = PWMLED(9)
+
+        start = ticks_ms()
+        d.fade_to(1, 0.5)
+        sleep(0.25)
+        self.assertInRange(d.value, 0.4, 0.6)
+        sleep(0.3)
+        # the device stays at the value it faded to
+        self.assertEqual(d.value, 1)
+
+        d.fade_to(0.2, 0.2, wait=True)
+        self.assertInRange(ticks_diff(ticks_ms(), start), 740, 760)
+        self.assertAlmostEqual(d.value, 0.2, places=2)
+
+        # changing the value stops a fade
+        d.fade_to(1, 0.5)
+        d.value = 0
+        sleep(0.6)
+        self.assertEqual(d.value, 0)
+
+        d.close()
+
+    def test_pwm_output_device_animate_to(self):
+        d = PWMLED(9)
+
+        d.animate_to(1, 0.5)
+        # the first step is written straight away
+        self.assertInRange(d.value, 0.01, 0.1)
+        animation = d._value_changer
+        sleep(0.25)
+        self.assertInRange(d.value, 0.4, 0.6)
+
+        # a new target moves on from the current value, without turning off
+        d.animate_to(0, 0.5)
+        self.assertIs(d._value_changer, animation)
+        self.assertInRange(d.value, 0.4, 0.6)
+        self.assertEqual(_scheduler._size, 1)
+        sleep(0.25)
+        self.assertInRange(d.value, 0.15, 0.35)
+        sleep(0.3)
+        self.assertEqual(d.value, 0)
+        self.assertFalse(animation._running)
+        self.assertEqual(_scheduler._size, 0)
+
+        # retargeting many times a second never drops to zero
+        values = []
+        for i in range(20):
+            d.animate_to(0.5 + (i % 2) * 0.25, 0.1)
+            sleep(0.05)
+            values.append(d.value)
+        self.assertGreater(min(values), 0.2)
+        self.assertIs(d._value_changer, animation)
+
+        configure_scheduler(timing=True)
+        reset_timing_stats()
+        d.animate_to(1, 0.2)
+        stats = timing_stats(d)
+        self.assertEqual(stats["frames"], 1)
+        self.assertLess(stats["late_max_us"], 1000)
+        configure_scheduler(timing=False)
+
+        d.value = 0
+        self.assertIsNone(d._value_changer)
+        self.assertEqual(_scheduler._size, 0)
+
+        rgb = RGBLED(1, 2, 3)
+        rgb.animate_to((1, 0, 0), 0.2)
+        sleep(0.3)
+        self.assertEqual(rgb.value, (1, 0, 0))
+        rgb.animate_to((0, 0, 1), 0.2)
+        sleep(0.1)
+        r, g, b = rgb.value
+        self.assertInRange(r, 0.2, 0.5)
+        self.assertInRange(b, 0.5, 0.8)
+        rgb.close()
+
+        d.close()
+
+    def test_pwm_fade_registers(self):
+        # a stand-in for the RP2040's PWM registers, written the way the DMA
+        # channel writes them, one word each time the counter wraps
+        registers = {}
+        pwm_slice, channel, address = _pwm_slice_address(7)
+        self.assertEqual((pwm_slice, channel, address), (3, 1, 0x4005003C))
+        self.assertEqual(_pwm_slice_address(22), (3, 0, 0x4005003C))
+
+        top = 1249
+        freq = 100
+        self.assertEqual(_pwm_duty_to_cc(0, top), 0)
+        self.assertEqual(_pwm_duty_to_cc(65535, top), 1250)
+        self.assertEqual(_pwm_duty_to_cc(32768, top), 625)
+
+        # channel A (pin 6) is in use on the same slice
+        registers[address + _PWM_CC] = 0x0123
+        duration = 0.5
+        transfers = int(duration * freq)
+        words = _pwm_fade_words(
+            0, 1250, transfers, channel, registers[address + _PWM_CC]
+        )
+        self.assertEqual(len(words), 50)
+
+        levels = []
+        for word in words:
+            registers[address + _PWM_CC] = word
+            self.assertEqual(word & 0xFFFF, 0x0123)
+            levels.append(word >> 16)
+        self.assertEqual(levels, sorted(levels))
+        self.assertEqual(levels[0], 25)
+        self.assertEqual(levels[-1], 1250)
+        self.assertAlmostEqual(len(levels) / freq, duration)
+
+        # fading down on channel A keeps channel B
+        words = _pwm_fade_words(1250, 0, 4, 0, 0x04E20000 | 1250)
+        self.assertEqual([w & 0xFFFF for w in words], [937, 625, 312, 0])
+        self.assertEqual({w >> 16 for w in words}, {0x04E2})
+
+    def test_pwm_fade(self):
+        import picozero.picozero as pz
+
+        class FakeDMA:
+            channels = []
+
+            def __init__(self):
+                self.closed = False
+                self.running = False
+                FakeDMA.channels.append(self)
+
+            def pack_ctrl(self, **kwargs):
+                return kwargs
+
+            def config(self, read, write, count, ctrl, trigger):
+                self.words, self.write, self.count, self.ctrl = read, write, count, ctrl
+                self.running = trigger
+
+            def run(self):
+                # the transfers the PWM slice's wraps would have requested
+                for word in self.words[: self.count]:
+                    registers[self.write] = word
+                self.running = False
+
+            def active(self, value=None):
+                if value is not None:
+                    self.running = bool(value)
+                return self.running
+
+            def close(self):
+                self.closed = True
+
+        pwm_slice, channel, address = _pwm_slice_address(7)
+        registers = {address + _PWM_TOP: 1249, address + _PWM_CC: 0x0123}
+        saved = pz.DMA, pz.mem32, pz._dma_fades
+        # the host isn't an RP2040, so its fades are never run by DMA
+        self.assertFalse(pz._dma_fades)
+        pz.DMA, pz.mem32, pz._dma_fades = FakeDMA, registers, True
+        d = PWMLED(7)
+        try:
+            d.fade_to(1, 0.5)
+            fade = d._value_changer
+            self.assertIsInstance(fade, PWMFade)
+            dma = FakeDMA.channels[-1]
+            self.assertEqual(dma.write, address + _PWM_CC)
+            self.assertEqual(dma.count, 50)
+            self.assertEqual(dma.ctrl["treq_sel"], _DREQ_PWM_WRAP0 + pwm_slice)
+            self.assertTrue(dma.running)
+
+            # the fade is finished once the DMA channel has written every word
+            sleep(0.6)
+            self.assertTrue(fade._running)
+            dma.run()
+            self.assertEqual(registers[address + _PWM_CC], (1250 << 16) | 0x0123)
+            sleep(0.01)
+            self.assertFalse(fade._running)
+            self.assertTrue(dma.closed)
+            self.assertEqual(d.value, 1)
+            self.assertEqual(_scheduler._size, 0)
+
+            # stopping a fade stops the DMA channel
+            d.fade_to(0, 0.5)
+            dma = FakeDMA.channels[-1]
+            d.value = 0.5
+            self.assertFalse(dma.running)
+            self.assertTrue(dma.closed)
+
+            # fades longer than the transfer table allows use the scheduler
+            channels = len(FakeDMA.channels)
+            d.fade_to(0, _PWM_FADE_MAX_TRANSFERS / 100 + 1)
+            self.assertNotIsInstance(d._value_changer, PWMFade)
+            self.assertEqual(len(FakeDMA.channels), channels)
+        finally:
+            d.close()
+            pz.DMA, pz.mem32, pz._dma_fades = saved
+
+    def test_easing(self):
+        for easing in (
+            "ease_in",
+            "ease_out",
+            "ease_in_out",
+            "sine",
+            "cubic",
+            "exponential",
+            "perceptual",
+        ):
+            table = _easing_table(easing)
+            self.assertEqual(len(table), 257)
+            self.assertEqual(table[0], 0)
+            self.assertEqual(table[-1], 65535)
+            self.assertEqual(list(table), sorted(table))
+            # each table is only generated once
+            self.assertIs(_easing_table(easing), table)
+
+        self.assertIsNone(_easing_table("linear"))
+        with self.assertRaises(ValueError):
+            _easing_table("bounce")
+
+        d = PWMOutputDevice(7)
+        d.pulse(fade_in_time=1, fade_out_time=1, fps=4, easing="ease_in")
+        keyframes = d._value_changer._keyframes
+        self.assertEqual(
+            list(keyframes.states),
+            [0, 4096, 16384, 36863, 65535, 36863, 16384, 4096],
+        )
+        with self.assertRaises(ValueError):
+            d.pulse(easing="bounce")
+        d.close()
+
+        # with few distinct levels, linear fades use fewer steps but eased
+        # fades keep every step for the steep end of the curve
+        d = PWMOutputDevice(7, duty_factor=10)
+        d.pulse(fade_in_time=1, fade_out_time=0, fps=100, n=1)
+        self.assertEqual(d._value_changer._keyframes.frames, 10)
+        d.pulse(fade_in_time=1, fade_out_time=0, fps=100, n=1, easing="ease_in")
+        keyframes = d._value_changer._keyframes
+        # no level is skipped, the curve is in how long each is held
+        self.assertEqual(list(keyframes.states), list(range(10)))
+        self.assertGreater(keyframes.times[0], keyframes.times[-1])
+        d.close()
+
+        s = Servo(1)
+        s.value = 0
+        s.fade_to(1, 1, easing="ease_in_out")
+        sleep(0.25)
+        self.assertInRange(s.value, 0.05, 0.2)
+        sleep(0.8)
+        self.assertEqual(s.value, 1)
+        s.close()
+
+    def test_output_device_async(self):
+        d1 = PWMOutputDevice(6)
+        d2 = DigitalOutputDevice(2)
+
+        async def run_together():
+            start = ticks_ms()
+            await asyncio.gather(
+                d1.blink_async(on_time=0.1, off_time=0.1, n=2), d2.on_async(t=0.3)
+            )
+            return ticks_diff(ticks_ms(), start)
+
+        self.assertInRange(asyncio.run(run_together()), 390, 420)
+        self.assertFalse(d1.value)
+        self.assertFalse(d2.value)
+
+        async def cancel_pulse():
+            task = asyncio.create_task(d1.pulse_async())
+            await asyncio.sleep(0.5)
+            self.assertTrue(d1.is_active)
+            task.cancel()
+            await asyncio.sleep(0.1)
+
+        asyncio.run(cancel_pulse())
+        self.assertFalse(d1.value)
+        self.assertIsNone(d1._value_changer)
+
+        d1.close()
+        d2.close()
+
     def test_motor_default_values(self):
         d = Motor(8, 9)
 
@@ -434,6 +1695,16 @@ class Testpicozero(unittest.TestCase):
 
         d.close()
 
+    def test_rgb_led_cycle_async(self):
+        d = RGBLED(1, 2, 3)
+
+        start = ticks_ms()
+        asyncio.run(d.cycle_async(fade_times=0.2, n=1))
+        self.assertInRange(ticks_diff(ticks_ms(), start), 590, 620)
+        self.assertEqual(d.value, (0, 0, 0))
+
+        d.close()
+
     def test_servo_default_value(self):
         d = Servo(1)
 
@@ -569,6 +1840,14 @@ class Testpicozero(unittest.TestCase):
 
         s.close()
 
+    def test_speaker_play_async(self):
+        s = Speaker(19)
+
+        asyncio.run(s.play_async([(440, 0.1), (523, 0.1)]))
+        self.assertEqual(s.volume, 0)
+
+        s.close()
+
     def test_speaker_play_note_list(self):
         s = Speaker(19)
 
@@ -913,6 +2192,10 @@ class Testpicozero(unittest.TestCase):
         original_delay = stepper.step_delay
         stepper.step_delay = 0.001
         self.assertEqual(stepper.step_delay, 0.001)
+        # background steps use the delay in microseconds, worked out up front
+        self.assertEqual(stepper._step_delay_us, 1000)
+        stepper.set_speed(60)
+        self.assertEqual(stepper._step_delay_us, int(1000000 / 100))
         stepper.step_delay = original_delay
 
         stepper.close()
@@ -1011,6 +2294,26 @@ class Testpicozero(unittest.TestCase):
         self.assertAlmostEqual(stepper.angle, 270.0, places=1)  # -90 normalised to 270
 
         stepper.close()
+
+    def test_stepper_background(self):
+        stepper = Stepper((1, 2, 3, 4), step_delay=0.001)
+
+        stepper.step(20, "cw", wait=False)
+        self.assertTrue(stepper.is_moving)
+        self.assertEqual(stepper.step_count, 1)
+
+        sleep(0.03)
+        self.assertFalse(stepper.is_moving)
+        self.assertEqual(stepper.step_count, 20)
+
+        # off() stops the motor moving
+        stepper.step(20, "ccw", wait=False)
+        stepper.off()
+        sleep(0.03)
+        self.assertEqual(stepper.step_count, 19)
+        self.assertFalse(stepper.is_moving)
+
+        stepper.close()
         
     def test_distance_sensor_basic(self):
         # Create a mock distance sensor
@@ -1031,4 +2334,5 @@ class Testpicozero(unittest.TestCase):
         self.assertEqual(d.max_distance, 2.5)
 
 
-unittest.main()
+if __name__ == "__main__":
+    unittest.main()